@@ -1,19 +1,12 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from app.core.config import settings
+from app.llm import get_llm
 
-# Initialize Ollama
-llm = ChatOllama(
-    base_url=settings.OLLAMA_BASE_URL,
-    model="llama3:8b",
-    temperature=0.7
-)
-
-async def get_tutor_response(history: list, user_message: str, language: str) -> str:
+async def get_tutor_response(history: list, user_message: str, language: str, summary: str = "") -> str:
     """
     Generates a response from the coding tutor.
-    history: List of {"role": "user" | "assistant", "content": "..."}
+    history: List of {"role": "user" | "assistant", "content": "..."}, already cut to the context budget
+    summary: Rolling summary of the turns before history (see app/chat_context.py)
     """
     
     system_prompt = f"""You are an expert Coding Tutor and Interviewer specializing in {language}.
@@ -29,16 +22,19 @@ async def get_tutor_response(history: list, user_message: str, language: str) ->
     """
     
     messages = [("system", system_prompt)]
+    if summary:
+        messages.append(("system", f"Summary of the earlier conversation:\n{summary}"))
     
     for msg in history:
         messages.append((msg["role"], msg["content"]))
         
     messages.append(("user", user_message))
     
-    prompt = ChatPromptTemplate.from_messages(messages)
-    chain = prompt | llm | StrOutputParser()
+    # Messages are pre-built rather than templated, so braces in code don't
+    # need escaping
+    chain = get_llm("coding") | StrOutputParser()
     
-    return chain.astream({}) 
+    return chain.astream(messages) 
 
 
 async def analyze_code(code: str, problem: str, language: str) -> str:
@@ -70,7 +66,7 @@ async def analyze_code(code: str, problem: str, language: str) -> str:
         ("user", "Analyze my solution.")
     ])
     
-    chain = prompt | llm | StrOutputParser()
+    chain = prompt | get_llm("code_analysis") | StrOutputParser()
     return await chain.ainvoke({
         "language": language,
         "problem": problem,
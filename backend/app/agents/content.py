@@ -1,112 +1,177 @@
-import json
-import requests
-from langchain_ollama import ChatOllama
+import asyncio
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-from app.core.config import settings
+from app.llm import get_llm
+from app.content_cache import content_cache, cache_key
 from app.models.content import ContentResponse
+from app.serper import search_serper
 
-# Initialize Ollama
-llm = ChatOllama(
-    base_url=settings.OLLAMA_BASE_URL,
-    model="llama3:8b",
-    temperature=0.7
-)
-
-def search_serper(query: str, type: str = "search"):
-    url = "https://google.serper.dev/search"
-    if type == "images":
-        url = "https://google.serper.dev/images"
-    elif type == "videos":
-        url = "https://google.serper.dev/videos"
-        
-    payload = json.dumps({
-        "q": query,
-        "num": 3
-    })
-    headers = {
-        'X-API-KEY': settings.SERPER_API_KEY,
-        'Content-Type': 'application/json'
-    }
-    
-    try:
-        response = requests.request("POST", url, headers=headers, data=payload)
-        return response.json()
-    except Exception as e:
-        print(f"Serper API Error: {e}")
-        return {}
-
-async def generate_content(topic: str, subtopic: str, mode: str, difficulty: str, language: str = "English", existing_images: list = None, existing_videos: list = None, user_status: str = "novice", interest: str = None, objective: str = None) -> ContentResponse:
-    # 1. Fetch Media
+async def _fetch_media(topic: str, subtopic: str, existing_images: list = None, existing_videos: list = None):
     images = existing_images if existing_images else []
     videos = existing_videos if existing_videos else []
-    
+
+    # Image and video searches run at the same time
+    searches = {}
     if not images:
         # Search for images (excluding ResearchGate)
-        img_results = search_serper(f"{subtopic} {topic} diagram schematic -site:researchgate.net", "images")
-        if "images" in img_results:
-            images = [img["imageUrl"] for img in img_results["images"][:3]]
-            
+        searches["images"] = search_serper(f"{subtopic} {topic} diagram schematic -site:researchgate.net", "images")
     if not videos:
         # Search for videos
-        vid_results = search_serper(f"{subtopic} {topic} explanation", "videos")
-        if "videos" in vid_results:
-            # Extract title and link
-            videos = []
-            for vid in vid_results["videos"][:3]:
-                videos.append({
-                    "title": vid.get("title", "Video Tutorial"),
-                    "link": vid.get("link", "#")
-                })
-
-    # 2. Generate Content
-    system_prompt = ""
-    
+        searches["videos"] = search_serper(f"{subtopic} {topic} explanation", "videos")
+    results = dict(zip(searches, await asyncio.gather(*searches.values())))
+
+    if "images" in results.get("images", {}):
+        images = [img["imageUrl"] for img in results["images"]["images"][:3]]
+    if "videos" in results.get("videos", {}):
+        # Extract title and link
+        videos = []
+        for vid in results["videos"]["videos"][:3]:
+            videos.append({
+                "title": vid.get("title", "Video Tutorial"),
+                "link": vid.get("link", "#")
+            })
+    return images, videos
+
+# Per-mode instructions. The system prompt starts with these and keeps every
+# request-specific field after them, so lessons in the same mode share a prompt
+# prefix that Ollama can reuse from its KV cache instead of prefilling again.
+MODE_INSTRUCTIONS = {
+    "story": "You are a creative writer. Explain the concept using analogies, characters, and a narrative structure. Make it engaging and easy to visualize.",
+    "deep": "You are a research scientist. Provide a rigorous technical explanation, including mathematical definitions, edge cases, and deep theoretical context.",
+    "exam": "You are a senior examiner. Provide a quick summary, key bullet points, common interview questions, and a 'cheat sheet' style overview.",
+}
+DEFAULT_INSTRUCTIONS = "You are a helpful tutor. Explain the concept clearly."
+
+ADAPTIVE_INSTRUCTIONS = {
+    "expert": "The user is an EXPERT in this topic. Skip basics. Focus on advanced nuances, edge cases, and complex applications. Challenge the user.",
+    "competent": "The user is COMPETENT. Briefly review basics but focus on intermediate concepts and practical application.",
+    "novice": "The user is a NOVICE. Explain from first principles. Use simple language and many examples. Build a strong foundation.",
+}
+
+OBJECTIVE_INSTRUCTIONS = {
+    "Exam based": "The user has an UPCOMING EXAM. Focus strictly on syllabus coverage, key definitions, memorizable facts, and common exam questions. Be precise and high-yield.",
+    "Conceptual": "The user wants DEEP CONCEPTUAL UNDERSTANDING. Focus on the 'why' and 'how'. Connect ideas together. Specific facts are less important than intuition and mental models.",
+    "Skill based": "The user wants PRACTICAL SKILLS. Focus exclusively on implementation, how-to guides, real-world steps, and execution. Minimize theory.",
+}
+
+def _content_chain(topic: str, subtopic: str, mode: str, difficulty: str, language: str, user_status: str, interest: str, objective: str):
     # Adaptive Learning Logic
-    adaptive_instruction = ""
-    if user_status == "expert":
-        adaptive_instruction = "The user is an EXPERT in this topic. Skip basics. Focus on advanced nuances, edge cases, and complex applications. Challenge the user."
-    elif user_status == "competent":
-        adaptive_instruction = "The user is COMPETENT. Briefly review basics but focus on intermediate concepts and practical application."
-    else: # novice
-        adaptive_instruction = "The user is a NOVICE. Explain from first principles. Use simple language and many examples. Build a strong foundation."
-
-    if mode == "story":
-        if interest:
-            system_prompt = f"You are a creative writer who explains complex topics by relating them to '{interest}'. Use analogies, characters, metaphors, and terminology strictly from the world of {interest} to explain the concept. Make it fun, engaging, and highly personalized to a fan of {interest}."
-        else:
-            system_prompt = "You are a creative writer. Explain the concept using analogies, characters, and a narrative structure. Make it engaging and easy to visualize."
-    elif mode == "deep":
-        system_prompt = "You are a research scientist. Provide a rigorous technical explanation, including mathematical definitions, edge cases, and deep theoretical context."
-    elif mode == "exam":
-        system_prompt = "You are a senior examiner. Provide a quick summary, key bullet points, common interview questions, and a 'cheat sheet' style overview."
-    else:
-        system_prompt = "You are a helpful tutor. Explain the concept clearly."
+    adaptive_instruction = ADAPTIVE_INSTRUCTIONS.get(user_status, ADAPTIVE_INSTRUCTIONS["novice"])
 
     # Objective Logic
     objective_instruction = ""
     if objective:
-        if objective == "Exam based":
-            objective_instruction = "The user has an UPCOMING EXAM. Focus strictly on syllabus coverage, key definitions, memorizable facts, and common exam questions. Be precise and high-yield."
-        elif objective == "Conceptual":
-            objective_instruction = "The user wants DEEP CONCEPTUAL UNDERSTANDING. Focus on the 'why' and 'how'. Connect ideas together. Specific facts are less important than intuition and mental models."
-        elif objective == "Skill based":
-            objective_instruction = "The user wants PRACTICAL SKILLS. Focus exclusively on implementation, how-to guides, real-world steps, and execution. Minimize theory."
-        else: # Custom or specific text
-            objective_instruction = f"The user has a specific goal: '{objective}'. Tailor all explanations to help achieve this specific goal."
+        # Custom or specific text
+        objective_instruction = OBJECTIVE_INSTRUCTIONS.get(
+            objective, f"The user has a specific goal: '{objective}'. Tailor all explanations to help achieve this specific goal."
+        )
 
+    interest_instruction = ""
+    if mode == "story" and interest:
+        interest_instruction = f"\nRelate the story to '{interest}'. Use analogies, characters, metaphors, and terminology strictly from the world of {interest} to explain the concept. Make it fun, engaging, and highly personalized to a fan of {interest}."
+
+    # Static instructions first, then the fields that change between requests,
+    # roughly from the least to the most variable
+    system_prompt = (
+        f"{MODE_INSTRUCTIONS.get(mode, DEFAULT_INSTRUCTIONS)}\n\n"
+        f"IMPORTANT INSTRUCTION: You must generate the entire response in the {language} language. Do not use English unless the term has no translation.\n\n"
+        f"Target Audience Difficulty: {difficulty}.\nUser Proficiency Level: {user_status.upper()}\n{adaptive_instruction}\n\n"
+        f"User Objective: {objective_instruction}{interest_instruction}"
+    )
     prompt = ChatPromptTemplate.from_messages([
-        ("system", f"{system_prompt}\n\nTarget Audience Difficulty: {difficulty}.\nUser Proficiency Level: {user_status.upper()}\n{adaptive_instruction}\n\nUser Objective: {objective_instruction}\n\nIMPORTANT INSTRUCTION: You must generate the entire response in the {language} language. Do not use English unless the term has no translation."),
+        ("system", system_prompt),
         ("user", f"Explain the subtopic '{subtopic}' which is part of '{topic}'. Write the explanation in {language}.")
     ])
 
-    chain = prompt | llm | StrOutputParser()
-    content_text = await chain.ainvoke({})
+    return prompt | get_llm("content").bind(llm_mode=mode) | StrOutputParser()
 
-    return ContentResponse(
+def _with_media(cached: ContentResponse, existing_images: list, existing_videos: list) -> ContentResponse:
+    return cached.copy(update={
+        "images": existing_images or cached.images,
+        "videos": existing_videos or cached.videos
+    })
+
+async def generate_content(topic: str, subtopic: str, mode: str, difficulty: str, language: str = "English", existing_images: list = None, existing_videos: list = None, user_status: str = "novice", interest: str = None, objective: str = None) -> ContentResponse:
+    # 0. Shared cache across roadmaps and users
+    key = cache_key(topic, subtopic, mode, difficulty, language, user_status, interest, objective)
+    cached = await content_cache.get(key)
+    if cached is not None:
+        return _with_media(cached, existing_images, existing_videos)
+
+    # 1. Fetch media while the lesson generates, so the searches add nothing to its latency
+    media = asyncio.ensure_future(_fetch_media(topic, subtopic, existing_images, existing_videos))
+    try:
+        # 2. Generate Content
+        chain = _content_chain(topic, subtopic, mode, difficulty, language, user_status, interest, objective)
+        content_text = await chain.ainvoke({})
+        images, videos = await media
+    finally:
+        media.cancel()
+
+    response = ContentResponse(
         content=content_text,
         images=images,
         videos=videos,
         quiz_questions=[] # Quiz is now handled separately
     )
-    
+    await content_cache.put(key, response)
+    return response
+
+async def stream_content(topic: str, subtopic: str, mode: str, difficulty: str, language: str = "English", existing_images: list = None, existing_videos: list = None, user_status: str = "novice", interest: str = None, objective: str = None):
+    """
+    Streaming variant of generate_content. Yields (event, data) pairs:
+    ("token", str) chunks and, as soon as the media searches running
+    alongside the generation finish, one ("media", {"images", "videos"}),
+    then ("done", ContentResponse) once the lesson is complete and cached.
+    """
+    key = cache_key(topic, subtopic, mode, difficulty, language, user_status, interest, objective)
+    cached = await content_cache.get(key)
+    if cached is not None:
+        response = _with_media(cached, existing_images, existing_videos)
+        yield "media", {"images": response.images, "videos": response.videos}
+        yield "token", response.content
+        yield "done", response
+        return
+
+    media = asyncio.ensure_future(_fetch_media(topic, subtopic, existing_images, existing_videos))
+    chain = _content_chain(topic, subtopic, mode, difficulty, language, user_status, interest, objective)
+    stream = chain.astream({}).__aiter__()
+    next_chunk = asyncio.ensure_future(stream.__anext__())
+    images = videos = None
+    chunks = []
+    try:
+        while next_chunk is not None:
+            waiting = {next_chunk} if images is not None else {next_chunk, media}
+            finished, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if media in finished and images is None:
+                images, videos = media.result()
+                yield "media", {"images": images, "videos": videos}
+            if next_chunk in finished:
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    next_chunk = None
+                    break
+                next_chunk = asyncio.ensure_future(stream.__anext__())
+                if chunk:
+                    chunks.append(chunk)
+                    yield "token", chunk
+        if images is None:
+            images, videos = await media
+            yield "media", {"images": images, "videos": videos}
+    finally:
+        media.cancel()
+        if next_chunk is not None:
+            # The stream can only be closed once its pending step has finished
+            next_chunk.cancel()
+            await asyncio.gather(next_chunk, return_exceptions=True)
+        await stream.aclose()
+
+    response = ContentResponse(
+        content="".join(chunks),
+        images=images,
+        videos=videos,
+        quiz_questions=[]
+    )
+    await content_cache.put(key, response)
+    yield "done", response
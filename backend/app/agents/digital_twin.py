@@ -1,4 +1,5 @@
-from app.db import get_db
+from app.db import run_db
+from app import queries
 import sqlite3
 
 async def update_knowledge_state(user_id: int, topic: str, subtopic: str, score: int, time_taken: int):
@@ -21,14 +22,11 @@ async def update_knowledge_state(user_id: int, topic: str, subtopic: str, score:
         # Could flag this in a future 'learning_behavior' table
         pass
 
-    with get_db() as conn:
+    def save_state(conn):
         c = conn.cursor()
         
         # Check if record exists
-        c.execute("""
-            SELECT mastery_score FROM user_knowledge 
-            WHERE user_id = ? AND topic = ? AND subtopic = ?
-        """, (user_id, topic, subtopic))
+        c.execute(queries.MASTERY, (user_id, topic, subtopic))
         
         row = c.fetchone()
         
@@ -57,5 +55,7 @@ async def update_knowledge_state(user_id: int, topic: str, subtopic: str, score:
             """, (user_id, topic, subtopic, new_mastery, status))
             
         conn.commit()
-        
+        return row
+
+    row = await run_db(save_state)
     return {"mastery": new_mastery if not row else int((row["mastery_score"] * 0.7) + (new_mastery * 0.3)), "status": status}
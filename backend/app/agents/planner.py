@@ -1,18 +1,11 @@
 import json
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import JsonOutputParser
-from app.core.config import settings
+from pydantic import ValidationError
+from app.llm import get_llm, record_parse_failure
 from app.models.roadmap import RoadmapResponse, RoadmapNode
 
-# Initialize Ollama
-llm = ChatOllama(
-    base_url=settings.OLLAMA_BASE_URL,
-    model="llama3:8b", # Or mistral, make sure this matches what the user has installed
-    format="json",
-    temperature=0.2
-)
-
 planner_prompt = ChatPromptTemplate.from_messages([
     ("system", """You are an expert curriculum planner. 
     Create a hierarchical learning roadmap for the given topic and difficulty level.
@@ -39,21 +32,24 @@ planner_prompt = ChatPromptTemplate.from_messages([
     
     Rules:
     1. Break down the topic into logical steps.
-    2. Ensure the difficulty matches the user's request ({difficulty}).
+    2. Ensure the difficulty matches the user's request.
     3. Use nested children for subtopics.
     4. Keep descriptions concise.
-    5. IMPORTANT: Generate the roadmap labels and descriptions in {language} language.
+    5. IMPORTANT: Generate the roadmap labels and descriptions in the requested language.
+    6. Interest/Hobby is optional context: use metaphors if relevant, but keep labels technical.
+    7. Objective tailors the structure, e.g. "Exam based" = Syllabus style, "Skill based" = Practical steps.
     
     User Context:
-    Interest/Hobby: {interest} (Optional: Use metaphors if relevant, but keep labels technical)
-    Objective: {objective} (Optional: Tailor the structure. e.g. "Exam based" = Syllabus style, "Skill based" = Practical steps)
+    Difficulty: {difficulty}
+    Language: {language}
+    Interest/Hobby: {interest}
+    Objective: {objective}
     """),
     ("user", "Topic: {topic}\nDifficulty: {difficulty}\nLanguage: {language}\nInterest: {interest}\nObjective: {objective}")
 ])
 
-chain = planner_prompt | llm | JsonOutputParser()
-
 async def generate_roadmap(topic: str, difficulty: str, language: str = "English", interest: str = None, objective: str = None) -> RoadmapResponse:
+    chain = planner_prompt | get_llm("planner") | JsonOutputParser()
     try:
         response = await chain.ainvoke({
             "topic": topic, 
@@ -65,6 +61,8 @@ async def generate_roadmap(topic: str, difficulty: str, language: str = "English
         # Validate with Pydantic to ensure structure
         return RoadmapResponse(**response)
     except Exception as e:
+        if isinstance(e, (OutputParserException, ValidationError)):
+            record_parse_failure("planner")
         print(f"Error generating roadmap: {e}")
         # Fallback or re-raise
         raise e
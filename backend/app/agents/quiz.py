@@ -1,17 +1,17 @@
 import json
-from langchain_ollama import ChatOllama
+import re
+from contextlib import aclosing
+from pydantic import ValidationError
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from app.core.config import settings
+from app.json_stream import JsonObjectStream
+from app.llm import get_llm, record_parse_failure
+from app.llm_scheduler import LLMOverloaded
+from app.models.quiz import QuizQuestion
+from app.question_bank import normalize_text
 
-# Initialize Ollama
-llm = ChatOllama(
-    base_url=settings.OLLAMA_BASE_URL,
-    model="llama3:8b",
-    temperature=0.7
-)
-
-async def generate_quiz_questions(topic: str, subtopic: str, difficulty: str, language: str = "English", num_questions: int = 5, user_status: str = "novice"):
+def _quiz_messages(topic: str, subtopic: str, difficulty: str, language: str, num_questions: int, user_status: str, avoid: list = ()):
     
     # Adaptive Logic
     adaptive_instruction = ""
@@ -22,13 +22,14 @@ async def generate_quiz_questions(topic: str, subtopic: str, difficulty: str, la
     else:
         adaptive_instruction = "The user is a NOVICE. Focus on foundational concepts, definitions, and basic understanding. Keep questions straightforward."
 
+    # Regeneration rounds must not repeat the questions already accepted
+    avoid_instruction = ""
+    if avoid:
+        avoid_instruction = "Do NOT repeat or rephrase any of these existing questions:\n" + "\n".join(f"- {q}" for q in avoid)
+
+    # Static format instructions first so every quiz shares the prompt prefix
     quiz_prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an expert quiz generator. Create {num_questions} multiple choice questions to test the user's understanding of the subtopic.
-        
-        Target Audience Difficulty: {difficulty}
-        User Proficiency Level: {user_status}
-        {adaptive_instruction}
-        Language: {language}
+        ("system", """You are an expert quiz generator. You write multiple choice questions to test the user's understanding of a subtopic.
         
         Return ONLY a raw JSON array of objects. Do not include any markdown formatting like ```json or ```. Do not include any introductory text.
         Ensure the JSON is valid. Keys must be double-quoted. Numbers should not be quoted unless necessary.
@@ -43,54 +44,103 @@ async def generate_quiz_questions(topic: str, subtopic: str, difficulty: str, la
                 "explanation": "Brief explanation of why this is correct"
             }}
         ]
+        
+        Language: {language}
+        Target Audience Difficulty: {difficulty}
+        User Proficiency Level: {user_status}
+        {adaptive_instruction}
+        {avoid_instruction}
         """),
-        ("user", f"Create a quiz for the subtopic '{subtopic}' which is part of '{topic}'.")
+        ("user", f"Create {{num_questions}} multiple choice questions for the subtopic '{subtopic}' which is part of '{topic}'.")
     ])
     
-    chain = quiz_prompt | llm | StrOutputParser()
-    
+    return quiz_prompt.format_messages(**{
+        "topic": topic,
+        "subtopic": subtopic,
+        "difficulty": difficulty,
+        "language": language,
+        "num_questions": num_questions,
+        "user_status": user_status,
+        "adaptive_instruction": adaptive_instruction,
+        "avoid_instruction": avoid_instruction
+    })
+
+def _parse_question(raw: str):
+    """Parses and validates one streamed question object; None if it is unusable."""
     try:
-        result_text = await chain.ainvoke({
-            "topic": topic,
-            "subtopic": subtopic,
-            "difficulty": difficulty,
-            "language": language,
-            "num_questions": num_questions,
-            "user_status": user_status,
-            "adaptive_instruction": adaptive_instruction
-        })
-        
-        # Clean up the text
-        cleaned_text = result_text.strip()
-        
-        # Extract JSON array if embedded in text
-        start = cleaned_text.find('[')
-        end = cleaned_text.rfind(']')
-        if start != -1 and end != -1:
-            cleaned_text = cleaned_text[start:end+1]
-            
+        data = json.loads(raw)
+    except json.JSONDecodeError:
         # Attempt to fix common JSON errors from LLMs
-        import re
         # Fix: "id": 4" -> "id": 4
-        cleaned_text = re.sub(r'"id":\s*(\d+)"', r'"id": \1', cleaned_text)
+        repaired = re.sub(r'"id":\s*(\d+)"', r'"id": \1', raw)
         # Fix trailing commas before closing braces/brackets
-        cleaned_text = re.sub(r',\s*([\]}])', r'\1', cleaned_text)
-        
-        questions = json.loads(cleaned_text)
-        return questions
-    except Exception as e:
-        print(f"Quiz Generation Error: {e}")
+        repaired = re.sub(r',\s*([\]}])', r'\1', repaired)
         try:
-            print(f"Failed JSON content: {cleaned_text}")
-        except:
-            pass
-        return []
+            data = json.loads(repaired)
+        except json.JSONDecodeError:
+            return None
+    try:
+        return QuizQuestion(**data).dict() if isinstance(data, dict) else None
+    except ValidationError:
+        return None
 
-async def generate_quiz_review(topic: str, subtopic: str, score: int, total_questions: int, time_taken: int, attempt_data: list):
+async def stream_quiz_questions(topic: str, subtopic: str, difficulty: str, language: str = "English", num_questions: int = 5, user_status: str = "novice", avoid: list = ()):
     """
-    Generates a detailed review of the user's quiz performance.
+    Yields validated questions one by one as the model closes each JSON
+    object. Malformed, invalid or duplicate questions (including repeats of
+    the questions in avoid) are dropped and only that many are asked for
+    again, up to QUIZ_REGENERATE_ATTEMPTS more rounds. May yield fewer than
+    num_questions. Errors propagate to the caller.
     """
-    
+    questions = []
+    seen = {normalize_text(text) for text in avoid}
+    for round_number in range(1 + settings.QUIZ_REGENERATE_ATTEMPTS):
+        missing = num_questions - len(questions)
+        if missing <= 0:
+            return
+        if round_number:
+            print(f"Quiz Generation: regenerating {missing} of {num_questions} questions for '{subtopic}'")
+
+        messages = _quiz_messages(topic, subtopic, difficulty, language, missing, user_status,
+                                  avoid=[*avoid, *(q["question"] for q in questions)])
+        parser = JsonObjectStream()
+        rejected = 0
+        # Streamed from the model itself, without a prompt | model | parser
+        # sequence: a sequence runs each step in its own task and leaves the
+        # model's stream for the garbage collector when closed early.
+        async with aclosing(get_llm("quiz").astream(messages)) as chunks:
+            async for chunk in chunks:
+                for raw in parser.feed(chunk.content):
+                    question = _parse_question(raw)
+                    if question is None:
+                        record_parse_failure("quiz")
+                    if question is None or normalize_text(question["question"]) in seen:
+                        rejected += 1
+                        print(f"Quiz Generation: dropped question: {raw[:200]}")
+                        continue
+                    seen.add(normalize_text(question["question"]))
+                    question["id"] = len(questions) + 1
+                    questions.append(question)
+                    yield question
+                    if len(questions) == num_questions:
+                        return
+        if parser.pending():
+            record_parse_failure("quiz")
+            print(f"Quiz Generation: output ended inside a question: {parser.pending()[:200]}")
+
+async def generate_quiz_questions(topic: str, subtopic: str, difficulty: str, language: str = "English", num_questions: int = 5, user_status: str = "novice", avoid: list = ()):
+    questions = []
+    try:
+        async for question in stream_quiz_questions(topic, subtopic, difficulty, language, num_questions, user_status, avoid):
+            questions.append(question)
+    except LLMOverloaded:
+        raise
+    except Exception as e:
+        # Keep whatever was already validated
+        print(f"Quiz Generation Error: {e}")
+    return questions
+
+def _review_chain(topic: str, subtopic: str, score: int, total_questions: int, time_taken: int, attempt_data: list):
     review_prompt = ChatPromptTemplate.from_messages([
         ("system", """You are an expert AI Tutor and Reviewer. Your goal is to provide a constructive, detailed, and personalized review of a student's quiz performance.
         
@@ -122,24 +172,37 @@ async def generate_quiz_review(topic: str, subtopic: str, score: int, total_ques
         """)
     ])
     
-    chain = review_prompt | llm | StrOutputParser()
+    chain = review_prompt | get_llm("quiz_review") | StrOutputParser()
     
+    # Format attempt data for the prompt to be readable
+    formatted_data = json.dumps(attempt_data, indent=2)
+    correct_count = int((score / 100) * total_questions)
+    inputs = {
+        "topic": topic,
+        "subtopic": subtopic,
+        "score": score,
+        "correct": correct_count,
+        "total": total_questions,
+        "time_taken": time_taken,
+        "attempt_data": formatted_data
+    }
+    return chain, inputs
+
+async def generate_quiz_review(topic: str, subtopic: str, score: int, total_questions: int, time_taken: int, attempt_data: list):
+    """
+    Generates a detailed review of the user's quiz performance.
+    """
     try:
-        # Format attempt data for the prompt to be readable
-        formatted_data = json.dumps(attempt_data, indent=2)
-        correct_count = int((score / 100) * total_questions)
-        
-        review = await chain.ainvoke({
-            "topic": topic,
-            "subtopic": subtopic,
-            "score": score,
-            "correct": correct_count,
-            "total": total_questions,
-            "time_taken": time_taken,
-            "attempt_data": formatted_data
-        })
+        chain, inputs = _review_chain(topic, subtopic, score, total_questions, time_taken, attempt_data)
+        review = await chain.ainvoke(inputs)
         return review
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"Review Generation Error: {e}")
         return "Unable to generate review at this time."
 
+def stream_quiz_review(topic: str, subtopic: str, score: int, total_questions: int, time_taken: int, attempt_data: list):
+    """Same review as generate_quiz_review, yielded in chunks. Errors propagate to the caller."""
+    chain, inputs = _review_chain(topic, subtopic, score, total_questions, time_taken, attempt_data)
+    return chain.astream(inputs)
@@ -1,14 +1,6 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from app.core.config import settings
-
-# Initialize Ollama
-llm = ChatOllama(
-    base_url=settings.OLLAMA_BASE_URL,
-    model="llama3:8b",
-    temperature=0.7
-)
+from app.llm import get_llm
 
 async def get_tutor_response(topic: str, message: str, history: list = []) -> str:
     # Construct history string
@@ -26,7 +18,7 @@ async def get_tutor_response(topic: str, message: str, history: list = []) -> st
         Professor:"""
     )
     
-    chain = prompt | llm | StrOutputParser()
+    chain = prompt | get_llm("rag") | StrOutputParser()
     
     response = await chain.ainvoke({
         "topic": topic,
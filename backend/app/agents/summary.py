@@ -0,0 +1,34 @@
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from app.llm import get_llm
+
+async def summarize_conversation(previous_summary: str, messages: list, max_words: int) -> str:
+    """
+    Folds messages that no longer fit the chat context into the running summary.
+    messages: List of {"role": "user" | "assistant", "content": "..."}, oldest first
+    """
+    transcript = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+
+    prompt = ChatPromptTemplate.from_template(
+        """You maintain the running summary of a tutoring conversation.
+        Update the summary below with the new messages. Keep what the learner is working on,
+        what they already understood or struggled with, problems or code that were discussed,
+        and any preferences they stated. Drop greetings and small talk.
+        Answer with the updated summary only, in at most {max_words} words.
+
+        Current summary:
+        {summary}
+
+        New messages:
+        {transcript}
+
+        Updated summary:"""
+    )
+
+    chain = prompt | get_llm("summary") | StrOutputParser()
+    summary = await chain.ainvoke({
+        "summary": previous_summary or "(none yet)",
+        "transcript": transcript,
+        "max_words": max_words
+    })
+    return summary.strip()
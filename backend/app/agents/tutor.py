@@ -1,18 +1,12 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from app.core.config import settings
+from app.llm import get_llm
 
-# Initialize Ollama
-llm = ChatOllama(
-    base_url=settings.OLLAMA_BASE_URL,
-    model="llama3:8b",
-    temperature=0.7
-)
-
-async def get_tutor_response(topic: str, message: str, history: list = []) -> str:
-    # Construct history string
-    history_str = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history[-5:]]) # Limit context window to last 5
+def _tutor_chain(topic: str, message: str, history: list, summary: str = ""):
+    # history is already cut to the context budget, with anything older in summary
+    history_str = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history])
+    if summary:
+        history_str = f"(Summary of earlier messages: {summary})\n{history_str}"
     
     prompt = ChatPromptTemplate.from_template(
         """You are a master professor in {topic}. Explain any queries asked by the user.
@@ -26,12 +20,21 @@ async def get_tutor_response(topic: str, message: str, history: list = []) -> st
         Professor:"""
     )
     
-    chain = prompt | llm | StrOutputParser()
-    
-    response = await chain.ainvoke({
+    chain = prompt | get_llm("tutor") | StrOutputParser()
+    inputs = {
         "topic": topic,
         "history": history_str,
         "message": message
-    })
+    }
+    return chain, inputs
+
+async def get_tutor_response(topic: str, message: str, history: list = [], summary: str = "") -> str:
+    chain, inputs = _tutor_chain(topic, message, history, summary)
+    response = await chain.ainvoke(inputs)
     
     return response
+
+def stream_tutor_response(topic: str, message: str, history: list = [], summary: str = ""):
+    """Same as get_tutor_response but yields the reply in chunks as it is generated."""
+    chain, inputs = _tutor_chain(topic, message, history, summary)
+    return chain.astream(inputs)
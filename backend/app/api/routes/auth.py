@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from app.db import get_db
-import sqlite3
+from app.db import run_db, IntegrityError
+from app import queries
 import hashlib
 
 router = APIRouter()
@@ -19,25 +19,28 @@ def hash_password(password: str) -> str:
 
 @router.post("/signup", response_model=UserResponse)
 async def signup(user: UserAuth):
-    with get_db() as conn:
+    def insert_user(conn):
         c = conn.cursor()
         try:
             c.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", 
                      (user.username, hash_password(user.password)))
             conn.commit()
-            return {"id": c.lastrowid, "username": user.username}
-        except sqlite3.IntegrityError:
+            return c.lastrowid
+        except IntegrityError:
             raise HTTPException(status_code=400, detail="Username already exists")
 
+    user_id = await run_db(insert_user)
+    return {"id": user_id, "username": user.username}
+
 @router.post("/login", response_model=UserResponse)
 async def login(user: UserAuth):
-    with get_db() as conn:
+    def find_user(conn):
         c = conn.cursor()
-        c.execute("SELECT id, username FROM users WHERE username = ? AND password_hash = ?", 
-                 (user.username, hash_password(user.password)))
-        user_data = c.fetchone()
+        c.execute(queries.LOGIN, (user.username, hash_password(user.password)))
+        return c.fetchone()
+
+    user_data = await run_db(find_user)
+    if not user_data:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        if not user_data:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-            
-        return {"id": user_data["id"], "username": user_data["username"]}
+    return {"id": user_data["id"], "username": user_data["username"]}
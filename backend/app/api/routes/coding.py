@@ -2,7 +2,12 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 from app.models.coding import CreateSessionRequest, ChatRequest, AnalyzeRequest, AnalyzeResponse
 from app.agents.coding import get_tutor_response, analyze_code
-from app.db import get_db
+from app.chat_context import load_context
+from app.db import run_db
+from app import queries
+from app.jobs import job_queue
+from app.llm import check_stream_capacity
+from app.message_writer import message_writer
 import json
 import asyncio
 
@@ -10,51 +15,50 @@ router = APIRouter()
 
 @router.post("/start")
 async def start_session(request: CreateSessionRequest):
-    with get_db() as conn:
+    def insert_session(conn):
         c = conn.cursor()
         c.execute("""
             INSERT INTO coding_sessions (user_id, language, title)
             VALUES (?, ?, ?)
         """, (request.user_id, request.language, f"{request.language} - {request.topic}"))
         conn.commit()
-        session_id = c.lastrowid
-        
-        # Add initial system greeting as assistant message?
-        # Actually better to let the AI generate the first greeting based on the topic.
+        return c.lastrowid
+
+    session_id = await run_db(insert_session)
+    
+    # Add initial system greeting as assistant message?
+    # Actually better to let the AI generate the first greeting based on the topic.
         
     return {"session_id": session_id}
 
 @router.post("/chat")
 async def chat(request: ChatRequest):
+    check_stream_capacity("coding")
+
     # 1. Fetch History
-    history = []
-    language = "Python" # Default
-    
-    with get_db() as conn:
+    def load_session(conn):
         c = conn.cursor()
         # Get session info
         c.execute("SELECT language FROM coding_sessions WHERE id = ?", (request.session_id,))
         row = c.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Session not found")
-        language = row["language"]
         
-        # Get messages
-        c.execute("SELECT role, content FROM coding_messages WHERE session_id = ? ORDER BY created_at ASC", (request.session_id,))
-        rows = c.fetchall()
-        history = [{"role": r["role"], "content": r["content"]} for r in rows]
+        # Get the summary and the recent messages that fit the context budget
+        message_writer.ensure_flushed("coding_messages", request.session_id)
+        return row["language"], load_context(conn, "coding_messages", request.session_id)
 
-    # 2. Save User Message
-    with get_db() as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO coding_messages (session_id, role, content) VALUES (?, ?, ?)", 
-                  (request.session_id, "user", request.message))
-        conn.commit()
+    language, context = await run_db(load_session)
+    if context.summary_pending:
+        job_queue.notify()
+
+    # 2. Save User Message (batched by the write-behind queue)
+    message_writer.enqueue("coding_messages", request.session_id, "user", request.message)
 
     # 3. Generate Response (Streaming)
     async def generate():
         full_response = ""
-        stream = await get_tutor_response(history, request.message, language)
+        stream = await get_tutor_response(context.messages, request.message, language, context.summary)
         async for chunk in stream:
             full_response += chunk
             yield chunk
@@ -62,11 +66,7 @@ async def chat(request: ChatRequest):
         # 4. Save Assistant Response (after streaming completes)
         # Note: In a real async production app, we might need a separate callback or background task for this 
         # to ensure it saves even if connection drops, but this is fine for now.
-        with get_db() as conn:
-            c = conn.cursor()
-            c.execute("INSERT INTO coding_messages (session_id, role, content) VALUES (?, ?, ?)", 
-                      (request.session_id, "assistant", full_response))
-            conn.commit()
+        message_writer.enqueue("coding_messages", request.session_id, "assistant", full_response)
 
     return StreamingResponse(generate(), media_type="text/plain")
 
@@ -77,15 +77,17 @@ async def analyze(request: AnalyzeRequest):
 
 @router.get("/sessions/{user_id}")
 async def get_user_sessions(user_id: int):
-    with get_db() as conn:
+    def list_sessions(conn):
         c = conn.cursor()
-        c.execute("SELECT * FROM coding_sessions WHERE user_id = ? ORDER BY created_at DESC", (user_id,))
+        c.execute(queries.CODING_SESSIONS, (user_id,))
         rows = c.fetchall()
         return [dict(row) for row in rows]
+
+    return await run_db(list_sessions)
         
 @router.get("/session/{session_id}")
 async def get_session_details(session_id: int):
-     with get_db() as conn:
+    def load_details(conn):
         c = conn.cursor()
         # Get Session Info
         c.execute("SELECT * FROM coding_sessions WHERE id = ?", (session_id,))
@@ -94,10 +96,13 @@ async def get_session_details(session_id: int):
              raise HTTPException(status_code=404, detail="Session not found")
              
         # Get Messages
-        c.execute("SELECT * FROM coding_messages WHERE session_id = ? ORDER BY created_at ASC", (session_id,))
+        message_writer.ensure_flushed("coding_messages", session_id)
+        c.execute(queries.CODING_HISTORY, (session_id,))
         msg_rows = c.fetchall()
         
         return {
             "session": dict(session_row),
             "messages": [dict(r) for r in msg_rows]
         }
+
+    return await run_db(load_details)
@@ -1,71 +1,330 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from app.models.content import ContentRequest, ContentResponse
-from app.agents.content import generate_content
-from app.db import get_db
+from app.agents.content import generate_content, stream_content
+from app.db import run_db
+from app import queries
+from app.core.config import settings
+from app.content_cache import content_cache
+from app.jobs import job_queue
+from app.llm import check_llm_capacity, check_stream_capacity
+from app.llm_scheduler import LLMOverloaded
+from app.prefetch import LESSON_JOB, prefetch_stats
+from app.singleflight import SingleFlight
+from app.sse import SSE_HEADERS, sse_event
+import asyncio
 import json
 from pydantic import BaseModel
+from typing import List
 
 router = APIRouter()
 
+# Identical requests for one roadmap node share a single generation
+content_flights = SingleFlight()
+
 class DBContentRequest(ContentRequest):
     roadmap_id: int
 
 @router.post("/generate", response_model=ContentResponse)
 async def create_content(request: DBContentRequest):
     try:
-        # Check DB first
-        with get_db() as conn:
-            c = conn.cursor()
-            c.execute("""
-                SELECT content_json FROM node_content 
-                WHERE roadmap_id = ? AND node_label = ? AND mode = ?
-            """, (request.roadmap_id, request.subtopic, request.mode))
-            row = c.fetchone()
-            
-            if row:
-                return json.loads(row["content_json"])
-
-        # Fetch User Status for Adaptive Learning
-        user_status = "novice"
-        with get_db() as conn:
-            c = conn.cursor()
-            # Get user_id from roadmap
-            c.execute("SELECT user_id, topic FROM roadmaps WHERE id = ?", (request.roadmap_id,))
-            roadmap_row = c.fetchone()
-            
-            if roadmap_row:
-                user_id = roadmap_row["user_id"]
-                topic = roadmap_row["topic"]
-                
-                # Get knowledge status
-                c.execute("SELECT status FROM user_knowledge WHERE user_id = ? AND topic = ? AND subtopic = ?", 
-                          (user_id, topic, request.subtopic))
-                knowledge_row = c.fetchone()
-                if knowledge_row:
-                    user_status = knowledge_row["status"]
-
-        # Generate if not found
-        content = await generate_content(
-            request.topic, 
-            request.subtopic, 
-            request.mode, 
-            request.difficulty, 
-            request.language,
-            request.images,
-            request.videos,
-            user_status=user_status,
-            interest=request.interest
+        return await content_flights.do(
+            (request.roadmap_id, request.subtopic, request.mode),
+            lambda: _load_or_generate(request)
         )
-        
-        # Save to DB
-        with get_db() as conn:
-            c = conn.cursor()
-            c.execute("""
-                INSERT INTO node_content (roadmap_id, node_label, mode, content_json)
-                VALUES (?, ?, ?, ?)
-            """, (request.roadmap_id, request.subtopic, request.mode, content.json()))
-            conn.commit()
-            
-        return content
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def _find_node_content(request: DBContentRequest, count_prefetch_hit: bool = True):
+    def find_cached(conn):
+        c = conn.cursor()
+        c.execute(queries.NODE_CONTENT, (request.roadmap_id, request.subtopic, request.mode))
+        row = c.fetchone()
+        if not row or not row["prefetched"] or not count_prefetch_hit:
+            return row, False
+        # First time the user opens a prefetched lesson
+        c.execute("""
+            UPDATE node_content SET prefetched = 0
+            WHERE roadmap_id = ? AND node_label = ? AND mode = ? AND prefetched = 1
+        """, (request.roadmap_id, request.subtopic, request.mode))
+        conn.commit()
+        return row, c.rowcount == 1
+
+    row, prefetch_hit = await run_db(find_cached)
+    if prefetch_hit:
+        prefetch_stats.lesson_hits += 1
+    return json.loads(row["content_json"]) if row else None
+
+async def _find_user_status(request: DBContentRequest) -> str:
+    def find_user_status(conn):
+        c = conn.cursor()
+        # Get user_id from roadmap
+        c.execute("SELECT user_id, topic FROM roadmaps WHERE id = ?", (request.roadmap_id,))
+        roadmap_row = c.fetchone()
+        
+        if roadmap_row:
+            user_id = roadmap_row["user_id"]
+            topic = roadmap_row["topic"]
+            
+            # Get knowledge status
+            c.execute(queries.USER_STATUS, (user_id, topic, request.subtopic))
+            knowledge_row = c.fetchone()
+            if knowledge_row:
+                return knowledge_row["status"]
+        return "novice"
+
+    return await run_db(find_user_status)
+
+async def _save_node_content(request: DBContentRequest, content: ContentResponse, prefetched: bool = False) -> bool:
+    # Another worker process may have stored it meanwhile, and the roadmap may
+    # have been deleted while the lesson was generating
+    def save_content(conn):
+        c = conn.cursor()
+        c.execute("""
+            INSERT INTO node_content (roadmap_id, node_label, mode, content_json, prefetched)
+            SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM roadmaps WHERE id = ?)
+            ON CONFLICT (roadmap_id, node_label, mode) DO NOTHING
+        """, (request.roadmap_id, request.subtopic, request.mode, content.json(), int(prefetched), request.roadmap_id))
+        conn.commit()
+        return c.rowcount == 1
+
+    return await run_db(save_content)
+
+async def _load_or_generate(request: DBContentRequest, prefetch: bool = False, user_status: str = None):
+    # Check DB first
+    stored = await _find_node_content(request, count_prefetch_hit=not prefetch)
+    if stored:
+        return stored
+
+    # Fetch User Status for Adaptive Learning, unless the caller already has it
+    if user_status is None:
+        user_status = await _find_user_status(request)
+
+    # Generate if not found
+    content = await generate_content(
+        request.topic, 
+        request.subtopic, 
+        request.mode, 
+        request.difficulty, 
+        request.language,
+        request.images,
+        request.videos,
+        user_status=user_status,
+        interest=request.interest,
+        objective=request.objective
+    )
+    
+    if await _save_node_content(request, content, prefetched=prefetch) and prefetch:
+        prefetch_stats.lessons += 1
+        
+    return content
+
+async def open_lesson(request: DBContentRequest, user_status: str) -> dict:
+    """
+    The node's lesson for a learner whose status is already known: stored, or
+    generated and saved. Shares the generation with /generate for the node.
+    """
+    content = await content_flights.do(
+        (request.roadmap_id, request.subtopic, request.mode),
+        lambda: _load_or_generate(request, user_status=user_status)
+    )
+    return content if isinstance(content, dict) else content.dict()
+
+async def run_prefetch_lesson(payload: dict, report) -> str:
+    """Job handler for app.prefetch: stores one lesson in node_content."""
+    request = DBContentRequest(**payload)
+    # Cancelling the job (roadmap edited or deleted) stops the generation,
+    # unless a user request for the same node is waiting on it too
+    await content_flights.do(
+        (request.roadmap_id, request.subtopic, request.mode),
+        lambda: _load_or_generate(request, prefetch=True),
+        cancel_orphaned=True
+    )
+    return ""
+
+job_queue.register(LESSON_JOB, run_prefetch_lesson)
+
+async def _stream_and_save(request: DBContentRequest, updates: asyncio.Queue):
+    """
+    Flight body for /generate/stream: generates the lesson with
+    stream_content, handing its media and token events to the request that
+    started the flight, and saves it like _load_or_generate does.
+    """
+    user_status = await _find_user_status(request)
+    async for event, data in stream_content(
+        request.topic,
+        request.subtopic,
+        request.mode,
+        request.difficulty,
+        request.language,
+        request.images,
+        request.videos,
+        user_status=user_status,
+        interest=request.interest,
+        objective=request.objective
+    ):
+        if event == "done":
+            await _save_node_content(request, data)
+            return data
+        updates.put_nowait((event, data))
+
+def _replay(lesson: dict):
+    """A finished lesson as /generate/stream events."""
+    yield sse_event("media", {"images": lesson.get("images", []), "videos": lesson.get("videos", [])})
+    yield sse_event("token", {"text": lesson.get("content", "")})
+    yield sse_event("done", lesson)
+
+@router.post("/generate/stream")
+async def stream_content_route(request: DBContentRequest):
+    """
+    Server-sent events version of /generate. Every response, stored or fresh,
+    uses the same protocol: one or more "token" events carrying lesson text
+    and one "media" event, which a fresh lesson sends as soon as its
+    searches finish (usually before the first token), then "done" with the
+    full ContentResponse after it has been saved. Failures end the stream
+    with an "error" event.
+
+    Fresh lessons share content_flights with /generate: the request that
+    starts the generation streams its tokens, and requests that join it
+    receive the finished lesson as if it had been stored.
+    """
+    stored = await _find_node_content(request)
+    check_stream_capacity("content", request.mode, needs_model=not stored)
+
+    async def events():
+        if stored:
+            for event in _replay(stored):
+                yield event
+            return
+
+        # Only fills up if this request starts the flight
+        updates = asyncio.Queue()
+        flight = asyncio.ensure_future(content_flights.do(
+            (request.roadmap_id, request.subtopic, request.mode),
+            lambda: _stream_and_save(request, updates)
+        ))
+        streamed = False
+        try:
+            while not flight.done() or not updates.empty():
+                update = asyncio.ensure_future(updates.get())
+                await asyncio.wait({update, flight}, return_when=asyncio.FIRST_COMPLETED)
+                if not update.done():
+                    update.cancel()
+                    continue
+                event, data = update.result()
+                streamed = True
+                yield sse_event(event, {"text": data} if event == "token" else data)
+            lesson = flight.result()
+            lesson = lesson if isinstance(lesson, dict) else lesson.dict()
+            if streamed:
+                yield sse_event("done", lesson)
+            else:
+                for event in _replay(lesson):
+                    yield event
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            # The shared generation carries on and is saved even if this client left
+            flight.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+class BatchContentRequest(BaseModel):
+    roadmap_id: int
+    # Every node gets a lesson in every mode
+    nodes: List[str]
+    modes: List[str] = ["story"]
+
+def _load_batch(conn, roadmap_id: int, labels: list, modes: list):
+    """Roadmap settings, the owner's status per node and the lessons already stored."""
+    c = conn.cursor()
+    # One query for the roadmap and all of its owner's statuses on the topic
+    c.execute(queries.BATCH_ROADMAP, (roadmap_id,))
+    rows = c.fetchall()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Roadmap not found")
+    statuses = {row["subtopic"]: row["status"] for row in rows if row["subtopic"] is not None}
+
+    placeholders = ", ".join("?" * len(labels))
+    c.execute(queries.BATCH_STORED.format(placeholders=placeholders), (roadmap_id, *labels))
+    stored = {(row["node_label"], row["mode"]): json.loads(row["content_json"])
+              for row in c.fetchall() if row["mode"] in modes}
+    return dict(rows[0]), statuses, stored
+
+@router.post("/generate/batch")
+async def generate_content_batch(request: BatchContentRequest):
+    """
+    Lessons for many nodes of one roadmap, e.g. a whole branch for offline
+    study. Stored lessons are sent first, then missing ones are generated at
+    most CONTENT_BATCH_CONCURRENCY at a time. Server-sent events: one "node"
+    per (node, mode) with status "stored", "generated" or "failed", then
+    "done" with the counts.
+
+    Each lesson is saved on its own as soon as it is generated, not in one
+    transaction at the end: it is also the result of the /generate flight
+    for its node, which joiners expect to find stored, and a failure or a
+    client leaving midway keeps the lessons already finished.
+    """
+    labels = list(dict.fromkeys(request.nodes))
+    modes = list(dict.fromkeys(request.modes))
+    if not labels or not modes:
+        raise HTTPException(status_code=422, detail="nodes and modes must not be empty")
+    roadmap, statuses, stored = await run_db(_load_batch, request.roadmap_id, labels, modes)
+    missing = [(label, mode) for label in labels for mode in modes if (label, mode) not in stored]
+    if missing:
+        check_llm_capacity("content", missing[0][1])
+
+    async def generate(semaphore, label, mode):
+        async with semaphore:
+            # The same flight /generate runs for the node, so whoever joins it gets a saved lesson
+            node = DBContentRequest(roadmap_id=request.roadmap_id, topic=roadmap["topic"], subtopic=label,
+                                    mode=mode, difficulty=roadmap["difficulty"], language=roadmap["language"],
+                                    interest=roadmap["interest"], objective=roadmap["objective"])
+            content = await content_flights.do(
+                (request.roadmap_id, label, mode),
+                lambda: _load_or_generate(node, user_status=statuses.get(label, "novice"))
+            )
+        return content if isinstance(content, dict) else content.dict()
+
+    async def events():
+        for label in labels:
+            for mode in modes:
+                if (label, mode) in stored:
+                    yield sse_event("node", {"node": label, "mode": mode, "status": "stored",
+                                             "content": stored[(label, mode)]})
+
+        semaphore = asyncio.Semaphore(settings.CONTENT_BATCH_CONCURRENCY)
+        tasks = {asyncio.ensure_future(generate(semaphore, label, mode)): (label, mode) for label, mode in missing}
+        generated = failed = 0
+        try:
+            pending = set(tasks)
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    label, mode = tasks[task]
+                    if task.exception():
+                        failed += 1
+                        yield sse_event("node", {"node": label, "mode": mode, "status": "failed",
+                                                 "detail": str(task.exception())})
+                    else:
+                        generated += 1
+                        yield sse_event("node", {"node": label, "mode": mode, "status": "generated",
+                                                 "content": task.result()})
+            yield sse_event("done", {"stored": len(stored), "generated": generated, "failed": failed})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return content_cache.stats()
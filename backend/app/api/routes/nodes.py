@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.api.routes.content import DBContentRequest, open_lesson
+from app.api.routes.quiz import QuizGenerateRequest, open_quiz, quiz_needs_model
+from app.db import run_db
+from app import queries
+from app.llm import check_stream_capacity
+from app.sse import SSE_HEADERS, sse_event
+import asyncio
+
+router = APIRouter()
+
+class NodeOpenRequest(BaseModel):
+    roadmap_id: int
+    node: str
+    mode: str = "story"
+
+def _load_node(conn, roadmap_id: int, label: str, mode: str):
+    """The roadmap's settings, its owner's status on the node and whether the lesson is stored, in one query."""
+    c = conn.cursor()
+    c.execute(queries.OPEN_NODE, (label, label, mode, roadmap_id))
+    row = c.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Roadmap not found")
+    return dict(row)
+
+@router.post("/open")
+async def open_node(request: NodeOpenRequest):
+    """
+    Everything the learner needs when they open a roadmap node: the lesson in
+    `mode` and a quiz. The learner's status is looked up once and both start
+    at the same time, so a fresh node takes as long as the slower of the two
+    rather than their sum. Server-sent events: "lesson" with the
+    ContentResponse and "quiz" with {"questions": [...]}, in whichever order
+    they finish, "failed" with {"part", "detail"} for a part that could not be
+    produced, then "done" with the list of failed parts.
+    """
+    node = await run_db(_load_node, request.roadmap_id, request.node, request.mode)
+    user_status = node["status"] or "novice"
+    difficulty, language = node["difficulty"] or "Normal", node["language"] or "English"
+    lesson = DBContentRequest(roadmap_id=request.roadmap_id, topic=node["topic"], subtopic=request.node,
+                              mode=request.mode, difficulty=difficulty, language=language,
+                              interest=node["interest"], objective=node["objective"])
+    quiz = QuizGenerateRequest(topic=node["topic"], subtopic=request.node, difficulty=difficulty,
+                               language=language, roadmap_id=request.roadmap_id)
+    # Both parts are checked up front; a part the model rejects mid-stream would only be a "failed" event
+    check_stream_capacity("content", request.mode, needs_model=not node["stored"])
+    check_stream_capacity("quiz", needs_model=await run_db(quiz_needs_model, quiz, node["user_id"] or 0, user_status))
+
+    async def make_quiz():
+        return {"questions": await open_quiz(quiz, node["user_id"] or 0, user_status)}
+
+    async def events():
+        # Both go through the shared single-flight groups, so a lesson or quiz
+        # still generating when the client leaves is finished and stored
+        tasks = {asyncio.ensure_future(open_lesson(lesson, user_status)): "lesson",
+                 asyncio.ensure_future(make_quiz()): "quiz"}
+        failed = []
+        try:
+            pending = set(tasks)
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    part = tasks[task]
+                    if task.exception():
+                        failed.append(part)
+                        yield sse_event("failed", {"part": part, "detail": str(task.exception())})
+                    else:
+                        yield sse_event(part, task.result())
+            yield sse_event("done", {"failed": failed})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,13 +1,28 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any
-from app.agents.quiz import generate_quiz_questions, generate_quiz_review
+from app.agents.quiz import generate_quiz_questions, stream_quiz_questions, stream_quiz_review
 from app.agents.digital_twin import update_knowledge_state
-from app.db import get_db
+from app.core.config import settings
+from app.db import run_db
+from app import queries
+from app.jobs import add_job, job_queue
+from app.llm import check_stream_capacity
+from app.llm_scheduler import LLMOverloaded
+from app.prefetch import QUIZ_JOB, prefetch_stats
+from app.question_bank import (bucket_for, mark_seen, numbered, pick_unseen, question_bank_stats,
+                               recent_questions, store_questions)
+from app.singleflight import SingleFlight
+from app.sse import SSE_HEADERS, sse_event
+import asyncio
 import json
 
 router = APIRouter()
 
+# Concurrent top-ups of one question bank bucket share a single generation
+quiz_flights = SingleFlight()
+
 class QuizGenerateRequest(BaseModel):
     topic: str
     subtopic: str
@@ -25,38 +40,224 @@ class QuizSubmitRequest(BaseModel):
     time_taken: Dict[str, int] # Question ID -> Seconds taken
     total_time: int
 
-@router.post("/generate")
-async def generate_quiz(request: QuizGenerateRequest):
-    try:
-        user_status = "novice"
+async def _find_learner(roadmap_id: int, topic: str, subtopic: str):
+    """Returns (user_id, status) for the roadmap's owner, or (0, "novice") if there is none."""
+    def find_learner(conn):
+        c = conn.cursor()
+        # Get user_id from roadmap
+        c.execute("SELECT user_id FROM roadmaps WHERE id = ?", (roadmap_id,))
+        roadmap_row = c.fetchone()
         
-        if request.roadmap_id:
-            with get_db() as conn:
-                c = conn.cursor()
-                # Get user_id from roadmap
-                c.execute("SELECT user_id FROM roadmaps WHERE id = ?", (request.roadmap_id,))
-                roadmap_row = c.fetchone()
-                
-                if roadmap_row:
-                    user_id = roadmap_row["user_id"]
-                    # Get knowledge status
-                    c.execute("SELECT status FROM user_knowledge WHERE user_id = ? AND topic = ? AND subtopic = ?", 
-                              (user_id, request.topic, request.subtopic))
-                    knowledge_row = c.fetchone()
-                    if knowledge_row:
-                        user_status = knowledge_row["status"]
+        if roadmap_row:
+            user_id = roadmap_row["user_id"]
+            # Get knowledge status
+            c.execute(queries.USER_STATUS, (user_id, topic, subtopic))
+            knowledge_row = c.fetchone()
+            return user_id, knowledge_row["status"] if knowledge_row else "novice"
+        return 0, "novice"
+
+    return await run_db(find_learner)
 
+async def _take_prefetched(request: QuizGenerateRequest, user_status: str):
+    """Returns and removes a prefetched quiz for this node, if one matches."""
+    def take(conn):
+        c = conn.cursor()
+        c.execute(queries.PREFETCHED_QUIZ, (request.roadmap_id, request.subtopic, request.difficulty, request.language, user_status))
+        row = c.fetchone()
+        if not row:
+            return None
+        # Used once, so retaking the quiz still gets fresh questions
+        c.execute("DELETE FROM prefetched_quizzes WHERE roadmap_id = ? AND node_label = ?",
+                  (request.roadmap_id, request.subtopic))
+        conn.commit()
+        return json.loads(row["questions_json"]) if c.rowcount == 1 else None
+
+    questions = await run_db(take)
+    if questions:
+        prefetch_stats.quiz_hits += 1
+    return questions
+
+def _bucket(request: QuizGenerateRequest, user_status: str) -> tuple:
+    return bucket_for(request.topic, request.subtopic, request.difficulty, request.language, user_status)
+
+def _top_up(request: QuizGenerateRequest, user_status: str, missing: int, cancel_orphaned: bool = False,
+            updates: asyncio.Queue = None):
+    """
+    Generates questions into the request's bank bucket. Returns how many were
+    new. With updates, a top-up this call starts streams its questions and
+    puts each new one on the queue as soon as it is stored.
+    """
+    bucket = _bucket(request, user_status)
+
+    async def generate():
+        avoid = await run_db(recent_questions, bucket, settings.QUIZ_BANK_AVOID)
         questions = await generate_quiz_questions(
             request.topic, 
             request.subtopic, 
             request.difficulty, 
             request.language,
-            user_status=user_status
+            num_questions=missing,
+            user_status=user_status,
+            avoid=avoid
         )
-        return {"questions": questions}
+        return len(await run_db(store_questions, bucket, questions))
+
+    async def stream():
+        avoid = await run_db(recent_questions, bucket, settings.QUIZ_BANK_AVOID)
+        new = 0
+        async for question in stream_quiz_questions(
+            request.topic,
+            request.subtopic,
+            request.difficulty,
+            request.language,
+            num_questions=missing,
+            user_status=user_status,
+            avoid=avoid
+        ):
+            # Stored one by one, so the bank keeps them even if the client leaves
+            for stored in await run_db(store_questions, bucket, [question]):
+                new += 1
+                updates.put_nowait(stored)
+        return new
+
+    # Keyed by the count too: a request only joins a top-up as big as its own shortfall
+    return quiz_flights.do((bucket, missing), generate if updates is None else stream, cancel_orphaned=cancel_orphaned)
+
+async def _assemble_quiz(request: QuizGenerateRequest, user_id: int, user_status: str, cancel_orphaned: bool = False):
+    """
+    Picks questions the user hasn't seen from the bank, topping the bucket up
+    through the model first if it has too few. Generated questions that
+    duplicate banked ones are dropped, so the shortfall is topped up again,
+    up to QUIZ_TOP_UP_ATTEMPTS times. Returns (questions, from_bank).
+    """
+    bucket = _bucket(request, user_status)
+    questions = await run_db(pick_unseen, bucket, user_id, settings.QUIZ_QUESTIONS)
+    from_bank = len(questions)
+    for _ in range(settings.QUIZ_TOP_UP_ATTEMPTS):
+        if len(questions) >= settings.QUIZ_QUESTIONS:
+            break
+        await _top_up(request, user_status, settings.QUIZ_QUESTIONS - len(questions), cancel_orphaned)
+        questions = await run_db(pick_unseen, bucket, user_id, settings.QUIZ_QUESTIONS)
+    return questions, min(from_bank, len(questions))
+
+async def _serve(user_id: int, questions: list, from_bank: int) -> list:
+    """Records the questions as seen by the user and numbers them for the client."""
+    await run_db(mark_seen, user_id, questions)
+    question_bank_stats.quizzes += 1
+    question_bank_stats.from_bank += from_bank
+    question_bank_stats.generated += len(questions) - from_bank
+    return numbered(questions)
+
+def quiz_needs_model(conn, request: QuizGenerateRequest, user_id: int, user_status: str) -> bool:
+    """Whether open_quiz would generate: no prefetched quiz and too few unseen questions in the bank."""
+    if request.roadmap_id and conn.execute(queries.PREFETCHED_QUIZ, (
+            request.roadmap_id, request.subtopic, request.difficulty, request.language, user_status)).fetchone():
+        return False
+    unseen = pick_unseen(conn, _bucket(request, user_status), user_id, settings.QUIZ_QUESTIONS)
+    return len(unseen) < settings.QUIZ_QUESTIONS
+
+async def open_quiz(request: QuizGenerateRequest, user_id: int, user_status: str) -> list:
+    """Quiz questions for a learner whose status is already known: a prefetched quiz, else the bank."""
+    if request.roadmap_id:
+        questions = await _take_prefetched(request, user_status)
+        if questions:
+            # Prepared by the prefetcher, not picked from the bank for this request
+            return await _serve(user_id, questions, 0)
+
+    questions, from_bank = await _assemble_quiz(request, user_id, user_status)
+    return await _serve(user_id, questions, from_bank)
+
+@router.post("/generate")
+async def generate_quiz(request: QuizGenerateRequest):
+    try:
+        user_id, user_status = 0, "novice"
+        
+        if request.roadmap_id:
+            user_id, user_status = await _find_learner(request.roadmap_id, request.topic, request.subtopic)
+
+        return {"questions": await open_quiz(request, user_id, user_status)}
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate/stream")
+async def generate_quiz_stream(request: QuizGenerateRequest):
+    """
+    Server-sent events version of /generate: a "question" event for each
+    question, as soon as it is picked from the bank or generated and
+    validated, then "done" with the full list. Ends with "error" only if no
+    question could be found or generated; a failure after some questions
+    still finishes with those.
+
+    Top-ups share quiz_flights with /generate: the request that starts one
+    streams its questions, and requests that join it pick theirs from the
+    bank once it is done. Like /generate, the shortfall left by duplicates
+    is topped up again, up to QUIZ_TOP_UP_ATTEMPTS times.
+    """
+    user_id, user_status = 0, "novice"
+    prefetched = None
+    if request.roadmap_id:
+        user_id, user_status = await _find_learner(request.roadmap_id, request.topic, request.subtopic)
+        prefetched = await _take_prefetched(request, user_status)
+    bucket = _bucket(request, user_status)
+    if prefetched:
+        # Served as prepared, like open_quiz does, so it never needs a model that could reject it
+        picked = prefetched
+    else:
+        picked = await run_db(pick_unseen, bucket, user_id, settings.QUIZ_QUESTIONS)
+        check_stream_capacity("quiz", needs_model=len(picked) < settings.QUIZ_QUESTIONS)
+
+    async def events():
+        questions = []
+        for question in picked:
+            questions.append(question)
+            yield sse_event("question", {**question, "id": len(questions)})
+        flight = None
+        try:
+            for _ in range(0 if prefetched else settings.QUIZ_TOP_UP_ATTEMPTS):
+                missing = settings.QUIZ_QUESTIONS - len(questions)
+                if missing <= 0:
+                    break
+                # Only fills up if this request starts the top-up
+                updates = asyncio.Queue()
+                flight = asyncio.ensure_future(_top_up(request, user_status, missing, updates=updates))
+                while not flight.done() or not updates.empty():
+                    update = asyncio.ensure_future(updates.get())
+                    await asyncio.wait({update, flight}, return_when=asyncio.FIRST_COMPLETED)
+                    if not update.done():
+                        update.cancel()
+                        continue
+                    questions.append(update.result())
+                    yield sse_event("question", {**questions[-1], "id": len(questions)})
+                flight.result()
+                # A joined top-up streamed to another request: take its questions from the bank
+                sent = {question.get("bank_id") for question in questions}
+                unseen = await run_db(pick_unseen, bucket, user_id, settings.QUIZ_QUESTIONS + len(questions))
+                unseen = [question for question in unseen if question["bank_id"] not in sent]
+                for question in unseen[:settings.QUIZ_QUESTIONS - len(questions)]:
+                    questions.append(question)
+                    yield sse_event("question", {**question, "id": len(questions)})
+        except Exception as e:
+            print(f"Quiz Generation Error: {e}")
+            if not questions:
+                yield sse_event("error", {"detail": str(e)})
+                return
+        finally:
+            # The shared top-up carries on and fills the bank even if this client left
+            if flight is not None:
+                flight.cancel()
+        if not questions:
+            yield sse_event("error", {"detail": "No valid questions could be generated"})
+            return
+        yield sse_event("done", {"questions": await _serve(user_id, questions, 0 if prefetched else len(picked))})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/bank/stats")
+async def get_bank_stats():
+    return question_bank_stats.stats()
+
 @router.post("/submit")
 async def submit_quiz(request: QuizSubmitRequest):
     try:
@@ -85,23 +286,23 @@ async def submit_quiz(request: QuizSubmitRequest):
             
         score_percentage = int((correct_count / total_questions) * 100) if total_questions > 0 else 0
         
-        # 2. Generate Review (Async but awaited here for simplicity in response)
-        review_text = await generate_quiz_review(
-            request.topic,
-            request.node_label,
-            score_percentage,
-            total_questions,
-            request.total_time,
-            attempt_data
-        )
+        # 2. Save Attempt and queue its review in one transaction, so a
+        # stored attempt always gets a review even across restarts
+        review_inputs = {
+            "topic": request.topic,
+            "subtopic": request.node_label,
+            "score": score_percentage,
+            "total_questions": total_questions,
+            "time_taken": request.total_time,
+            "attempt_data": attempt_data
+        }
 
-        # 3. Save Attempt to DB
-        with get_db() as conn:
+        def save_attempt(conn):
             c = conn.cursor()
             c.execute("""
                 INSERT INTO quiz_attempts 
-                (user_id, roadmap_id, node_label, score, total_questions, time_taken_seconds, attempt_data_json, review_text)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                (user_id, roadmap_id, node_label, score, total_questions, time_taken_seconds, attempt_data_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (
                 request.user_id, 
                 request.roadmap_id, 
@@ -109,12 +310,16 @@ async def submit_quiz(request: QuizSubmitRequest):
                 score_percentage, 
                 total_questions, 
                 request.total_time, 
-                json.dumps(attempt_data),
-                review_text
+                json.dumps(attempt_data)
             ))
+            job_id = add_job(conn, "quiz_review", {"attempt_id": c.lastrowid, **review_inputs})
             conn.commit()
+            return job_id
+
+        review_job_id = await run_db(save_attempt)
+        job_queue.notify()
             
-        # 4. Update Digital Twin
+        # 3. Update Digital Twin
         knowledge_update = await update_knowledge_state(
             request.user_id,
             request.topic,
@@ -123,13 +328,102 @@ async def submit_quiz(request: QuizSubmitRequest):
             request.total_time
         )
         
+        # The review is generated in the background; poll or stream it by job id
         return {
             "score": score_percentage,
             "correct_count": correct_count,
             "total_questions": total_questions,
             "knowledge_update": knowledge_update,
-            "review": review_text
+            "review_job_id": review_job_id
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def run_review_job(payload: dict, report) -> str:
+    """Job handler: generates the review and stores it on the attempt."""
+    chunks = []
+    async for chunk in stream_quiz_review(
+        payload["topic"],
+        payload["subtopic"],
+        payload["score"],
+        payload["total_questions"],
+        payload["time_taken"],
+        payload["attempt_data"]
+    ):
+        chunks.append(chunk)
+        report(chunk)
+    review_text = "".join(chunks)
+
+    def save_review(conn):
+        conn.execute("UPDATE quiz_attempts SET review_text = ? WHERE id = ?", (review_text, payload["attempt_id"]))
+        conn.commit()
+
+    await run_db(save_review)
+    return review_text
+
+job_queue.register("quiz_review", run_review_job)
+
+async def _review_job(job_id: int):
+    job = await job_queue.get(job_id)
+    if not job or job["kind"] != "quiz_review":
+        raise HTTPException(status_code=404, detail="Review not found")
+    return job
+
+@router.get("/review/{job_id}")
+async def get_review(job_id: int):
+    job = await _review_job(job_id)
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "review": job["result_text"],
+        "error": job["error"] if job["status"] == "failed" else None
+    }
+
+@router.get("/review/{job_id}/stream")
+async def stream_review(job_id: int):
+    """
+    Server-sent events for a review job: "token" events with review text as
+    it is generated, then "done" with the full review, or "error". "restart"
+    means the job was retried and the text received so far is void.
+    """
+    await _review_job(job_id)
+
+    async def events():
+        async for event, data in job_queue.follow(job_id):
+            if event == "output":
+                yield sse_event("token", {"text": data})
+            elif event == "restart":
+                yield sse_event("restart", {})
+            elif event == "done":
+                yield sse_event("done", {"review": data["result_text"]})
+            else:
+                yield sse_event("error", {"detail": data["error"] or "Review failed"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def run_prefetch_quiz(payload: dict, report) -> str:
+    """Job handler for app.prefetch: stores one quiz in prefetched_quizzes."""
+    request = QuizGenerateRequest(**{k: payload[k] for k in ("roadmap_id", "topic", "subtopic", "difficulty", "language")})
+    user_id, user_status = await _find_learner(request.roadmap_id, request.topic, request.subtopic)
+    # Marked as seen only when the user actually opens the quiz
+    questions, _ = await _assemble_quiz(request, user_id, user_status, cancel_orphaned=True)
+    if not questions:
+        raise RuntimeError("quiz generation returned no questions")
+
+    def save_quiz(conn):
+        c = conn.cursor()
+        c.execute("""
+            INSERT INTO prefetched_quizzes (roadmap_id, node_label, difficulty, language, user_status, questions_json)
+            SELECT ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM roadmaps WHERE id = ?)
+            ON CONFLICT (roadmap_id, node_label) DO NOTHING
+        """, (request.roadmap_id, request.subtopic, request.difficulty, request.language, user_status,
+              json.dumps(questions), request.roadmap_id))
+        conn.commit()
+        return c.rowcount == 1
+
+    if await run_db(save_quiz):
+        prefetch_stats.quizzes += 1
+    return ""
+
+job_queue.register(QUIZ_JOB, run_prefetch_quiz)
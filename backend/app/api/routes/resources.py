@@ -1,6 +1,7 @@
 from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends, Query
 from fastapi.responses import FileResponse
-from app.db import get_db
+from app.db import run_db
+from app import queries
 import sqlite3
 import shutil
 import os
@@ -17,24 +18,18 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 @router.get("/recommendations")
 async def get_recommendations(user_id: int):
     print(f"--- DEBUG: Recommendation requested for user_id={user_id} ---")
-    with get_db() as conn:
+    def rank_resources(conn):
         c = conn.cursor()
         
         # 1. Get User's Roadmap Topics & Interests for context
-        c.execute("""
-            SELECT topic, interest, difficulty 
-            FROM roadmaps 
-            WHERE user_id = ? 
-            ORDER BY created_at DESC 
-            LIMIT 5
-        """, (user_id,))
+        c.execute(queries.RECENT_INTERESTS, (user_id,))
         user_roadmaps = c.fetchall()
         print(f"DEBUG: Found {len(user_roadmaps)} recent roadmaps/interests for context")
         
         if not user_roadmaps:
              print("DEBUG: No user history found. Returning fresh fallback content.")
              # Fallback: Just return recent resources if no preferences
-             c.execute("SELECT * FROM resources ORDER BY created_at DESC LIMIT 5")
+             c.execute(queries.RECENT_RESOURCES)
              return [dict(row) for row in c.fetchall()]
 
         # Collect keywords from roadmaps
@@ -85,6 +80,8 @@ async def get_recommendations(user_id: int):
         
         return top_picks
 
+    return await run_db(rank_resources)
+
 @router.post("/upload")
 async def upload_resource(
     title: str = Form(...),
@@ -111,14 +108,16 @@ async def upload_resource(
             shutil.copyfileobj(file.file, buffer)
             
         # 2. Save DB Record
-        with get_db() as conn:
+        def insert_resource(conn):
             c = conn.cursor()
             c.execute("""
                 INSERT INTO resources (user_id, title, description, type, category, file_path, filename)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (user_id, title, description, type, category, str(file_location), file.filename))
             conn.commit()
-            resource_id = c.lastrowid
+            return c.lastrowid
+
+        resource_id = await run_db(insert_resource)
             
         return {
             "id": resource_id,
@@ -132,35 +131,38 @@ async def upload_resource(
 
 @router.get("/")
 async def get_resources():
-    with get_db() as conn:
+    def list_resources(conn):
         c = conn.cursor()
-        c.execute("SELECT * FROM resources ORDER BY created_at DESC")
+        c.execute(queries.RESOURCES)
         rows = c.fetchall()
         return [dict(row) for row in rows]
 
+    return await run_db(list_resources)
+
 @router.get("/download/{resource_id}")
 async def download_resource(resource_id: int):
-    with get_db() as conn:
+    def find_resource(conn):
         c = conn.cursor()
         c.execute("SELECT * FROM resources WHERE id = ?", (resource_id,))
-        row = c.fetchone()
+        return c.fetchone()
+
+    row = await run_db(find_resource)
+    if not row:
+        raise HTTPException(status_code=404, detail="Resource not found")
         
-        if not row:
-            raise HTTPException(status_code=404, detail="Resource not found")
-            
-        file_path = Path(row["file_path"])
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="File not found on server")
-            
-        return FileResponse(
-            path=file_path, 
-            filename=row["filename"],
-            media_type='application/octet-stream'
-        )
+    file_path = Path(row["file_path"])
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="File not found on server")
+        
+    return FileResponse(
+        path=file_path, 
+        filename=row["filename"],
+        media_type='application/octet-stream'
+    )
 
 @router.delete("/{resource_id}")
 async def delete_resource(resource_id: int):
-    with get_db() as conn:
+    def remove_resource(conn):
         c = conn.cursor()
         # Get file path first
         c.execute("SELECT file_path FROM resources WHERE id = ?", (resource_id,))
@@ -177,5 +179,6 @@ async def delete_resource(resource_id: int):
             os.remove(row["file_path"])
         except OSError:
             pass # File might be already gone
-            
-        return {"message": "Resource deleted"}
+
+    await run_db(remove_resource)
+    return {"message": "Resource deleted"}
@@ -1,13 +1,26 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
 from app.models.roadmap import RoadmapRequest, RoadmapResponse, RoadmapUpdateRequest
 from app.agents.planner import generate_roadmap
-from app.db import get_db
+from app.db import run_db
+from app import queries
+from app.roadmap_store import insert_roadmap, read_layout, read_tree, write_layout
+from app.singleflight import SingleFlight
+from app.core.config import settings
+from app.jobs import job_queue
+from app.llm_scheduler import LLMOverloaded
+from app.prefetch import cancel_prefetch, prefetch_stats, schedule_prefetch
+from app.roadmap_templates import (count_templates, find_template, invalidate_templates, record_use,
+                                   save_template, template_key, template_stats)
 import json
+import secrets
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 router = APIRouter()
 
+# Requests with the same template key share a single generation; each still gets its own row
+roadmap_flights = SingleFlight()
+
 class RoadmapListResponse(BaseModel):
     id: int
     topic: str
@@ -17,23 +30,28 @@ class RoadmapListResponse(BaseModel):
 
 @router.get("/user/{user_id}", response_model=List[RoadmapListResponse])
 async def get_user_roadmaps(user_id: int):
-    with get_db() as conn:
+    def list_roadmaps(conn):
         c = conn.cursor()
-        c.execute("SELECT id, topic, language, difficulty, created_at FROM roadmaps WHERE user_id = ? ORDER BY created_at DESC", (user_id,))
+        c.execute(queries.USER_ROADMAPS, (user_id,))
         rows = c.fetchall()
         return [dict(row) for row in rows]
 
+    return await run_db(list_roadmaps)
+
 @router.get("/{roadmap_id}", response_model=RoadmapResponse)
 async def get_roadmap(roadmap_id: int):
-    with get_db() as conn:
+    def load_roadmap(conn):
         c = conn.cursor()
         # Retrieve 'interest' and 'objective'
-        c.execute("SELECT roadmap_json, difficulty, language, user_id, topic, interest, objective FROM roadmaps WHERE id = ?", (roadmap_id,))
+        c.execute(queries.ROADMAP, (roadmap_id,))
         row = c.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Roadmap not found")
         
         data = json.loads(row["roadmap_json"])
+        data["roadmap"] = read_tree(conn, roadmap_id)
+        if row["layout_saved"]:
+            data["nodes"], data["edges"] = read_layout(conn, roadmap_id)
         # Inject DB fields if missing in JSON (backward compatibility)
         if "difficulty" not in data:
             data["difficulty"] = row["difficulty"]
@@ -48,7 +66,7 @@ async def get_roadmap(roadmap_id: int):
                  data["objective"] = None # Handle if column logic fails somehow
 
         # Fetch user progress
-        c.execute("SELECT subtopic, mastery_score, status FROM user_knowledge WHERE user_id = ? AND topic = ?", (row["user_id"], row["topic"]))
+        c.execute(queries.ROADMAP_PROGRESS, (row["user_id"], row["topic"]))
         progress_rows = c.fetchall()
         progress_map = {r["subtopic"]: {"mastery_score": r["mastery_score"], "status": r["status"]} for r in progress_rows}
         
@@ -70,48 +88,125 @@ async def get_roadmap(roadmap_id: int):
             
         return data
 
+    return await run_db(load_roadmap)
+
 @router.put("/{roadmap_id}/update")
 async def update_roadmap_structure(roadmap_id: int, request: RoadmapUpdateRequest):
-    with get_db() as conn:
+    def save_structure(conn):
         c = conn.cursor()
-        c.execute("SELECT roadmap_json FROM roadmaps WHERE id = ?", (roadmap_id,))
+        c.execute("SELECT id FROM roadmaps WHERE id = ?", (roadmap_id,))
         row = c.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Roadmap not found")
         
-        # Load existing data to preserve topic, etc.
-        current_data = json.loads(row["roadmap_json"])
-        
-        # Merge new nodes/edges
-        current_data["nodes"] = request.nodes
-        current_data["edges"] = request.edges
-        
-        # Save back to DB
-        new_json = json.dumps(current_data)
-        c.execute("UPDATE roadmaps SET roadmap_json = ? WHERE id = ?", (new_json, roadmap_id))
+        # Only nodes/edges that actually changed are rewritten
+        write_layout(conn, roadmap_id, request.nodes, request.edges)
         conn.commit()
-        
+
+    await run_db(save_structure)
+    # The user is reshaping the roadmap; stop pre-generating its old nodes
+    await cancel_prefetch(roadmap_id)
     return {"status": "success"}
 
+@router.delete("/{roadmap_id}")
+async def delete_roadmap(roadmap_id: int):
+    await cancel_prefetch(roadmap_id)
+
+    def remove_roadmap(conn):
+        c = conn.cursor()
+        c.execute("SELECT id FROM roadmaps WHERE id = ?", (roadmap_id,))
+        if not c.fetchone():
+            raise HTTPException(status_code=404, detail="Roadmap not found")
+        for table in ("node_content", "prefetched_quizzes", "quiz_attempts", "roadmap_nodes",
+                      "roadmap_flow_nodes", "roadmap_edges"):
+            c.execute(f"DELETE FROM {table} WHERE roadmap_id = ?", (roadmap_id,))
+        c.execute("DELETE FROM roadmaps WHERE id = ?", (roadmap_id,))
+        conn.commit()
+
+    await run_db(remove_roadmap)
+    return {"status": "deleted"}
+
+@router.get("/prefetch/stats")
+async def get_prefetch_stats():
+    return prefetch_stats.stats()
+
+@router.get("/templates/stats")
+async def get_template_stats():
+    return template_stats.stats(await run_db(count_templates))
+
+class InvalidateTemplatesRequest(BaseModel):
+    # Neither set drops every template
+    topic: Optional[str] = None
+    template_id: Optional[int] = None
+
+@router.post("/templates/invalidate")
+async def invalidate_roadmap_templates(request: InvalidateTemplatesRequest, x_admin_token: str = Header("")):
+    if not settings.ADMIN_TOKEN or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    removed = await run_db(invalidate_templates, request.topic, request.template_id)
+    template_stats.invalidated += removed
+    return {"removed": removed}
+
 class CreateRoadmapRequest(RoadmapRequest):
     user_id: int
+    # Pre-generate lessons and quizzes for the first PREFETCH_NODES nodes
+    prefetch: bool = False
+    # Generate a new roadmap even if a template matches, and make it the template
+    fresh: bool = False
 
 @router.post("/generate", response_model=dict)
 async def create_roadmap(request: CreateRoadmapRequest):
     try:
-        # Generate roadmap using LLM
-        roadmap_data = await generate_roadmap(request.topic, request.difficulty, request.language, request.interest, request.objective)
+        key = template_key(request.topic, request.difficulty, request.language, request.objective, request.interest)
+        template = None
+        if settings.ROADMAP_TEMPLATES and not request.fresh:
+            template = await run_db(find_template, key, settings.ROADMAP_TEMPLATE_SIMILARITY)
+
+        if template:
+            template_id, template_data, fuzzy = template
+            template_stats.hits += 1
+            template_stats.fuzzy_hits += fuzzy
+            # Keep the user's own wording of the request on their copy
+            roadmap_data = RoadmapResponse(**{**template_data, "topic": request.topic,
+                                              "interest": request.interest, "objective": request.objective})
+        else:
+            if settings.ROADMAP_TEMPLATES:
+                if request.fresh:
+                    template_stats.forced += 1
+                else:
+                    template_stats.misses += 1
+            # Generate roadmap using LLM
+            roadmap_data = await roadmap_flights.do(
+                key,
+                lambda: generate_roadmap(request.topic, request.difficulty, request.language, request.interest, request.objective)
+            )
         
         # Save to DB
-        with get_db() as conn:
-            c = conn.cursor()
-            c.execute("""
-                INSERT INTO roadmaps (user_id, topic, language, difficulty, interest, objective, roadmap_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (request.user_id, request.topic, request.language, request.difficulty, request.interest, request.objective, roadmap_data.json()))
+        def save_roadmap(conn):
+            roadmap_id = insert_roadmap(
+                conn, request.user_id, request.topic, request.language, request.difficulty,
+                request.interest, request.objective, roadmap_data.dict()
+            )
+            if template:
+                record_use(conn, template_id)
+            elif settings.ROADMAP_TEMPLATES:
+                save_template(conn, key, request.topic, roadmap_data.dict())
+            scheduled = 0
+            if request.prefetch:
+                scheduled = schedule_prefetch(
+                    conn, roadmap_id, request.topic, request.difficulty, request.language,
+                    request.interest, request.objective, settings.PREFETCH_NODES, settings.PREFETCH_MODES
+                )
             conn.commit()
-            roadmap_id = c.lastrowid
+            return roadmap_id, scheduled
+
+        roadmap_id, scheduled = await run_db(save_roadmap)
+        if scheduled:
+            prefetch_stats.scheduled += scheduled
+            job_queue.notify()
             
         return {"id": roadmap_id, "roadmap": roadmap_data}
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
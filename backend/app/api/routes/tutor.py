@@ -1,8 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.db import get_db
-from app.agents.tutor import get_tutor_response
+from app.core.config import settings
+from app.chat_context import load_context
+from app.db import run_db, submit_db
+from app import queries
+from app.jobs import job_queue
+from app.llm import check_llm_capacity, check_stream_capacity
+from app.message_writer import message_writer
+from app.agents.tutor import get_tutor_response, stream_tutor_response
 import sqlite3
+import time
 from typing import List, Optional
 
 router = APIRouter()
@@ -20,63 +28,125 @@ class ChatResponse(BaseModel):
     response: str
     history: List[Message]
 
+def _get_or_create_session(conn, user_id: int, topic: str):
+    """Returns (session_id, created) for the user's tutor session on a topic."""
+    c = conn.cursor()
+    c.execute(queries.TUTOR_SESSION, (user_id, topic))
+    session = c.fetchone()
+    
+    if not session:
+        c.execute("INSERT INTO tutor_sessions (user_id, topic) VALUES (?, ?)", (user_id, topic))
+        conn.commit()
+        return c.lastrowid, True
+    return session[0], False
+
+def _load_messages(conn, session_id: int):
+    message_writer.ensure_flushed("tutor_messages", session_id)
+    c = conn.cursor()
+    c.execute(queries.TUTOR_HISTORY, (session_id,))
+    return [{"role": row[0], "content": row[1]} for row in c.fetchall()]
+
 @router.get("/history")
 async def get_history(user_id: int, topic: str):
-    with get_db() as conn:
-        c = conn.cursor()
-        
+    def load_history(conn):
         # Get or Create Session
-        c.execute("SELECT id FROM tutor_sessions WHERE user_id = ? AND topic = ?", (user_id, topic))
-        session = c.fetchone()
-        
-        if not session:
-            # Create session
-            c.execute("INSERT INTO tutor_sessions (user_id, topic) VALUES (?, ?)", (user_id, topic))
-            conn.commit()
-            session_id = c.lastrowid
+        session_id, created = _get_or_create_session(conn, user_id, topic)
+        if created:
             return []
-        else:
-            session_id = session[0]
-            
-        c.execute("SELECT role, content FROM tutor_messages WHERE session_id = ? ORDER BY created_at ASC", (session_id,))
-        messages = [{"role": row[0], "content": row[1]} for row in c.fetchall()]
-        return messages
+        return _load_messages(conn, session_id)
+
+    return await run_db(load_history)
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
-    with get_db() as conn:
-        c = conn.cursor()
-        
+    check_llm_capacity("tutor")
+
+    def load_session_context(conn):
         # 1. Get or Create Session
-        c.execute("SELECT id FROM tutor_sessions WHERE user_id = ? AND topic = ?", (request.user_id, request.topic))
-        session = c.fetchone()
-        
-        if not session:
-            c.execute("INSERT INTO tutor_sessions (user_id, topic) VALUES (?, ?)", (request.user_id, request.topic))
-            conn.commit()
-            session_id = c.lastrowid
-        else:
-            session_id = session[0]
+        session_id, _ = _get_or_create_session(conn, request.user_id, request.topic)
             
         # 2. Get History for Context
-        c.execute("SELECT role, content FROM tutor_messages WHERE session_id = ? ORDER BY created_at ASC", (session_id,))
-        history = [{"role": row[0], "content": row[1]} for row in c.fetchall()]
+        history = _load_messages(conn, session_id)
+        context = load_context(conn, "tutor_messages", session_id)
         
         # 3. Save User Message
-        c.execute("INSERT INTO tutor_messages (session_id, role, content) VALUES (?, 'user', ?)", 
-                 (session_id, request.message))
-        conn.commit()
-        
-        # 4. Generate AI Response
-        ai_response_text = await get_tutor_response(request.topic, request.message, history)
-        
-        # 5. Save AI Response
-        c.execute("INSERT INTO tutor_messages (session_id, role, content) VALUES (?, 'assistant', ?)", 
-                 (session_id, ai_response_text))
+        message_writer.enqueue("tutor_messages", session_id, "user", request.message)
+        return session_id, history, context
+
+    session_id, history, context = await run_db(load_session_context)
+    if context.summary_pending:
+        job_queue.notify()
+    
+    # 4. Generate AI Response (no connection is held while the model runs)
+    ai_response_text = await get_tutor_response(request.topic, request.message, context.messages, context.summary)
+    
+    # 5. Save AI Response
+    message_writer.enqueue("tutor_messages", session_id, "assistant", ai_response_text)
+    
+    # Update history to return
+    history.append({"role": "user", "content": request.message})
+    history.append({"role": "assistant", "content": ai_response_text})
+    
+    return {"response": ai_response_text, "history": history}
+
+def _start_reply(conn, user_id: int, topic: str, message: str):
+    """
+    Stores the user message and an empty assistant row for a streamed reply.
+    Both are written inline rather than queued because the assistant row's id
+    is needed for checkpointing. Returns (session_id, context, reply_id).
+    """
+    session_id, _ = _get_or_create_session(conn, user_id, topic)
+    message_writer.ensure_flushed("tutor_messages", session_id)
+    context = load_context(conn, "tutor_messages", session_id)
+    c = conn.cursor()
+    c.execute("INSERT INTO tutor_messages (session_id, role, content) VALUES (?, 'user', ?)", (session_id, message))
+    c.execute("INSERT INTO tutor_messages (session_id, role, content) VALUES (?, 'assistant', '')", (session_id,))
+    reply_id = c.lastrowid
+    conn.commit()
+    return session_id, context, reply_id
+
+def _checkpoint_reply(conn, reply_id: int, content: str):
+    conn.execute("UPDATE tutor_messages SET content = ? WHERE id = ?", (content, reply_id))
+    conn.commit()
+
+def _finish_reply(conn, reply_id: int, content: str):
+    if content:
+        _checkpoint_reply(conn, reply_id, content)
+    else:
+        # Nothing was generated; don't leave an empty assistant message behind
+        conn.execute("DELETE FROM tutor_messages WHERE id = ?", (reply_id,))
         conn.commit()
-        
-        # Update history to return
-        history.append({"role": "user", "content": request.message})
-        history.append({"role": "assistant", "content": ai_response_text})
-        
-        return {"response": ai_response_text, "history": history}
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streams the tutor's reply as plain text, like /api/coding/chat. Only the
+    new reply is sent; clients already hold the history from /history. The
+    partial reply is saved every TUTOR_CHECKPOINT_INTERVAL_MS, so a dropped
+    connection or a crash keeps whatever was generated so far.
+    """
+    # Checked before anything is stored, so a rejected message leaves no trace
+    check_stream_capacity("tutor")
+    session_id, context, reply_id = await run_db(_start_reply, request.user_id, request.topic, request.message)
+    if context.summary_pending:
+        job_queue.notify()
+    interval = settings.TUTOR_CHECKPOINT_INTERVAL_MS / 1000
+
+    async def generate():
+        chunks = []
+        saved = 0
+        last_checkpoint = time.monotonic()
+        try:
+            async for chunk in stream_tutor_response(request.topic, request.message, context.messages, context.summary):
+                chunks.append(chunk)
+                yield chunk
+                if len(chunks) > saved and time.monotonic() - last_checkpoint >= interval:
+                    await run_db(_checkpoint_reply, reply_id, "".join(chunks))
+                    saved = len(chunks)
+                    last_checkpoint = time.monotonic()
+        finally:
+            # Submitted without awaiting: when the client disconnects this
+            # generator is being cancelled and could not await the write.
+            submit_db(_finish_reply, reply_id, "".join(chunks))
+
+    return StreamingResponse(generate(), media_type="text/plain")
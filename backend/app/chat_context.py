@@ -0,0 +1,151 @@
+"""
+Token-budgeted context for the chat agents.
+
+A chat prompt carries the session's rolling summary plus the newest turns that
+fit in CHAT_CONTEXT_TOKENS. Turns that drop out of that window are folded into
+the summary by a background job once CHAT_SUMMARY_BATCH_TOKENS of them have
+piled up, so the summary is refreshed a few turns at a time instead of on
+every message and the prompt stays the same size however long the session
+gets. Until their job has run, those turns stay in the prompt as they are.
+A job folds at most one batch, so the summarization prompt is bounded too;
+if more has piled up, it queues another job for the rest.
+
+Summaries are stored per session in chat_summaries together with the id of
+the last message they cover; only messages after it are ever loaded.
+"""
+import math
+from dataclasses import dataclass, field
+from app.core.config import settings
+from app.db import run_db
+from app import queries
+from app.jobs import add_job, job_queue
+from app.agents.summary import summarize_conversation
+
+SUMMARY_JOB = "chat_summary"
+MESSAGE_OVERHEAD_TOKENS = 4  # role markers and separators around each message
+
+def estimate_tokens(text: str) -> int:
+    # Llama-family tokenizers average about four characters per token on
+    # English prose and code; close enough for budgeting, and free.
+    return math.ceil(len(text) / 4)
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def split_window(messages: list, budget: int):
+    """
+    Splits messages (oldest first) into (older, recent), where recent is the
+    newest run that fits in budget tokens. The newest message is always kept.
+    """
+    used = 0
+    start = len(messages)
+    while start > 0:
+        cost = message_tokens(messages[start - 1])
+        if used + cost > budget and start < len(messages):
+            break
+        used += cost
+        start -= 1
+    return messages[:start], messages[start:]
+
+def split_oldest(messages: list, budget: int):
+    """
+    Splits messages (oldest first) into (oldest, rest), where oldest is the
+    oldest run that fits in budget tokens. The oldest message is always taken.
+    """
+    used = 0
+    end = 0
+    while end < len(messages):
+        cost = message_tokens(messages[end])
+        if used + cost > budget and end > 0:
+            break
+        used += cost
+        end += 1
+    return messages[:end], messages[end:]
+
+@dataclass
+class ChatContext:
+    summary: str = ""
+    messages: list = field(default_factory=list)  # {"role", "content"}, oldest first
+    tokens: int = 0  # estimated size of summary + messages
+    summary_pending: bool = False  # a refresh was queued while loading
+
+def _summary_tag(table: str, session_id: int) -> str:
+    return f"summary:{table}:{session_id}"
+
+def _queue_summary(conn, table: str, session_id: int):
+    add_job(conn, SUMMARY_JOB, {"table": table, "session_id": session_id}, tag=_summary_tag(table, session_id))
+    conn.commit()
+
+def _load_state(conn, table: str, session_id: int):
+    row = conn.execute(queries.CHAT_SUMMARY, (table, session_id)).fetchone()
+    summary, covered_until = (row["summary"], row["covered_until_id"]) if row else ("", 0)
+    rows = conn.execute(queries.CHAT_WINDOW.format(table=table), (session_id, covered_until)).fetchall()
+    return summary, covered_until, [{"id": r["id"], "role": r["role"], "content": r["content"]} for r in rows]
+
+def load_context(conn, table: str, session_id: int) -> ChatContext:
+    """
+    Loads the prompt context for a session inside the caller's connection.
+    Callers flush the message writer first. If enough turns have fallen out of
+    the window a summary job is queued and committed here; call
+    job_queue.notify() afterwards when summary_pending is set.
+    """
+    summary, _, messages = _load_state(conn, table, session_id)
+    older, recent = split_window(messages, settings.CHAT_CONTEXT_TOKENS)
+    overflow = sum(message_tokens(m) for m in older)
+
+    pending = False
+    if overflow >= settings.CHAT_SUMMARY_BATCH_TOKENS:
+        queued = conn.execute(queries.JOB_TAG_ACTIVE, (_summary_tag(table, session_id),)).fetchone()
+        if queued is None:
+            _queue_summary(conn, table, session_id)
+            pending = True
+
+    # Turns waiting for the summary stay in the prompt, up to one batch of
+    # them in case the job falls behind.
+    _, waiting = split_window(older, settings.CHAT_SUMMARY_BATCH_TOKENS) if older else ([], [])
+    window = [{"role": m["role"], "content": m["content"]} for m in waiting + recent]
+    tokens = estimate_tokens(summary) + sum(message_tokens(m) for m in window)
+    return ChatContext(summary=summary, messages=window, tokens=tokens, summary_pending=pending)
+
+def _save_summary(conn, table: str, session_id: int, summary: str, previous_until: int, covered_until: int) -> bool:
+    # Only advance from the state the summary was built on, so two refreshes
+    # racing for the same session can't overwrite each other.
+    c = conn.cursor()
+    if previous_until:
+        c.execute("""
+            UPDATE chat_summaries SET summary = ?, covered_until_id = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE message_table = ? AND session_id = ? AND covered_until_id = ?
+        """, (summary, covered_until, table, session_id, previous_until))
+    else:
+        c.execute("""
+            INSERT INTO chat_summaries (message_table, session_id, summary, covered_until_id)
+            VALUES (?, ?, ?, ?) ON CONFLICT (message_table, session_id) DO NOTHING
+        """, (table, session_id, summary, covered_until))
+    conn.commit()
+    return c.rowcount == 1
+
+async def refresh_summary(table: str, session_id: int):
+    """
+    Folds the oldest turns outside the context window, at most
+    CHAT_SUMMARY_BATCH_TOKENS of them, into the stored summary. Returns the
+    summary and the tokens of turns still outside the window and unfolded.
+    """
+    summary, covered_until, messages = await run_db(_load_state, table, session_id)
+    older, _ = split_window(messages, settings.CHAT_CONTEXT_TOKENS)
+    if not older:
+        return summary, 0
+    batch, rest = split_oldest(older, settings.CHAT_SUMMARY_BATCH_TOKENS)
+    updated = await summarize_conversation(summary, batch, settings.CHAT_SUMMARY_WORDS)
+    if not await run_db(_save_summary, table, session_id, updated, covered_until, batch[-1]["id"]):
+        print(f"Summary for {table} session {session_id} changed while refreshing; keeping the newer one")
+        return updated, 0
+    return updated, sum(message_tokens(m) for m in rest)
+
+async def run_summary_job(payload: dict, report) -> str:
+    summary, left = await refresh_summary(payload["table"], payload["session_id"])
+    if left >= settings.CHAT_SUMMARY_BATCH_TOKENS:
+        await run_db(_queue_summary, payload["table"], payload["session_id"])
+        job_queue.notify()
+    return summary
+
+job_queue.register(SUMMARY_JOB, run_summary_job)
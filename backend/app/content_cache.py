@@ -0,0 +1,91 @@
+"""
+Global lesson cache in front of app.agents.content.generate_content.
+
+node_content only caches per roadmap, so the same lesson requested from two
+roadmaps (or by two users) used to cost two generations. This cache is keyed on
+the normalized prompt inputs instead. With CONTENT_CACHE_SEMANTIC enabled, a
+miss also checks entries with the same settings whose "topic / subtopic" label
+embeds close to the requested one, so "Python / Decorators" and
+"python / decorators in Python" share a lesson.
+"""
+import asyncio
+import re
+from app.cache import LRUCache
+from app.core.config import settings
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Optional dependency, only needed for semantic lookups
+    SentenceTransformer = None
+
+def normalize(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+def cache_key(topic, subtopic, mode, difficulty, language, user_status, interest, objective) -> tuple:
+    return tuple(normalize(v) for v in (topic, subtopic, mode, difficulty, language, user_status, interest, objective))
+
+def _label(key: tuple) -> str:
+    return f"{key[0]} / {key[1]}"
+
+class ContentCache:
+    def __init__(self, max_size: int, ttl_seconds: float, semantic: bool, similarity: float):
+        self._cache = LRUCache(max_size, ttl_seconds)
+        self.semantic = semantic and SentenceTransformer is not None
+        self.similarity = similarity
+        self.semantic_hits = 0
+        self._encoder = None
+        # Non-topic settings -> {key: embedding} for the semantic lookup
+        self._embeddings = {}
+
+    def _encode(self, text: str):
+        if self._encoder is None:
+            self._encoder = SentenceTransformer(settings.EMBEDDING_MODEL)
+        return self._encoder.encode(text, normalize_embeddings=True)
+
+    async def _embed(self, key: tuple):
+        # Encoding is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self._encode, _label(key))
+
+    async def get(self, key: tuple):
+        value = self._cache.get(key)
+        if value is not None or not self.semantic:
+            return value
+
+        bucket = self._embeddings.get(key[2:], {})
+        # Drop embeddings whose entries were evicted or expired
+        for stale in [k for k in bucket if k not in self._cache]:
+            del bucket[stale]
+        if not bucket:
+            return None
+
+        query = await self._embed(key)
+        best_key, best_score = None, self.similarity
+        for candidate, vector in bucket.items():
+            score = float(query @ vector)
+            if score >= best_score:
+                best_key, best_score = candidate, score
+        if best_key is None:
+            return None
+        self.semantic_hits += 1
+        return self._cache.peek(best_key)
+
+    async def put(self, key: tuple, value):
+        self._cache.set(key, value)
+        if self.semantic:
+            self._embeddings.setdefault(key[2:], {})[key] = await self._embed(key)
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        # The LRU counted each semantic hit as a miss before the embedding lookup found it
+        hits = stats["hits"] + self.semantic_hits
+        misses = stats["misses"] - self.semantic_hits
+        return {**stats, "hits": hits, "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "semantic_enabled": self.semantic, "semantic_hits": self.semantic_hits}
+
+content_cache = ContentCache(
+    max_size=settings.CONTENT_CACHE_SIZE,
+    ttl_seconds=settings.CONTENT_CACHE_TTL_SECONDS,
+    semantic=settings.CONTENT_CACHE_SEMANTIC,
+    similarity=settings.CONTENT_CACHE_SIMILARITY
+)
@@ -7,7 +7,76 @@ class Settings:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
     SERPER_API_KEY: str = os.getenv("SERPER_API_KEY", "")
+    SERPER_BASE_URL: str = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+    # A Serper search gives up after this many seconds and the lesson goes without that media
+    SERPER_TIMEOUT_SECONDS: float = float(os.getenv("SERPER_TIMEOUT_SECONDS", "3"))
+    SERPER_MAX_CONNECTIONS: int = int(os.getenv("SERPER_MAX_CONNECTIONS", "10"))
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "llama3:8b")
+    # How long Ollama keeps a model loaded after each request: a duration ("30m")
+    # or seconds, where a negative number pins it until Ollama restarts
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
+    # Load every configured model at startup, and re-check this often that it is still loaded
+    LLM_WARMUP: bool = os.getenv("LLM_WARMUP", "true").lower() == "true"
+    LLM_WARMUP_INTERVAL_SECONDS: float = float(os.getenv("LLM_WARMUP_INTERVAL_SECONDS", "300"))
+    LLM_MAX_INFLIGHT: int = int(os.getenv("LLM_MAX_INFLIGHT", "4"))
+    # Model per agent task as "task=model" or "task=model|fallback", comma separated. Tasks are
+    # the profiles in app/llm.py or "content.<mode>" for one lesson mode; unlisted tasks use
+    # OLLAMA_MODEL. The fallback takes a generation when the primary model has no free slot.
+    LLM_ROUTES: str = os.getenv("LLM_ROUTES", "")
+    # Generations each model may run at once as "model=slots", comma separated; unlisted
+    # models get LLM_MAX_INFLIGHT
+    LLM_MODEL_SLOTS: str = os.getenv("LLM_MODEL_SLOTS", "")
+    # Waiting generations allowed per scheduler class before requests get a 429
+    LLM_QUEUE_INTERACTIVE: int = int(os.getenv("LLM_QUEUE_INTERACTIVE", "32"))
+    LLM_QUEUE_CONTENT: int = int(os.getenv("LLM_QUEUE_CONTENT", "16"))
+    LLM_QUEUE_BACKGROUND: int = int(os.getenv("LLM_QUEUE_BACKGROUND", "64"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "300"))
+    CONTENT_CACHE_SIZE: int = int(os.getenv("CONTENT_CACHE_SIZE", "1000"))
+    CONTENT_CACHE_TTL_SECONDS: float = float(os.getenv("CONTENT_CACHE_TTL_SECONDS", "86400"))
+    CONTENT_CACHE_SEMANTIC: bool = os.getenv("CONTENT_CACHE_SEMANTIC", "false").lower() == "true"
+    CONTENT_CACHE_SIMILARITY: float = float(os.getenv("CONTENT_CACHE_SIMILARITY", "0.92"))
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    # Empty means the local SQLite file at DB_PATH; a postgresql:// URL (for
+    # example the Supabase connection string) switches to the Postgres backend.
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    DB_PATH: str = os.getenv("DB_PATH", "edtech.db")
+    DB_WORKERS: int = int(os.getenv("DB_WORKERS", "4"))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    MESSAGE_FLUSH_INTERVAL_MS: int = int(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "50"))
+    MESSAGE_BATCH_SIZE: int = int(os.getenv("MESSAGE_BATCH_SIZE", "256"))
+    # How often a streaming tutor reply saves its partial text
+    TUTOR_CHECKPOINT_INTERVAL_MS: int = int(os.getenv("TUTOR_CHECKPOINT_INTERVAL_MS", "1000"))
+    # Lessons one /api/content/generate/batch request generates at a time
+    CONTENT_BATCH_CONCURRENCY: int = int(os.getenv("CONTENT_BATCH_CONCURRENCY", "2"))
+    # Background job workers (see app/jobs.py)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_INTERVAL_MS: int = int(os.getenv("JOB_POLL_INTERVAL_MS", "1000"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    # A running job is requeued once its worker stops renewing the lease for this long
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+    # Roadmaps created with prefetch=true pre-generate this many nodes, in these lesson modes
+    PREFETCH_NODES: int = int(os.getenv("PREFETCH_NODES", "3"))
+    PREFETCH_MODES: list = [m.strip() for m in os.getenv("PREFETCH_MODES", "story").split(",") if m.strip()]
+    # Questions per quiz, and how many of a bucket's newest questions the model is told not to repeat
+    QUIZ_QUESTIONS: int = int(os.getenv("QUIZ_QUESTIONS", "5"))
+    QUIZ_BANK_AVOID: int = int(os.getenv("QUIZ_BANK_AVOID", "20"))
+    # Extra generation rounds for quiz questions that came back malformed or invalid
+    QUIZ_REGENERATE_ATTEMPTS: int = int(os.getenv("QUIZ_REGENERATE_ATTEMPTS", "2"))
+    # Bank top-ups a quiz may run when generated questions turn out to duplicate banked ones
+    QUIZ_TOP_UP_ATTEMPTS: int = int(os.getenv("QUIZ_TOP_UP_ATTEMPTS", "3"))
+    # Chat prompts keep the newest turns that fit CHAT_CONTEXT_TOKENS; older turns
+    # are folded into a rolling summary once CHAT_SUMMARY_BATCH_TOKENS of them pile up
+    CHAT_CONTEXT_TOKENS: int = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))
+    CHAT_SUMMARY_BATCH_TOKENS: int = int(os.getenv("CHAT_SUMMARY_BATCH_TOKENS", "500"))
+    CHAT_SUMMARY_WORDS: int = int(os.getenv("CHAT_SUMMARY_WORDS", "200"))
+    # New roadmaps are cloned from a stored template for the same (normalized) request when
+    # one exists; topics this similar (difflib ratio) count as the same
+    ROADMAP_TEMPLATES: bool = os.getenv("ROADMAP_TEMPLATES", "true").lower() == "true"
+    ROADMAP_TEMPLATE_SIMILARITY: float = float(os.getenv("ROADMAP_TEMPLATE_SIMILARITY", "0.9"))
+    # Sent as X-Admin-Token to admin endpoints; they are disabled while it is empty
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
 
 settings = Settings()
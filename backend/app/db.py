@@ -1,174 +1,50 @@
-import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from app.core.config import settings
+from app.migrations import run_migrations
+from app.storage.sqlite import SQLiteBackend
 
-DB_NAME = "edtech.db"
+def _create_backend():
+    url = settings.DATABASE_URL
+    if url.startswith(("postgres://", "postgresql://")):
+        from app.storage.postgres import PostgresBackend
+        return PostgresBackend(url, min_size=1, max_size=settings.DB_POOL_SIZE)
+    return SQLiteBackend(settings.DB_PATH)
 
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # Users Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Roadmaps Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS roadmaps (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            topics TEXT NOT NULL,
-            language TEXT NOT NULL,
-            difficulty TEXT NOT NULL,
-            interest TEXT,
-            objective TEXT,
-            roadmap_json TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-
-    # Migration for existing databases
-    try:
-        c.execute("ALTER TABLE roadmaps ADD COLUMN interest TEXT")
-    except sqlite3.OperationalError:
-        pass
-
-    try:
-        c.execute("ALTER TABLE roadmaps ADD COLUMN objective TEXT")
-    except sqlite3.OperationalError:
-        pass
-
-    # Node Content Table (Cache)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS node_content (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            roadmap_id INTEGER NOT NULL,
-            node_label TEXT NOT NULL,
-            mode TEXT NOT NULL,
-            content_json TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (roadmap_id) REFERENCES roadmaps (id),
-            UNIQUE(roadmap_id, node_label, mode)
-        )
-    ''')
-
-    # Quiz Attempts Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS quiz_attempts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            roadmap_id INTEGER NOT NULL,
-            node_label TEXT NOT NULL,
-            score INTEGER NOT NULL,
-            total_questions INTEGER NOT NULL,
-            time_taken_seconds INTEGER NOT NULL,
-            attempt_data_json TEXT NOT NULL, -- Stores questions, user answers, time per question
-            review_text TEXT, -- AI generated review
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (roadmap_id) REFERENCES roadmaps (id)
-        )
-    ''')
+backend = _create_backend()
 
-    # Migration for existing table
-    try:
-        c.execute("ALTER TABLE quiz_attempts ADD COLUMN review_text TEXT")
-    except sqlite3.OperationalError:
-        pass # Column likely already exists
+# Raised on constraint violations, whichever backend is active
+IntegrityError = backend.IntegrityError
 
-    # User Knowledge Table (Digital Twin Memory)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS user_knowledge (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            topic TEXT NOT NULL,
-            subtopic TEXT NOT NULL,
-            mastery_score INTEGER DEFAULT 0, -- 0 to 100
-            status TEXT DEFAULT 'novice', -- novice, competent, expert
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id, topic, subtopic)
-        )
-    ''')
+# Bounded set of threads that run all DB work for async handlers. Each worker
+# thread gets its own pooled connection.
+_executor = ThreadPoolExecutor(max_workers=settings.DB_WORKERS, thread_name_prefix="db")
 
-    # Coding Sessions
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS coding_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            language TEXT NOT NULL,
-            title TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-
-    # Coding Messages
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS coding_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id INTEGER NOT NULL,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES coding_sessions (id)
-        )
-    ''')
-
-    # Resources Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS resources (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            title TEXT NOT NULL,
-            description TEXT,
-            type TEXT NOT NULL, 
-            category TEXT,
-            file_path TEXT,
-            filename TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-
-    # Tutor Sessions
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS tutor_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            topic TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id, topic)
-        )
-    ''')
-
-    # Tutor Messages
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS tutor_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id INTEGER NOT NULL,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES tutor_sessions (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+def init_db():
+    """Brings the database schema up to date. See app/migrations.py."""
+    run_migrations(backend)
 
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    try:
+    with backend.connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+def _call(fn, *args):
+    with get_db() as conn:
+        return fn(conn, *args)
+
+def submit_db(fn, *args):
+    """
+    Queues fn(conn, *args) on the DB executor without waiting for it. For
+    writes that must still happen when the calling task is being cancelled.
+    Returns a concurrent.futures.Future.
+    """
+    return _executor.submit(_call, fn, *args)
+
+async def run_db(fn, *args):
+    """
+    Runs fn(conn, *args) on the DB executor and returns its result, so async
+    route handlers never block the event loop on the database.
+    """
+    return await asyncio.wrap_future(submit_db(fn, *args))
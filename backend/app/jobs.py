@@ -0,0 +1,311 @@
+"""
+Durable background jobs.
+
+Slow work that a response should not wait for (quiz reviews) is stored in the
+jobs table and run by worker tasks on the event loop. The queue lives in the
+database, so jobs still pending, or interrupted by a shutdown or crash, are
+picked up again. A running job is leased to the worker process that claimed
+it, which renews the lease while the job runs; only jobs whose lease ran out
+are requeued, so a starting process never takes over another live process's
+jobs. Handlers are registered per job kind and
+can report partial output, which follow() streams to clients while the job
+runs.
+
+Every job generates in the "background" class of the LLM scheduler.
+Background-priority jobs (prefetching) are also only claimed while the model
+has nothing else to do, one at a time per process, and can be cancelled by tag.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from app.core.config import settings
+from app.db import run_db
+from app import queries
+from app.llm import active_generations
+from app.llm_scheduler import LLMOverloaded, set_llm_priority
+
+PRIORITY_NORMAL = 0
+PRIORITY_BACKGROUND = -1
+
+def add_job(conn, kind: str, payload: dict, priority: int = PRIORITY_NORMAL, tag: str = None) -> int:
+    """Queues a job inside the caller's transaction; commit, then call job_queue.notify()."""
+    c = conn.cursor()
+    c.execute("INSERT INTO jobs (kind, payload_json, priority, tag) VALUES (?, ?, ?, ?)",
+              (kind, json.dumps(payload), priority, tag))
+    return c.lastrowid
+
+def _claim(conn, min_priority: int, owner: str, lease_seconds: float):
+    # Several workers (or processes) may race for the same row; the status
+    # check in the UPDATE makes sure only one of them gets it.
+    while True:
+        row = conn.execute(queries.JOB_NEXT, (min_priority,)).fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        c = conn.cursor()
+        c.execute("""
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_expires_at = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'pending'
+        """, (owner, time.time() + lease_seconds, row["id"]))
+        conn.commit()
+        if c.rowcount == 1:
+            return {"id": row["id"], "kind": row["kind"], "payload": json.loads(row["payload_json"]),
+                    "attempts": row["attempts"] + 1, "priority": row["priority"], "tag": row["tag"]}
+
+# The status updates below only apply while the job is still this worker's;
+# one whose lease ran out may already be running somewhere else.
+
+def _finish(conn, job_id: int, owner: str, result: str):
+    conn.execute("""
+        UPDATE jobs SET status = 'done', result_text = ?, error = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND owner = ? AND status = 'running'
+    """, (result, job_id, owner))
+    conn.commit()
+
+def _fail(conn, job_id: int, owner: str, error: str, retry: bool):
+    conn.execute("""
+        UPDATE jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND owner = ? AND status = 'running'
+    """, ("pending" if retry else "failed", error, job_id, owner))
+    conn.commit()
+
+def _postpone(conn, job_id: int, owner: str):
+    # The model was too busy to even queue the job; that doesn't count as an attempt
+    conn.execute("""
+        UPDATE jobs SET status = 'pending', attempts = attempts - 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND owner = ? AND status = 'running'
+    """, (job_id, owner))
+    conn.commit()
+
+def _cancel_pending(conn, tag: str) -> int:
+    c = conn.cursor()
+    c.execute(queries.JOB_CANCEL_PENDING, (tag,))
+    conn.commit()
+    return c.rowcount
+
+def _mark_cancelled(conn, job_id: int, owner: str):
+    conn.execute("""
+        UPDATE jobs SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND owner = ? AND status = 'running'
+    """, (job_id, owner))
+    conn.commit()
+
+def _renew_leases(conn, owner: str, lease_seconds: float):
+    conn.execute("UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status = 'running'",
+                 (time.time() + lease_seconds, owner))
+    conn.commit()
+
+def _release(conn, owner: str) -> int:
+    c = conn.cursor()
+    c.execute("""
+        UPDATE jobs SET status = 'pending', owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE owner = ? AND status = 'running'
+    """, (owner,))
+    conn.commit()
+    return c.rowcount
+
+def _requeue_expired(conn) -> int:
+    # Rows claimed before leases existed have none and count as expired
+    c = conn.cursor()
+    c.execute("""
+        UPDATE jobs SET status = 'pending', owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+    """, (time.time(),))
+    conn.commit()
+    return c.rowcount
+
+def _load(conn, job_id: int):
+    row = conn.execute("""
+        SELECT id, kind, status, result_text, error, attempts, created_at, updated_at FROM jobs WHERE id = ?
+    """, (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def _catch_up(sent: str, text: str) -> list:
+    """follow() events that take a client holding sent to text."""
+    if text.startswith(sent):
+        return [("output", text[len(sent):])] if len(text) > len(sent) else []
+    # Output from an earlier attempt
+    return [("restart", None)] + ([("output", text)] if text else [])
+
+class JobQueue:
+    def __init__(self, workers: int, poll_interval: float, max_attempts: int, lease_seconds: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        # Identifies this process's claims; a restarted process gets a new one
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers = {}
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        # Output reported so far by jobs running in this process
+        self._progress = {}  # job id -> list of chunks
+        self._changed = {}  # job id -> asyncio.Event, set on new output and on finish
+        self._running = {}  # job id -> (tag, handler task)
+        self._cancelled = set()
+        self._background_running = 0
+
+    def register(self, kind: str, handler):
+        """handler(payload, report) -> str result; report(chunk) publishes partial output."""
+        self._handlers[kind] = handler
+
+    def notify(self):
+        """Wakes an idle worker after add_job() instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def get(self, job_id: int):
+        return await run_db(_load, job_id)
+
+    async def cancel(self, tag: str) -> int:
+        """Cancels every pending or running job with this tag. Returns how many."""
+        cancelled = await run_db(_cancel_pending, tag)
+        for job_id, (job_tag, task) in list(self._running.items()):
+            if job_tag == tag and not task.done():
+                self._cancelled.add(job_id)
+                task.cancel()
+                cancelled += 1
+        return cancelled
+
+    async def _run(self, job: dict):
+        job_id = job["id"]
+        chunks = self._progress[job_id] = []
+        changed = self._changed[job_id] = asyncio.Event()
+
+        def report(chunk: str):
+            chunks.append(chunk)
+            changed.set()
+
+        try:
+            handler = self._handlers.get(job["kind"])
+            if handler is None:
+                raise RuntimeError(f"no handler registered for job kind {job['kind']!r}")
+            task = asyncio.ensure_future(handler(job["payload"], report))
+            self._running[job_id] = (job["tag"], task)
+            result = await task
+        except asyncio.CancelledError:
+            if job_id not in self._cancelled:
+                raise  # shutting down; stop() releases the job for the next worker
+            await run_db(_mark_cancelled, job_id, self.owner)
+        except LLMOverloaded as e:
+            await run_db(_postpone, job_id, self.owner)
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            retry = job["attempts"] < self.max_attempts
+            print(f"Job {job_id} ({job['kind']}) failed on attempt {job['attempts']}: {e}")
+            await run_db(_fail, job_id, self.owner, str(e), retry)
+        else:
+            await run_db(_finish, job_id, self.owner, result)
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+            del self._progress[job_id]
+            del self._changed[job_id]
+            changed.set()
+
+    async def _work(self):
+        # Jobs never have a user waiting on them, so all their generations
+        # use the lowest scheduler class
+        set_llm_priority("background")
+        while True:
+            # Reserve the single background slot before claiming, so two
+            # workers can't both pick up background jobs.
+            reserved = self._background_running == 0 and active_generations() == 0
+            if reserved:
+                self._background_running += 1
+            try:
+                job = await run_db(_claim, PRIORITY_BACKGROUND if reserved else PRIORITY_NORMAL,
+                                   self.owner, self.lease_seconds)
+                if job is not None and reserved and job["priority"] >= PRIORITY_NORMAL:
+                    self._background_running -= 1
+                    reserved = False
+                if job is not None:
+                    await self._run(job)
+                    continue
+            except Exception as e:
+                print(f"Job worker error: {e}")
+            finally:
+                if reserved:
+                    self._background_running -= 1
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _keep_leases(self):
+        # Renews this process's leases well before they run out, and requeues
+        # jobs whose worker (here or in another process) stopped renewing
+        while True:
+            try:
+                await run_db(_renew_leases, self.owner, self.lease_seconds)
+                requeued = await run_db(_requeue_expired)
+                if requeued:
+                    print(f"Requeued {requeued} interrupted job(s)")
+                    self.notify()
+            except Exception as e:
+                print(f"Job lease error: {e}")
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._keep_leases())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Jobs interrupted by a clean shutdown don't have to wait for their lease to run out
+        await run_db(_release, self.owner)
+
+    async def follow(self, job_id: int):
+        """
+        Yields ("output", text) pieces as the job produces them, then
+        ("done", job), or ("failed", job) for failed, cancelled and missing
+        jobs. Jobs running in another process are polled and their whole
+        result arrives as one piece. A retried job writes its output again
+        from the start; ("restart", None) tells the client to drop the text
+        it has so far.
+        """
+        sent = ""
+        while True:
+            chunks = self._progress.get(job_id)
+            if chunks is not None:
+                changed = self._changed[job_id]
+                changed.clear()
+                text = "".join(chunks)
+                for event in _catch_up(sent, text):
+                    yield event
+                sent = text
+                try:
+                    await asyncio.wait_for(changed.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job = await self.get(job_id)
+            if job is None:
+                yield "failed", {"id": job_id, "status": "missing", "result_text": None, "error": "Job not found"}
+                return
+            if job["status"] == "done":
+                for event in _catch_up(sent, job["result_text"] or ""):
+                    yield event
+                yield "done", job
+                return
+            if job["status"] in ("failed", "cancelled"):
+                yield "failed", job
+                return
+            await asyncio.sleep(self.poll_interval)
+
+job_queue = JobQueue(
+    workers=settings.JOB_WORKERS,
+    poll_interval=settings.JOB_POLL_INTERVAL_MS / 1000,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    lease_seconds=settings.JOB_LEASE_SECONDS
+)
@@ -0,0 +1,54 @@
+"""
+Incremental scanner for JSON objects in streamed model output.
+
+Agents that ask the model for a JSON array of objects feed each chunk to a
+JsonObjectStream as it arrives and get back every top-level object that
+closed in it, so they can validate and hand out the first object while the
+rest are still being generated. Nothing outside an object (the array
+brackets, commas, code fences, chatter) is kept.
+"""
+
+class JsonObjectStream:
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> list:
+        """Returns the raw text of each object completed by this chunk."""
+        completed = []
+        for char in chunk:
+            if self._depth == 0:
+                if char == "{":
+                    self._buffer = [char]
+                    self._depth = 1
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                elif char == "\n":
+                    # JSON strings can't contain raw newlines, so a stray quote
+                    # (e.g. "id": 4") has desynchronised us; keys sit on their
+                    # own lines, so resync at the line break.
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append("".join(self._buffer))
+                    self._buffer = []
+        return completed
+
+    def pending(self) -> str:
+        """Text of an object that was started but never closed."""
+        return "".join(self._buffer) if self._depth else ""
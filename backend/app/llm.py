@@ -0,0 +1,330 @@
+"""
+Shared LLM client registry.
+
+Agents ask for a model by profile name (get_llm("planner")) instead of building
+their own ChatOllama at import time. Models are created on first use, all of
+them talk to Ollama through one keep-alive HTTP connection pool, and every
+generation is admitted by the priority scheduler in app/llm_scheduler.py.
+
+Every request also carries OLLAMA_KEEP_ALIVE so Ollama keeps the models
+loaded, and model_warmer loads them at startup so the first user doesn't pay
+for it.
+
+Each profile is a task that LLM_ROUTES can send to its own model, with
+"content.<mode>" routing a single lesson mode, so short structured tasks
+(quiz JSON, reviews, code analysis) can run on a small fast model while deep
+lessons use a large one. Every model has its own scheduler, and a route with
+a fallback ("quiz=llama3.2:3b|llama3:8b") moves a generation to the fallback
+when the primary has no free slot. The model is picked when the generation
+is admitted, so the agents don't know about routing.
+"""
+import asyncio
+import functools
+import re
+import time
+import httpx
+from ollama import AsyncClient
+from langchain_ollama import ChatOllama
+from app.core.config import settings
+from app.llm_metrics import GenerationTimer, parse_failures, route_fallbacks
+from app.llm_scheduler import LLMOverloaded, LLMScheduler, current_priority
+
+# Per-agent model configuration. "model" defaults to settings.OLLAMA_MODEL and
+# "priority" is the scheduler class used unless the caller overrides it.
+MODEL_PROFILES = {
+    "planner": {"priority": "content", "temperature": 0.2, "format": "json"},
+    "content": {"priority": "content", "temperature": 0.7},
+    "quiz": {"priority": "content", "temperature": 0.7},
+    "quiz_review": {"priority": "content", "temperature": 0.7},
+    "coding": {"priority": "interactive", "temperature": 0.7},
+    "code_analysis": {"priority": "interactive", "temperature": 0.7},
+    "tutor": {"priority": "interactive", "temperature": 0.7},
+    "rag": {"priority": "interactive", "temperature": 0.7},
+    "summary": {"priority": "background", "temperature": 0.2},
+}
+
+@functools.lru_cache(maxsize=16)
+def _parse_pairs(spec: str) -> dict:
+    """ "a=x,b=y" -> {"a": "x", "b": "y"}; blank and malformed items are skipped."""
+    pairs = {}
+    for item in spec.split(","):
+        key, sep, value = item.partition("=")
+        if sep and key.strip() and value.strip():
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+def _model_slots(model: str) -> int:
+    slots = _parse_pairs(settings.LLM_MODEL_SLOTS).get(model)
+    return int(slots) if slots else settings.LLM_MAX_INFLIGHT
+
+def _new_scheduler(model: str) -> LLMScheduler:
+    return LLMScheduler(
+        slots=_model_slots(model),
+        queue_limits={
+            "interactive": settings.LLM_QUEUE_INTERACTIVE,
+            "content": settings.LLM_QUEUE_CONTENT,
+            "background": settings.LLM_QUEUE_BACKGROUND,
+        }
+    )
+
+# The default model's scheduler; routed models get their own from scheduler_for()
+llm_scheduler = _new_scheduler(settings.OLLAMA_MODEL)
+_schedulers = {settings.OLLAMA_MODEL: llm_scheduler}
+_models = {}
+_async_client = None
+
+def scheduler_for(model: str) -> LLMScheduler:
+    scheduler = _schedulers.get(model)
+    if scheduler is None:
+        scheduler = _schedulers[model] = _new_scheduler(model)
+    return scheduler
+
+def scheduler_stats() -> dict:
+    return {model: scheduler.stats() for model, scheduler in sorted(_schedulers.items())}
+
+def active_generations() -> int:
+    return sum(scheduler.active() for scheduler in _schedulers.values())
+
+def profile_priority(profile: str) -> str:
+    """Scheduler class a generation with this profile would run in right now."""
+    return current_priority(MODEL_PROFILES[profile]["priority"])
+
+def profile_model(profile: str) -> str:
+    return MODEL_PROFILES[profile].get("model", settings.OLLAMA_MODEL)
+
+def model_route(profile: str, mode: str = None) -> tuple:
+    """(model, fallback) for a task from LLM_ROUTES; fallback is None when there isn't one."""
+    routes = _parse_pairs(settings.LLM_ROUTES)
+    route = (mode and routes.get(f"{profile}.{mode}")) or routes.get(profile)
+    if route is None:
+        return profile_model(profile), None
+    model, _, fallback = route.partition("|")
+    return model.strip(), fallback.strip() or None
+
+def route_table() -> dict:
+    """Every routed task with its model and fallback, for /llm/stats."""
+    tasks = list(MODEL_PROFILES) + sorted(k for k in _parse_pairs(settings.LLM_ROUTES) if "." in k)
+    table = {}
+    for task in tasks:
+        profile, _, mode = task.partition(".")
+        if profile in MODEL_PROFILES:
+            model, fallback = model_route(profile, mode or None)
+            table[task] = {"model": model, "fallback": fallback}
+    return table
+
+def choose_model(profile: str, mode: str = None, priority_class: str = None) -> str:
+    """
+    The model a generation for this task should run on right now: the
+    primary unless it has no free slot and the fallback does, or the
+    primary's queue is full and the fallback's isn't. The choice is final:
+    a generation already queued on the primary is not moved when the
+    fallback frees up later.
+    """
+    model, fallback = model_route(profile, mode)
+    if fallback is None or fallback == model:
+        return model
+    priority_class = priority_class or profile_priority(profile)
+    primary, backup = scheduler_for(model), scheduler_for(fallback)
+    if primary.can_start(priority_class):
+        return model
+    if backup.can_start(priority_class):
+        return fallback
+    if primary.is_full(priority_class) and not backup.is_full(priority_class):
+        return fallback
+    return model
+
+def check_llm_capacity(profile: str, mode: str = None):
+    """Raises LLMOverloaded if a generation for this task would be rejected on every model it can use."""
+    priority_class = profile_priority(profile)
+    scheduler_for(choose_model(profile, mode, priority_class)).check_capacity(priority_class)
+
+def check_stream_capacity(profile: str, mode: str = None, needs_model: bool = True):
+    """
+    check_llm_capacity for a streaming route, called before the response
+    starts: once the headers are sent, a rejected generation can only end
+    the stream with an error event, so overload is turned into a 429 here.
+    needs_model=False (everything is already stored) skips the check.
+    """
+    if needs_model:
+        check_llm_capacity(profile, mode)
+
+def _shared_async_client() -> AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncClient(
+            host=settings.OLLAMA_BASE_URL,
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=60.0
+            )
+        )
+    return _async_client
+
+class RegistryChatOllama(ChatOllama):
+    """
+    ChatOllama that routes each generation to its task's model, waits for a
+    slot on that model's scheduler and records it in app/llm_metrics.py. Agents label a generation's mode with
+    .bind(llm_mode=...).
+    """
+
+    priority: str = "content"
+    profile: str = ""
+
+    def _route(self, llm_mode):
+        """
+        Picks the model for this generation; returns it with the scheduler
+        slot to wait for and, if it is the fallback, the route_fallbacks
+        labels to count once the slot is admitted.
+        """
+        priority_class = current_priority(self.priority)
+        primary = model_route(self.profile, llm_mode)[0]
+        model = choose_model(self.profile, llm_mode, priority_class)
+        fallback = (self.profile, primary, llm_mode or "default", model) if model != primary else None
+        return model, scheduler_for(model).slot(priority_class), fallback
+
+    async def _astream(self, messages, stop=None, run_manager=None, llm_mode=None, **kwargs):
+        model, slot, fallback = self._route(llm_mode)
+        timer = GenerationTimer(self.profile, model, llm_mode)
+        outcome = "error"
+        try:
+            async with slot:
+                timer.admitted()
+                if fallback:
+                    route_fallbacks.inc(fallback)
+                async for chunk in super()._astream(messages, stop, run_manager, model=model, _timer=timer,
+                                                    **kwargs):
+                    yield chunk
+            outcome = "ok"
+        except LLMOverloaded:
+            outcome = "rejected"
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        finally:
+            timer.finish(outcome)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, llm_mode=None, **kwargs):
+        model, slot, fallback = self._route(llm_mode)
+        timer = GenerationTimer(self.profile, model, llm_mode)
+        outcome = "error"
+        try:
+            async with slot:
+                timer.admitted()
+                if fallback:
+                    route_fallbacks.inc(fallback)
+                result = await super()._agenerate(messages, stop, run_manager, model=model, _timer=timer,
+                                                  **kwargs)
+            outcome = "ok"
+            return result
+        except LLMOverloaded:
+            outcome = "rejected"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            timer.finish(outcome)
+
+    async def _aiterate_over_stream(self, messages, stop=None, _timer=None, **kwargs):
+        # Both _astream and _agenerate read Ollama's stream through here
+        async for chunk in super()._aiterate_over_stream(messages, stop, **kwargs):
+            if _timer is not None:
+                _timer.chunk(chunk)
+            yield chunk
+
+def keep_alive():
+    """OLLAMA_KEEP_ALIVE the way Ollama reads it: seconds as a number, otherwise a duration string."""
+    value = settings.OLLAMA_KEEP_ALIVE.strip()
+    return int(value) if re.fullmatch(r"-?\d+", value) else value
+
+def configured_models() -> list:
+    """Every model a task can be routed to, fallbacks included."""
+    models = {profile_model(profile) for profile in MODEL_PROFILES}
+    for route in route_table().values():
+        models.update(m for m in route.values() if m)
+    return sorted(models)
+
+def record_parse_failure(profile: str, mode: str = None):
+    """Counts a model reply the agent using this profile could not parse (against the task's primary model)."""
+    parse_failures.inc((profile, model_route(profile, mode)[0], mode or "default"))
+
+def get_llm(profile: str) -> ChatOllama:
+    """Returns the shared model for an agent profile, creating it on first use."""
+    llm = _models.get(profile)
+    if llm is None:
+        config = {"model": settings.OLLAMA_MODEL, "keep_alive": keep_alive(), **MODEL_PROFILES[profile]}
+        llm = RegistryChatOllama(base_url=settings.OLLAMA_BASE_URL, profile=profile, **config)
+        # Route async traffic through the one pooled client instead of the
+        # per-instance client ChatOllama builds for itself.
+        llm._async_client = _shared_async_client()
+        _models[profile] = llm
+    return llm
+
+async def warm_up_models() -> dict:
+    """
+    Loads every configured model into Ollama (a chat request without messages
+    only loads) and renews its keep_alive. Returns the seconds each load took;
+    models Ollama couldn't load are left out.
+    """
+    timings = {}
+    for model in configured_models():
+        started = time.perf_counter()
+        try:
+            await _shared_async_client().chat(model=model, messages=[], keep_alive=keep_alive())
+        except Exception as e:
+            print(f"Model warm-up failed for {model}: {e}")
+            continue
+        timings[model] = round(time.perf_counter() - started, 3)
+    return timings
+
+class ModelWarmer:
+    """
+    Background task that warms the models at startup and then every
+    `interval` seconds, so a model Ollama unloaded anyway (restart, memory
+    pressure, finite keep_alive while idle) is back before a user needs it.
+    A loaded model answers the load request at once, so repeats are cheap.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.warm = {}  # model -> seconds its last load request took
+        self.last_run = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            warm = await warm_up_models()
+            if warm.keys() - self.warm.keys():
+                print(f"Models loaded in Ollama (seconds): {warm}")
+            self.warm = warm
+            self.last_run = time.time()
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {"models": configured_models(), "warm": self.warm, "keep_alive": keep_alive(),
+                "last_run": self.last_run}
+
+model_warmer = ModelWarmer(settings.LLM_WARMUP_INTERVAL_SECONDS)
+
+async def close_clients():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    _models.clear()
@@ -0,0 +1,178 @@
+"""
+Prometheus metrics for model generations.
+
+Every generation through app/llm.py is timed here, labelled by agent (the
+model profile), model and mode (the lesson mode for content, "default"
+elsewhere):
+
+    llm_queue_wait_seconds           waiting for a scheduler slot
+    llm_time_to_first_token_seconds  from the slot to the first token
+    llm_generation_seconds           from the slot to the last token
+    llm_prompt_tokens                prompt tokens, as counted by Ollama
+    llm_completion_tokens            completion tokens, as counted by Ollama
+    llm_completion_tokens_per_second generation speed after the first token
+    llm_generations_total            by outcome: ok, error, cancelled, rejected
+    llm_parse_failures_total         replies an agent could not parse
+    llm_route_fallbacks_total        generations moved to a task's fallback model
+
+render() produces the Prometheus text format served on GET /metrics. The
+format is simple enough that no client library is needed.
+"""
+import bisect
+import math
+import time
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+SPEED_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400)
+
+LABELS = ("agent", "model", "mode")
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, labels: tuple, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple, labelnames: tuple = LABELS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.labelnames = labelnames
+        self._series = {}  # labels -> [per-bucket counts, sum, count]
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.setdefault(labels, [[0] * len(self.buckets), 0.0, 0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, labels: tuple) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {count}")
+        return lines
+
+queue_wait = Histogram("llm_queue_wait_seconds", "Time a generation waited for a scheduler slot.", SECONDS_BUCKETS)
+time_to_first_token = Histogram("llm_time_to_first_token_seconds",
+                                "Time from getting a slot to the first generated token.", SECONDS_BUCKETS)
+generation_time = Histogram("llm_generation_seconds", "Time from getting a slot to the end of the generation.",
+                            SECONDS_BUCKETS)
+prompt_tokens = Histogram("llm_prompt_tokens", "Prompt tokens per generation, as counted by Ollama.", TOKEN_BUCKETS)
+completion_tokens = Histogram("llm_completion_tokens", "Completion tokens per generation, as counted by Ollama.",
+                              TOKEN_BUCKETS)
+tokens_per_second = Histogram("llm_completion_tokens_per_second", "Completion tokens per second of generation.",
+                              SPEED_BUCKETS)
+generations = Counter("llm_generations_total", "Finished generations by outcome.", LABELS + ("outcome",))
+parse_failures = Counter("llm_parse_failures_total", "Model replies an agent could not parse.", LABELS)
+route_fallbacks = Counter("llm_route_fallbacks_total", "Generations moved to the fallback of a busy model.",
+                          ("agent", "model", "mode", "fallback"))
+
+METRICS = (queue_wait, time_to_first_token, generation_time, prompt_tokens, completion_tokens,
+           tokens_per_second, generations, parse_failures, route_fallbacks)
+
+class GenerationTimer:
+    """Collects one generation's timings; RegistryChatOllama feeds it chunks."""
+
+    def __init__(self, agent: str, model: str, mode: str = None):
+        self.labels = (agent, model, mode or "default")
+        self.queued_at = time.monotonic()
+        self.admitted_at = None
+        self.first_token_at = None
+        self.usage = {}
+
+    def admitted(self):
+        self.admitted_at = time.monotonic()
+        queue_wait.observe(self.labels, self.admitted_at - self.queued_at)
+
+    def chunk(self, chunk):
+        if self.first_token_at is None and chunk.text:
+            self.first_token_at = time.monotonic()
+            time_to_first_token.observe(self.labels, self.first_token_at - self.admitted_at)
+        info = chunk.generation_info or {}
+        if info.get("done"):
+            self.usage = info
+
+    def finish(self, outcome: str):
+        generations.inc(self.labels + (outcome,))
+        if outcome != "ok" or self.admitted_at is None:
+            return
+        finished_at = time.monotonic()
+        generation_time.observe(self.labels, finished_at - self.admitted_at)
+        if self.usage.get("prompt_eval_count") is not None:
+            prompt_tokens.observe(self.labels, self.usage["prompt_eval_count"])
+        completion = self.usage.get("eval_count")
+        if completion is not None:
+            completion_tokens.observe(self.labels, completion)
+            # Ollama's own eval_duration (ns) when it sends one, else the streaming time
+            if self.usage.get("eval_duration"):
+                seconds = self.usage["eval_duration"] / 1e9
+            else:
+                seconds = finished_at - (self.first_token_at or self.admitted_at)
+            if seconds > 0:
+                tokens_per_second.observe(self.labels, completion / seconds)
+
+def _scheduler_lines(scheduler_stats: dict) -> list:
+    """Gauges for each model's scheduler; scheduler_stats maps model -> LLMScheduler.stats()."""
+    lines = []
+    for name, key, help_text in (
+        ("llm_scheduler_slots", "slots", "Generations Ollama may run at once on the model."),
+        ("llm_scheduler_running", "running", "Generations holding a slot."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        lines += [f'{name}{{model="{_escape(model)}"}} {stats[key]}' for model, stats in scheduler_stats.items()]
+    for name, key, kind, help_text in (
+        ("llm_scheduler_queued", "queued", "gauge", "Generations waiting for a slot."),
+        ("llm_scheduler_queue_limit", "queue_limit", "gauge", "Waiting generations allowed before rejecting."),
+        ("llm_scheduler_rejected_total", "rejected", "counter", "Generations rejected with a full queue."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{model="{_escape(model)}",priority="{cls}"}} {values[key]}'
+                  for model, stats in scheduler_stats.items() for cls, values in stats["classes"].items()]
+    return lines
+
+def render(scheduler_stats: dict = None) -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    if scheduler_stats:
+        lines += _scheduler_lines(scheduler_stats)
+    return "\n".join(lines) + "\n"
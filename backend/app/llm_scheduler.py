@@ -0,0 +1,176 @@
+"""
+Priority admission for model generations.
+
+Ollama serves a handful of generations at once, so every generation first takes
+one of LLM_MAX_INFLIGHT slots here. When none are free it waits in the queue of
+its priority class, and a freed slot always goes to the oldest waiter of the
+most important class:
+
+    interactive  - tutor and coding chat
+    content      - lessons, quizzes, roadmaps
+    background   - quiz reviews, prefetching, anything run by app/jobs.py
+
+Each class has a bounded queue. A full queue rejects at once with
+LLMOverloaded (served as 429 with Retry-After) instead of letting the request
+time out.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+PRIORITY_CLASSES = ("interactive", "content", "background")  # most important first
+
+# Overrides the profile's class for generations started in this context
+_priority_override = ContextVar("llm_priority", default=None)
+
+@contextmanager
+def llm_priority(priority_class: str):
+    """Runs generations started inside the block (and tasks it spawns) in another class."""
+    token = _priority_override.set(priority_class)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+def set_llm_priority(priority_class: str):
+    """Sets the class for the rest of the current task, e.g. a background worker."""
+    _priority_override.set(priority_class)
+
+def current_priority(default: str) -> str:
+    return _priority_override.get() or default
+
+class LLMOverloaded(Exception):
+    def __init__(self, priority_class: str, retry_after: int):
+        super().__init__(f"The {priority_class} model queue is full, retry in {retry_after}s")
+        self.priority_class = priority_class
+        self.retry_after = retry_after
+
+class _ClassStats:
+    WINDOW = 1000  # recent queue times kept for percentiles
+
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent = deque(maxlen=self.WINDOW)
+
+    def record(self, waited: float):
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.recent.append(waited)
+
+    def snapshot(self, queued: int, limit: int) -> dict:
+        recent = sorted(self.recent)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))], 4) if recent else 0.0
+
+        return {
+            "queued": queued,
+            "queue_limit": limit,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_avg_seconds": round(self.wait_total / self.admitted, 4) if self.admitted else 0.0,
+            "wait_p50_seconds": pct(0.50),
+            "wait_p95_seconds": pct(0.95),
+            "wait_max_seconds": round(self.wait_max, 4),
+        }
+
+class LLMScheduler:
+    def __init__(self, slots: int, queue_limits: dict):
+        self.slots = slots
+        self.queue_limits = queue_limits
+        self._running = 0
+        self._waiters = {cls: deque() for cls in PRIORITY_CLASSES}
+        self._stats = {cls: _ClassStats() for cls in PRIORITY_CLASSES}
+        # Moving average of how long a generation holds its slot, for Retry-After
+        self._service_time = 5.0
+
+    def active(self) -> int:
+        """Generations running or waiting for a slot."""
+        return self._running + sum(len(q) for q in self._waiters.values())
+
+    def _waiting_ahead(self, priority_class: str) -> int:
+        ahead = 0
+        for cls in PRIORITY_CLASSES:
+            ahead += len(self._waiters[cls])
+            if cls == priority_class:
+                return ahead
+        return ahead
+
+    def retry_after(self, priority_class: str) -> int:
+        return max(1, math.ceil(self._service_time * (self._waiting_ahead(priority_class) + 1) / self.slots))
+
+    def _full(self, priority_class: str) -> bool:
+        return (self._running >= self.slots
+                and len(self._waiters[priority_class]) >= self.queue_limits[priority_class])
+
+    def can_start(self, priority_class: str) -> bool:
+        """True if a generation in this class would get a slot without waiting."""
+        return self._running < self.slots and self._waiting_ahead(priority_class) == 0
+
+    def is_full(self, priority_class: str) -> bool:
+        """True if a generation in this class would be rejected right now."""
+        return self._full(priority_class)
+
+    def check_capacity(self, priority_class: str):
+        """
+        Raises LLMOverloaded if a generation in this class would be rejected
+        right now. Streaming routes call it before sending response headers,
+        since a rejection after that can no longer become a 429.
+        """
+        if self._full(priority_class):
+            self._stats[priority_class].rejected += 1
+            raise LLMOverloaded(priority_class, self.retry_after(priority_class))
+
+    def _release(self):
+        for cls in PRIORITY_CLASSES:
+            waiters = self._waiters[cls]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)  # the slot passes straight to the waiter
+                    return
+        self._running -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority_class: str):
+        queued_at = time.monotonic()
+        if self.can_start(priority_class):
+            self._running += 1
+        else:
+            self.check_capacity(priority_class)
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[priority_class].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.cancelled():
+                    if waiter in self._waiters[priority_class]:
+                        self._waiters[priority_class].remove(waiter)
+                else:
+                    self._release()  # handed a slot just as we were cancelled
+                raise
+
+        started = time.monotonic()
+        self._stats[priority_class].record(started - queued_at)
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "running": self._running,
+            "classes": {
+                cls: self._stats[cls].snapshot(len(self._waiters[cls]), self.queue_limits[cls])
+                for cls in PRIORITY_CLASSES
+            },
+        }
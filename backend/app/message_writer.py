@@ -0,0 +1,135 @@
+import threading
+import time
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.db import get_db
+
+# Only chat transcripts go through the queue; everything else is written inline.
+TABLES = ("coding_messages", "tutor_messages")
+
+class MessageWriter:
+    """
+    Write-behind queue for chat messages.
+
+    Routes enqueue rows instead of doing an INSERT + commit per message. A
+    background thread writes everything queued in one transaction at most
+    flush_interval seconds later, or sooner once max_batch rows are waiting.
+    Reads call ensure_flushed() first so a session always sees its own writes,
+    and stop() drains the queue so nothing is lost on shutdown.
+
+    Batches are written on the writer thread's own connection. ensure_flushed()
+    runs inside a route's get_db() block, and writing there would put the
+    batch into the route's transaction.
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flushed = threading.Condition()
+        self._flushes_started = 0
+        self._flushes_finished = 0
+        self._stopping = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def enqueue(self, table: str, session_id: int, role: str, content: str):
+        if table not in TABLES:
+            raise ValueError(f"{table} is not a queued message table")
+        # Stamped now, not at flush time, so ORDER BY created_at keeps message order.
+        created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._pending.append((table, session_id, role, content, created_at))
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+    def ensure_flushed(self, table: str, session_id: int):
+        """Blocks until every queued message for this session is committed."""
+        with self._lock:
+            waiting = any(row[0] == table and row[1] == session_id for row in self._pending)
+        # A locked flush lock means a batch is being written right now and may
+        # contain this session's rows.
+        if not (waiting or self._flush_lock.locked()):
+            return
+        if not self._thread or not self._thread.is_alive() or threading.current_thread() is self._thread:
+            self.flush()
+            return
+        with self._flushed:
+            # The next batch the writer takes includes this session's rows
+            target = self._flushes_started + 1
+            self._wakeup.set()
+            self._flushed.wait_for(lambda: self._flushes_finished >= target, timeout=10.0)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._flushed:
+                self._flushes_started += 1
+            try:
+                return self._write_pending()
+            finally:
+                with self._flushed:
+                    self._flushes_finished += 1
+                    self._flushed.notify_all()
+
+    def _write_pending(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        with get_db() as conn:
+            try:
+                for table in TABLES:
+                    rows = [row[1:] for row in batch if row[0] == table]
+                    if rows:
+                        conn.executemany(
+                            f"INSERT INTO {table} (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                            rows
+                        )
+                conn.commit()
+            except Exception as e:
+                print(f"Message flush failed, will retry: {e}")
+                # Don't leave half the batch in the transaction; the retry writes all of it
+                conn.rollback()
+                with self._lock:
+                    self._pending = batch + self._pending
+                return 0
+
+        self.flushes += 1
+        self.rows_written += len(batch)
+        return len(batch)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the flusher and writes out whatever is still queued."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            if not self.flush():
+                time.sleep(0.1)
+
+message_writer = MessageWriter(
+    flush_interval=settings.MESSAGE_FLUSH_INTERVAL_MS / 1000,
+    max_batch=settings.MESSAGE_BATCH_SIZE
+)
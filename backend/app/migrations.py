@@ -0,0 +1,441 @@
+"""
+Versioned schema migrations.
+
+Each migration runs exactly once, in order, inside its own transaction and is
+recorded in the schema_version table. To change the schema, append a new
+(version, name, steps) entry to MIGRATIONS; never edit one that has shipped.
+A step is either a SQL string or a callable taking the connection.
+
+Statements are written in SQLite syntax; the Postgres backend rewrites the few
+dialect-specific bits (see app/storage/postgres.py).
+"""
+import json
+
+def _add_column(table: str, column: str, definition: str):
+    """Step that adds a column unless an older init_db() already created it."""
+    def step(conn):
+        existing = {col[0] for col in conn.execute(f"SELECT * FROM {table} LIMIT 0").description}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+INITIAL_SCHEMA = [
+    # Users Table
+    '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # Roadmaps Table
+    '''
+        CREATE TABLE IF NOT EXISTS roadmaps (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            language TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            interest TEXT,
+            objective TEXT,
+            roadmap_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Databases created before these columns existed
+    _add_column("roadmaps", "interest", "TEXT"),
+    _add_column("roadmaps", "objective", "TEXT"),
+    # Node Content Table (Cache)
+    '''
+        CREATE TABLE IF NOT EXISTS node_content (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            roadmap_id INTEGER NOT NULL,
+            node_label TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            content_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (roadmap_id) REFERENCES roadmaps (id),
+            UNIQUE(roadmap_id, node_label, mode)
+        )
+    ''',
+    # Quiz Attempts Table
+    '''
+        CREATE TABLE IF NOT EXISTS quiz_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            roadmap_id INTEGER NOT NULL,
+            node_label TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            total_questions INTEGER NOT NULL,
+            time_taken_seconds INTEGER NOT NULL,
+            attempt_data_json TEXT NOT NULL, -- Stores questions, user answers, time per question
+            review_text TEXT, -- AI generated review
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (roadmap_id) REFERENCES roadmaps (id)
+        )
+    ''',
+    _add_column("quiz_attempts", "review_text", "TEXT"),
+    # User Knowledge Table (Digital Twin Memory)
+    '''
+        CREATE TABLE IF NOT EXISTS user_knowledge (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            subtopic TEXT NOT NULL,
+            mastery_score INTEGER DEFAULT 0, -- 0 to 100
+            status TEXT DEFAULT 'novice', -- novice, competent, expert
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(user_id, topic, subtopic)
+        )
+    ''',
+    # Coding Sessions
+    '''
+        CREATE TABLE IF NOT EXISTS coding_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            title TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Coding Messages
+    '''
+        CREATE TABLE IF NOT EXISTS coding_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES coding_sessions (id)
+        )
+    ''',
+    # Resources Table
+    '''
+        CREATE TABLE IF NOT EXISTS resources (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            type TEXT NOT NULL,
+            category TEXT,
+            file_path TEXT,
+            filename TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Tutor Sessions
+    '''
+        CREATE TABLE IF NOT EXISTS tutor_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(user_id, topic)
+        )
+    ''',
+    # Tutor Messages
+    '''
+        CREATE TABLE IF NOT EXISTS tutor_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES tutor_sessions (id)
+        )
+    ''',
+]
+
+# One index per hot route query. Where the selected columns are small the index
+# covers them so the lookup never touches the table; message content is left out
+# on purpose, since copying every chat message into an index would double its size.
+HOT_PATH_INDEXES = [
+    # coding.chat / coding.get_session_details: WHERE session_id = ? ORDER BY created_at
+    "CREATE INDEX IF NOT EXISTS idx_coding_messages_session ON coding_messages (session_id, created_at)",
+    # tutor.chat / tutor.get_history: WHERE session_id = ? ORDER BY created_at
+    "CREATE INDEX IF NOT EXISTS idx_tutor_messages_session ON tutor_messages (session_id, created_at)",
+    # coding.get_user_sessions: WHERE user_id = ? ORDER BY created_at DESC
+    "CREATE INDEX IF NOT EXISTS idx_coding_sessions_user ON coding_sessions (user_id, created_at)",
+    # roadmap.get_user_roadmaps and resources.get_recommendations: WHERE user_id = ? ORDER BY created_at DESC
+    """CREATE INDEX IF NOT EXISTS idx_roadmaps_user
+       ON roadmaps (user_id, created_at, topic, language, difficulty, interest)""",
+    # roadmap.get_roadmap progress and the content/quiz status lookups
+    """CREATE INDEX IF NOT EXISTS idx_user_knowledge_topic
+       ON user_knowledge (user_id, topic, subtopic, mastery_score, status)""",
+    # Per-user, per-node attempt history
+    """CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_node
+       ON quiz_attempts (user_id, roadmap_id, node_label, created_at)""",
+    # resources.get_resources: ORDER BY created_at DESC
+    "CREATE INDEX IF NOT EXISTS idx_resources_created ON resources (created_at)",
+]
+
+def _normalize_roadmap_blobs(conn):
+    """
+    Moves trees and layouts out of legacy roadmap_json blobs. A frozen copy of
+    what app/roadmap_store.py wrote when this migration shipped, so later
+    changes there can't change what it does.
+    """
+    tree_keys = ("roadmap", "nodes", "edges")
+    for row in conn.execute("SELECT id, roadmap_json FROM roadmaps").fetchall():
+        roadmap_id, data = row["id"], json.loads(row["roadmap_json"])
+        if not any(key in data for key in tree_keys):
+            continue  # already normalized
+
+        nodes = []
+
+        def walk(tree, parent_seq):
+            for node in tree:
+                seq = len(nodes)
+                nodes.append((roadmap_id, seq, parent_seq, str(node.get("id", seq)),
+                              node.get("label", ""), node.get("description", "")))
+                walk(node.get("children") or [], seq)
+
+        walk(data.get("roadmap") or [], None)
+        conn.execute("DELETE FROM roadmap_nodes WHERE roadmap_id = ?", (roadmap_id,))
+        conn.executemany("""
+            INSERT INTO roadmap_nodes (roadmap_id, seq, parent_seq, node_id, label, description)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, nodes)
+
+        if data.get("nodes") is not None and data.get("edges") is not None:
+            for table, kind in (("roadmap_flow_nodes", "node"), ("roadmap_edges", "edge")):
+                elements = {}
+                for position, element in enumerate(data[kind + "s"]):
+                    if element.get("id") is not None:
+                        element_id = str(element["id"])
+                    elif kind == "edge" and element.get("source") is not None:
+                        element_id = f"{element['source']}-{element.get('target')}"
+                    else:
+                        element_id = f"{kind}-{position}"
+                    # A duplicate react-flow id keeps the last element
+                    elements[element_id] = (position, json.dumps(element, sort_keys=True, separators=(",", ":")))
+                conn.execute(f"DELETE FROM {table} WHERE roadmap_id = ?", (roadmap_id,))
+                conn.executemany(f"""
+                    INSERT INTO {table} (roadmap_id, element_id, position, element_json) VALUES (?, ?, ?, ?)
+                """, [(roadmap_id, element_id, position, element_json)
+                      for element_id, (position, element_json) in elements.items()])
+            conn.execute("UPDATE roadmaps SET layout_saved = 1 WHERE id = ?", (roadmap_id,))
+
+        header = {k: v for k, v in data.items() if k not in tree_keys}
+        conn.execute("UPDATE roadmaps SET roadmap_json = ? WHERE id = ?", (json.dumps(header), roadmap_id))
+
+# Roadmap trees and react-flow layouts move out of the roadmap_json blob into
+# per-node rows (see app/roadmap_store.py for how they are read and written now).
+NORMALIZED_ROADMAPS = [
+    '''
+        CREATE TABLE IF NOT EXISTS roadmap_nodes (
+            roadmap_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL, -- pre-order position in the tree
+            parent_seq INTEGER, -- NULL for top-level nodes
+            node_id TEXT NOT NULL,
+            label TEXT NOT NULL,
+            description TEXT,
+            PRIMARY KEY (roadmap_id, seq),
+            FOREIGN KEY (roadmap_id) REFERENCES roadmaps (id)
+        )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_roadmap_nodes_node ON roadmap_nodes (roadmap_id, node_id)",
+    '''
+        CREATE TABLE IF NOT EXISTS roadmap_flow_nodes (
+            roadmap_id INTEGER NOT NULL,
+            element_id TEXT NOT NULL, -- react-flow node id
+            position INTEGER NOT NULL,
+            element_json TEXT NOT NULL,
+            PRIMARY KEY (roadmap_id, element_id),
+            FOREIGN KEY (roadmap_id) REFERENCES roadmaps (id)
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS roadmap_edges (
+            roadmap_id INTEGER NOT NULL,
+            element_id TEXT NOT NULL, -- react-flow edge id
+            position INTEGER NOT NULL,
+            element_json TEXT NOT NULL,
+            PRIMARY KEY (roadmap_id, element_id),
+            FOREIGN KEY (roadmap_id) REFERENCES roadmaps (id)
+        )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_roadmap_flow_nodes_order ON roadmap_flow_nodes (roadmap_id, position)",
+    "CREATE INDEX IF NOT EXISTS idx_roadmap_edges_order ON roadmap_edges (roadmap_id, position)",
+    # Whether the user has saved a layout; an empty saved layout differs from none
+    _add_column("roadmaps", "layout_saved", "INTEGER NOT NULL DEFAULT 0"),
+    _normalize_roadmap_blobs,
+]
+
+# Durable queue for background work such as quiz reviews (see app/jobs.py)
+BACKGROUND_JOBS = [
+    '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending', -- pending, running, done, failed
+            payload_json TEXT NOT NULL,
+            result_text TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # Workers claim the oldest pending job: WHERE status = 'pending' ORDER BY id
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)",
+]
+
+# Low-priority, cancellable prefetch jobs (see app/prefetch.py)
+ROADMAP_PREFETCH = [
+    _add_column("jobs", "priority", "INTEGER NOT NULL DEFAULT 0"),
+    _add_column("jobs", "tag", "TEXT"),
+    # Claim order: WHERE status = 'pending' AND priority >= ? ORDER BY priority DESC, id
+    "DROP INDEX IF EXISTS idx_jobs_status",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority DESC, id)",
+    # Cancellation: WHERE tag = ? AND status = 'pending'
+    "CREATE INDEX IF NOT EXISTS idx_jobs_tag ON jobs (tag, status)",
+    # Lessons written by the prefetcher and not yet opened by the user
+    _add_column("node_content", "prefetched", "INTEGER NOT NULL DEFAULT 0"),
+    '''
+        CREATE TABLE IF NOT EXISTS prefetched_quizzes (
+            roadmap_id INTEGER NOT NULL,
+            node_label TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            language TEXT NOT NULL,
+            user_status TEXT NOT NULL,
+            questions_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (roadmap_id, node_label),
+            FOREIGN KEY (roadmap_id) REFERENCES roadmaps (id)
+        )
+    ''',
+]
+
+# Rolling summaries of chat turns that fell out of the context window (see app/chat_context.py)
+CHAT_SUMMARIES = [
+    '''
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            message_table TEXT NOT NULL, -- coding_messages or tutor_messages
+            session_id INTEGER NOT NULL,
+            summary TEXT NOT NULL,
+            covered_until_id INTEGER NOT NULL, -- last message folded into the summary
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (message_table, session_id)
+        )
+    ''',
+]
+
+# Shared bank of generated quiz questions (see app/question_bank.py)
+QUIZ_QUESTION_BANK = [
+    '''
+        CREATE TABLE IF NOT EXISTS quiz_questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            subtopic TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            language TEXT NOT NULL,
+            proficiency TEXT NOT NULL, -- novice, competent, expert
+            question_key TEXT NOT NULL, -- normalized question text, for dedup
+            question_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(topic, subtopic, difficulty, language, proficiency, question_key)
+        )
+    ''',
+    # Assembly walks a bucket oldest first: WHERE <bucket> ORDER BY id
+    """CREATE INDEX IF NOT EXISTS idx_quiz_questions_bucket
+       ON quiz_questions (topic, subtopic, difficulty, language, proficiency, id)""",
+    '''
+        CREATE TABLE IF NOT EXISTS quiz_questions_seen (
+            user_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, question_id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (question_id) REFERENCES quiz_questions (id)
+        )
+    ''',
+]
+
+ROADMAP_TEMPLATES = [
+    # One generated roadmap per normalized request, cloned into roadmaps on reuse
+    '''
+        CREATE TABLE IF NOT EXISTS roadmap_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic_key TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            language TEXT NOT NULL,
+            objective TEXT NOT NULL,
+            interest TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            roadmap_json TEXT NOT NULL,
+            uses INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP,
+            UNIQUE(topic_key, difficulty, language, objective, interest)
+        )
+    ''',
+    # Typo-tolerant lookups compare topics among templates with the same other settings
+    "CREATE INDEX IF NOT EXISTS idx_roadmap_templates_settings ON roadmap_templates (difficulty, language, objective, interest, topic_key)",
+]
+
+# Running jobs belong to one worker until their lease (epoch seconds) runs out
+JOB_LEASES = [
+    _add_column("jobs", "owner", "TEXT"),
+    _add_column("jobs", "lease_expires_at", "DOUBLE PRECISION"),
+]
+
+MIGRATIONS = [
+    (1, "initial schema", INITIAL_SCHEMA),
+    (2, "hot path indexes", HOT_PATH_INDEXES),
+    (3, "normalized roadmap nodes", NORMALIZED_ROADMAPS),
+    (4, "background jobs", BACKGROUND_JOBS),
+    (5, "roadmap prefetch", ROADMAP_PREFETCH),
+    (6, "chat summaries", CHAT_SUMMARIES),
+    (7, "quiz question bank", QUIZ_QUESTION_BANK),
+    (8, "roadmap templates", ROADMAP_TEMPLATES),
+    (9, "job leases", JOB_LEASES),
+]
+
+def current_version(conn) -> int:
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def run_migrations(backend):
+    """Applies every migration newer than the database's schema_version."""
+    with backend.connection() as conn:
+        _apply_pending(backend, conn)
+
+def _apply_pending(backend, conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+    for version, name, steps in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+
+        # Serializes migrations, so when several workers boot at once only one
+        # applies each migration and the rest see it as done.
+        backend.lock_for_migration(conn)
+        try:
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+            conn.commit()
+            print(f"Applied migration {version}: {name}")
+        except Exception:
+            conn.rollback()
+            raise
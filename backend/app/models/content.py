@@ -8,6 +8,7 @@ class ContentRequest(BaseModel):
     difficulty: str = "Normal"
     language: str = "English"
     interest: Optional[str] = None
+    objective: Optional[str] = None
     images: Optional[List[str]] = None
     videos: Optional[List[Union[str, dict]]] = None
 
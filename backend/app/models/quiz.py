@@ -0,0 +1,43 @@
+from pydantic import BaseModel, field_validator, model_validator
+from typing import List
+
+class QuizQuestion(BaseModel):
+    """One generated multiple choice question, as served to the quiz UI."""
+    id: int = 0  # renumbered 1..n once the question is accepted
+    question: str
+    options: List[str]
+    correct_answer: str
+    explanation: str = ""
+
+    @field_validator("question", "correct_answer", "explanation", mode="before")
+    @classmethod
+    def strip_text(cls, value):
+        return value.strip() if isinstance(value, str) else value
+
+    @field_validator("question")
+    @classmethod
+    def question_not_empty(cls, value):
+        if not value:
+            raise ValueError("question is empty")
+        return value
+
+    @field_validator("options")
+    @classmethod
+    def distinct_options(cls, value):
+        options = [str(option).strip() for option in value]
+        if len(options) < 2 or any(not option for option in options):
+            raise ValueError("need at least two non-empty options")
+        if len(set(options)) != len(options):
+            raise ValueError("options repeat")
+        return options
+
+    @model_validator(mode="after")
+    def answer_is_an_option(self):
+        if self.correct_answer not in self.options:
+            # Models often answer with the option's letter ("B") instead of its text
+            letter = self.correct_answer.rstrip(").").upper()
+            if len(letter) == 1 and 0 <= ord(letter) - ord("A") < len(self.options):
+                self.correct_answer = self.options[ord(letter) - ord("A")]
+            else:
+                raise ValueError("correct_answer does not match any option")
+        return self
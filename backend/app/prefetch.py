@@ -0,0 +1,66 @@
+"""
+Opt-in prefetch of lessons and quizzes for new roadmaps.
+
+A roadmap created with prefetch=true queues one background job per lesson
+(in each of PREFETCH_MODES) and per quiz for its first PREFETCH_NODES nodes in
+tree order. Background jobs only run while the model is otherwise idle (see
+app/jobs.py) and are cancelled when the roadmap is edited or deleted. The job
+handlers live in routes/content.py and routes/quiz.py, next to the code that
+serves their results, so a click on a node that is still being prefetched
+joins the same generation.
+"""
+from app.jobs import PRIORITY_BACKGROUND, add_job, job_queue
+
+LESSON_JOB = "prefetch_lesson"
+QUIZ_JOB = "prefetch_quiz"
+
+def roadmap_tag(roadmap_id: int) -> str:
+    return f"roadmap:{roadmap_id}"
+
+def schedule_prefetch(conn, roadmap_id: int, topic: str, difficulty: str, language: str,
+                      interest: str, objective: str, limit: int, modes: list) -> int:
+    """Queues prefetch jobs inside the caller's transaction. Returns how many."""
+    labels = [row["label"] for row in conn.execute(
+        "SELECT label FROM roadmap_nodes WHERE roadmap_id = ? ORDER BY seq LIMIT ?", (roadmap_id, limit)
+    ).fetchall()]
+    node = {"roadmap_id": roadmap_id, "topic": topic, "difficulty": difficulty,
+            "language": language, "interest": interest}
+    tag = roadmap_tag(roadmap_id)
+    queued = 0
+    for label in labels:
+        for mode in modes:
+            add_job(conn, LESSON_JOB, {**node, "subtopic": label, "mode": mode, "objective": objective},
+                    PRIORITY_BACKGROUND, tag)
+            queued += 1
+        add_job(conn, QUIZ_JOB, {**node, "subtopic": label}, PRIORITY_BACKGROUND, tag)
+        queued += 1
+    return queued
+
+class PrefetchStats:
+    def __init__(self):
+        self.scheduled = 0
+        self.cancelled = 0
+        self.lessons = 0  # lessons stored by the prefetcher
+        self.quizzes = 0
+        self.lesson_hits = 0  # prefetched lessons later opened by the user
+        self.quiz_hits = 0
+
+    def stats(self) -> dict:
+        generated = self.lessons + self.quizzes
+        hits = self.lesson_hits + self.quiz_hits
+        return {
+            "scheduled": self.scheduled,
+            "cancelled": self.cancelled,
+            "lessons_prefetched": self.lessons,
+            "quizzes_prefetched": self.quizzes,
+            "lesson_hits": self.lesson_hits,
+            "quiz_hits": self.quiz_hits,
+            "hit_rate": round(hits / generated, 4) if generated else 0.0,
+        }
+
+prefetch_stats = PrefetchStats()
+
+async def cancel_prefetch(roadmap_id: int) -> int:
+    cancelled = await job_queue.cancel(roadmap_tag(roadmap_id))
+    prefetch_stats.cancelled += cancelled
+    return cancelled
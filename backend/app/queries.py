@@ -0,0 +1,100 @@
+"""
+SQL for the hot route queries.
+
+The routes run these constants, and benchmarks/query_plans.py checks their
+plans, so the check always covers the SQL that actually ships. Queries
+with a variable table or IN list are str.format templates.
+"""
+
+# auth
+LOGIN = "SELECT id, username FROM users WHERE username = ? AND password_hash = ?"
+
+# roadmaps
+USER_ROADMAPS = "SELECT id, topic, language, difficulty, created_at FROM roadmaps WHERE user_id = ? ORDER BY created_at DESC"
+ROADMAP = """
+    SELECT roadmap_json, difficulty, language, user_id, topic, interest, objective, layout_saved
+    FROM roadmaps WHERE id = ?
+"""
+ROADMAP_PROGRESS = "SELECT subtopic, mastery_score, status FROM user_knowledge WHERE user_id = ? AND topic = ?"
+ROADMAP_TREE = """
+    SELECT seq, parent_seq, node_id, label, description FROM roadmap_nodes
+    WHERE roadmap_id = ? ORDER BY seq
+"""
+LAYOUT_NODES = "SELECT element_json FROM roadmap_flow_nodes WHERE roadmap_id = ? ORDER BY position"
+LAYOUT_EDGES = "SELECT element_json FROM roadmap_edges WHERE roadmap_id = ? ORDER BY position"
+LAYOUT_ELEMENTS = "SELECT element_id, position, element_json FROM {table} WHERE roadmap_id = ?"
+TEMPLATE_EXACT = """
+    SELECT id, roadmap_json FROM roadmap_templates
+    WHERE topic_key = ? AND difficulty = ? AND language = ? AND objective = ? AND interest = ?
+"""
+TEMPLATE_CANDIDATES = """
+    SELECT id, topic_key FROM roadmap_templates
+    WHERE difficulty = ? AND language = ? AND objective = ? AND interest = ? AND substr(topic_key, 1, 1) = ?
+"""
+
+# lessons and quizzes
+USER_STATUS = "SELECT status FROM user_knowledge WHERE user_id = ? AND topic = ? AND subtopic = ?"
+MASTERY = "SELECT mastery_score FROM user_knowledge WHERE user_id = ? AND topic = ? AND subtopic = ?"
+NODE_CONTENT = """
+    SELECT content_json, prefetched FROM node_content
+    WHERE roadmap_id = ? AND node_label = ? AND mode = ?
+"""
+BATCH_ROADMAP = """
+    SELECT r.topic, r.difficulty, r.language, r.interest, r.objective, k.subtopic, k.status
+    FROM roadmaps r LEFT JOIN user_knowledge k ON k.user_id = r.user_id AND k.topic = r.topic
+    WHERE r.id = ?
+"""
+BATCH_STORED = """
+    SELECT node_label, mode, content_json FROM node_content
+    WHERE roadmap_id = ? AND node_label IN ({placeholders})
+"""
+OPEN_NODE = """
+    SELECT r.user_id, r.topic, r.difficulty, r.language, r.interest, r.objective, k.status,
+           n.roadmap_id IS NOT NULL AS stored
+    FROM roadmaps r
+    LEFT JOIN user_knowledge k ON k.user_id = r.user_id AND k.topic = r.topic AND k.subtopic = ?
+    LEFT JOIN node_content n ON n.roadmap_id = r.id AND n.node_label = ? AND n.mode = ?
+    WHERE r.id = ?
+"""
+PREFETCHED_QUIZ = """
+    SELECT questions_json FROM prefetched_quizzes
+    WHERE roadmap_id = ? AND node_label = ? AND difficulty = ? AND language = ? AND user_status = ?
+"""
+BANK_UNSEEN = """
+    SELECT q.id, q.question_json FROM quiz_questions q
+    WHERE q.topic = ? AND q.subtopic = ? AND q.difficulty = ? AND q.language = ? AND q.proficiency = ?
+      AND NOT EXISTS (SELECT 1 FROM quiz_questions_seen s WHERE s.user_id = ? AND s.question_id = q.id)
+    ORDER BY q.id LIMIT ?
+"""
+BANK_RECENT = """
+    SELECT question_json FROM quiz_questions
+    WHERE topic = ? AND subtopic = ? AND difficulty = ? AND language = ? AND proficiency = ?
+    ORDER BY id DESC LIMIT ?
+"""
+
+# chat sessions
+CODING_SESSIONS = "SELECT * FROM coding_sessions WHERE user_id = ? ORDER BY created_at DESC"
+CODING_HISTORY = "SELECT * FROM coding_messages WHERE session_id = ? ORDER BY created_at ASC"
+TUTOR_SESSION = "SELECT id FROM tutor_sessions WHERE user_id = ? AND topic = ?"
+TUTOR_HISTORY = "SELECT role, content FROM tutor_messages WHERE session_id = ? ORDER BY created_at ASC, id ASC"
+CHAT_WINDOW = """
+    SELECT id, role, content FROM {table}
+    WHERE session_id = ? AND id > ? ORDER BY created_at ASC, id ASC
+"""
+CHAT_SUMMARY = "SELECT summary, covered_until_id FROM chat_summaries WHERE message_table = ? AND session_id = ?"
+
+# background jobs
+JOB_TAG_ACTIVE = "SELECT 1 FROM jobs WHERE tag = ? AND status IN ('pending', 'running') LIMIT 1"
+JOB_NEXT = """
+    SELECT id, kind, payload_json, attempts, priority, tag FROM jobs
+    WHERE status = 'pending' AND priority >= ? ORDER BY priority DESC, id LIMIT 1
+"""
+JOB_CANCEL_PENDING = """
+    UPDATE jobs SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+    WHERE tag = ? AND status = 'pending'
+"""
+
+# resources
+RECENT_INTERESTS = "SELECT topic, interest, difficulty FROM roadmaps WHERE user_id = ? ORDER BY created_at DESC LIMIT 5"
+RECENT_RESOURCES = "SELECT * FROM resources ORDER BY created_at DESC LIMIT 5"
+RESOURCES = "SELECT * FROM resources ORDER BY created_at DESC"
@@ -0,0 +1,79 @@
+"""
+Shared bank of generated quiz questions.
+
+Every question the quiz agent generates is stored in quiz_questions under its
+bucket - (topic, subtopic, difficulty, language, proficiency), normalised -
+and deduplicated by normalised question text. Quizzes are assembled from the
+bank, skipping questions the user has already been served (recorded in
+quiz_questions_seen), and the model is only asked to top up a bucket when it
+runs short of questions the user hasn't seen.
+"""
+import json
+import re
+from app import queries
+
+def normalize_text(text: str) -> str:
+    """Lowercased words without punctuation; equal for trivially reworded duplicates."""
+    return " ".join(re.sub(r"[^\w\s]", "", text.lower()).split())
+
+def bucket_for(topic: str, subtopic: str, difficulty: str, language: str, proficiency: str) -> tuple:
+    return tuple(" ".join(str(value).lower().split()) for value in (topic, subtopic, difficulty, language, proficiency))
+
+def pick_unseen(conn, bucket: tuple, user_id: int, limit: int) -> list:
+    """Oldest questions in the bucket the user hasn't been served; user_id 0 is anonymous."""
+    rows = conn.execute(queries.BANK_UNSEEN, (*bucket, user_id, limit)).fetchall()
+    return [{**json.loads(row["question_json"]), "bank_id": row["id"]} for row in rows]
+
+def recent_questions(conn, bucket: tuple, limit: int) -> list:
+    """Text of the newest questions in a bucket, for the model to avoid repeating."""
+    rows = conn.execute(queries.BANK_RECENT, (*bucket, limit)).fetchall()
+    return [json.loads(row["question_json"])["question"] for row in rows]
+
+def store_questions(conn, bucket: tuple, questions: list) -> list:
+    """
+    Adds generated questions to the bank and commits. Returns the ones that
+    were new, with their bank_id; duplicates of stored questions are dropped.
+    """
+    stored = []
+    c = conn.cursor()
+    for question in questions:
+        body = {k: v for k, v in question.items() if k not in ("id", "bank_id")}
+        c.execute(f"""
+            INSERT INTO quiz_questions (topic, subtopic, difficulty, language, proficiency, question_key, question_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (topic, subtopic, difficulty, language, proficiency, question_key) DO NOTHING
+        """, (*bucket, normalize_text(body["question"]), json.dumps(body)))
+        if c.rowcount == 1:
+            stored.append({**body, "bank_id": c.lastrowid})
+    conn.commit()
+    return stored
+
+def mark_seen(conn, user_id: int, questions: list):
+    if not user_id:
+        return
+    conn.executemany("""
+        INSERT INTO quiz_questions_seen (user_id, question_id) VALUES (?, ?)
+        ON CONFLICT (user_id, question_id) DO NOTHING
+    """, [(user_id, q["bank_id"]) for q in questions if q.get("bank_id")])
+    conn.commit()
+
+def numbered(questions: list) -> list:
+    """Quiz ids run 1..n in the order served; the frontend keys answers by them."""
+    return [{**q, "id": i} for i, q in enumerate(questions, 1)]
+
+class QuestionBankStats:
+    def __init__(self):
+        self.quizzes = 0
+        self.from_bank = 0  # questions served that were already in the bank
+        self.generated = 0  # questions the model added to the bank
+
+    def stats(self) -> dict:
+        served = self.from_bank + self.generated
+        return {
+            "quizzes": self.quizzes,
+            "questions_from_bank": self.from_bank,
+            "questions_generated": self.generated,
+            "bank_hit_rate": round(self.from_bank / served, 4) if served else 0.0,
+        }
+
+question_bank_stats = QuestionBankStats()
@@ -0,0 +1,115 @@
+"""
+Normalized roadmap storage.
+
+roadmaps.roadmap_json only keeps the small header (topic, difficulty, ...).
+The concept tree lives in roadmap_nodes, one row per node in pre-order, and the
+saved react-flow layout lives in roadmap_flow_nodes / roadmap_edges, one row
+per element keyed by its react-flow id. All helpers take an open connection
+and leave committing to the caller.
+"""
+import json
+from app import queries
+
+# Keys that moved out of the roadmap_json blob into their own tables
+TREE_KEYS = ("roadmap", "nodes", "edges")
+
+def _canonical(element: dict) -> str:
+    return json.dumps(element, sort_keys=True, separators=(",", ":"))
+
+def split_header(data: dict) -> str:
+    """roadmap_json for a roadmap: everything except the tree and layout."""
+    return json.dumps({k: v for k, v in data.items() if k not in TREE_KEYS})
+
+def write_tree(conn, roadmap_id: int, tree: list):
+    """Stores a fresh roadmap's concept tree (list of RoadmapNode dicts)."""
+    rows = []
+
+    def walk(nodes, parent_seq):
+        for node in nodes:
+            seq = len(rows)
+            rows.append((roadmap_id, seq, parent_seq, str(node.get("id", seq)),
+                         node.get("label", ""), node.get("description", "")))
+            walk(node.get("children") or [], seq)
+
+    walk(tree, None)
+    conn.executemany("""
+        INSERT INTO roadmap_nodes (roadmap_id, seq, parent_seq, node_id, label, description)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+
+def read_tree(conn, roadmap_id: int) -> list:
+    rows = conn.execute(queries.ROADMAP_TREE, (roadmap_id,)).fetchall()
+
+    # Pre-order means every parent is built before its children
+    built = {}
+    tree = []
+    for row in rows:
+        node = {"id": row["node_id"], "label": row["label"], "description": row["description"], "children": []}
+        built[row["seq"]] = node
+        if row["parent_seq"] is None:
+            tree.append(node)
+        else:
+            built[row["parent_seq"]]["children"].append(node)
+    return tree
+
+def _element_id(element: dict, position: int, kind: str) -> str:
+    if element.get("id") is not None:
+        return str(element["id"])
+    if kind == "edge" and element.get("source") is not None:
+        return f"{element['source']}-{element.get('target')}"
+    return f"{kind}-{position}"
+
+def _sync_elements(conn, table: str, kind: str, roadmap_id: int, elements: list) -> int:
+    """Writes only the rows whose content or position changed. Returns rows touched."""
+    existing = {
+        row["element_id"]: (row["position"], row["element_json"])
+        for row in conn.execute(queries.LAYOUT_ELEMENTS.format(table=table), (roadmap_id,)).fetchall()
+    }
+
+    wanted = {}
+    for position, element in enumerate(elements):
+        # react-flow ids are unique; if a client sends a duplicate the last one wins
+        wanted[_element_id(element, position, kind)] = (position, _canonical(element))
+
+    changed = [
+        (roadmap_id, element_id, position, element_json)
+        for element_id, (position, element_json) in wanted.items()
+        if existing.get(element_id) != (position, element_json)
+    ]
+    removed = [(roadmap_id, element_id) for element_id in existing if element_id not in wanted]
+
+    if changed:
+        conn.executemany(f"""
+            INSERT INTO {table} (roadmap_id, element_id, position, element_json) VALUES (?, ?, ?, ?)
+            ON CONFLICT (roadmap_id, element_id)
+            DO UPDATE SET position = excluded.position, element_json = excluded.element_json
+        """, changed)
+    if removed:
+        conn.executemany(f"DELETE FROM {table} WHERE roadmap_id = ? AND element_id = ?", removed)
+    return len(changed) + len(removed)
+
+def write_layout(conn, roadmap_id: int, nodes: list, edges: list) -> int:
+    """Saves the react-flow layout, touching only changed elements."""
+    touched = _sync_elements(conn, "roadmap_flow_nodes", "node", roadmap_id, nodes)
+    touched += _sync_elements(conn, "roadmap_edges", "edge", roadmap_id, edges)
+    conn.execute("UPDATE roadmaps SET layout_saved = 1 WHERE id = ? AND layout_saved = 0", (roadmap_id,))
+    return touched
+
+def read_layout(conn, roadmap_id: int):
+    nodes = [json.loads(row[0]) for row in conn.execute(queries.LAYOUT_NODES, (roadmap_id,)).fetchall()]
+    edges = [json.loads(row[0]) for row in conn.execute(queries.LAYOUT_EDGES, (roadmap_id,)).fetchall()]
+    return nodes, edges
+
+def insert_roadmap(conn, user_id: int, topic: str, language: str, difficulty: str,
+                   interest: str, objective: str, data: dict) -> int:
+    """Creates a roadmap row plus its node rows; data is a RoadmapResponse dict."""
+    c = conn.cursor()
+    c.execute("""
+        INSERT INTO roadmaps (user_id, topic, language, difficulty, interest, objective, roadmap_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (user_id, topic, language, difficulty, interest, objective, split_header(data)))
+    roadmap_id = c.lastrowid
+    write_tree(conn, roadmap_id, data.get("roadmap") or [])
+    if data.get("nodes") is not None and data.get("edges") is not None:
+        write_layout(conn, roadmap_id, data["nodes"], data["edges"])
+    return roadmap_id
@@ -0,0 +1,113 @@
+"""
+Reusable roadmap templates for the curriculum planner.
+
+Most roadmap requests repeat earlier ones ("Machine Learning / Normal /
+English", no interest or objective), so every generated roadmap is kept in
+roadmap_templates under its normalized (topic, difficulty, language,
+objective, interest) key and later requests are served by cloning it into
+roadmaps. Topics match loosely: case, punctuation, plurals and filler words
+("introduction to", "basics") are ignored, and small typos are tolerated
+among the templates with the same other settings. Requests with fresh=true
+always generate, and replace the stored template.
+"""
+import difflib
+import json
+import re
+from app import queries
+
+# Words that don't change what a roadmap should cover
+FILLER_WORDS = {"a", "an", "the", "to", "of", "in", "on", "for", "with", "intro", "introduction",
+                "basics", "fundamentals", "beginner", "beginners", "guide", "course", "learn"}
+
+def _normalize(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+def topic_key(topic: str) -> str:
+    # "+" and "#" are kept so C, C++ and C# stay apart
+    words = re.sub(r"[^\w+#]+", " ", topic.lower()).split()
+    words = [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+             for w in words if w not in FILLER_WORDS]
+    return " ".join(words) or _normalize(topic)
+
+def template_key(topic: str, difficulty: str, language: str, objective: str, interest: str) -> tuple:
+    return (topic_key(topic), _normalize(difficulty), _normalize(language), _normalize(objective), _normalize(interest))
+
+def _close_enough(a: str, b: str, similarity: float) -> bool:
+    # "Python 2" and "Python 3" read alike but are different courses
+    if re.findall(r"\d+", a) != re.findall(r"\d+", b):
+        return False
+    return difflib.SequenceMatcher(None, a, b).ratio() >= similarity
+
+def find_template(conn, key: tuple, similarity: float):
+    """Returns (template_id, roadmap dict, fuzzy) for the best stored match, or None."""
+    row = conn.execute(queries.TEMPLATE_EXACT, key).fetchone()
+    if row:
+        return row["id"], json.loads(row["roadmap_json"]), False
+
+    # Typo tolerance: only compare topics starting with the same character,
+    # and never very short ones, where one letter is a different subject
+    topic = key[0]
+    if len(topic) < 6:
+        return None
+    candidates = conn.execute(queries.TEMPLATE_CANDIDATES, (*key[1:], topic[0])).fetchall()
+    best = None
+    for candidate in candidates:
+        score = difflib.SequenceMatcher(None, topic, candidate["topic_key"]).ratio()
+        if _close_enough(topic, candidate["topic_key"], similarity) and (best is None or score > best[0]):
+            best = (score, candidate["id"])
+    if best is None:
+        return None
+    row = conn.execute("SELECT id, roadmap_json FROM roadmap_templates WHERE id = ?", (best[1],)).fetchone()
+    return (row["id"], json.loads(row["roadmap_json"]), True) if row else None
+
+def save_template(conn, key: tuple, topic: str, roadmap: dict):
+    """Stores or replaces the template for key inside the caller's transaction."""
+    conn.execute("""
+        INSERT INTO roadmap_templates (topic_key, difficulty, language, objective, interest, topic, roadmap_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (topic_key, difficulty, language, objective, interest)
+        DO UPDATE SET topic = excluded.topic, roadmap_json = excluded.roadmap_json, uses = 0,
+                      created_at = CURRENT_TIMESTAMP
+    """, (*key, topic, json.dumps(roadmap)))
+
+def record_use(conn, template_id: int):
+    conn.execute("""
+        UPDATE roadmap_templates SET uses = uses + 1, last_used_at = CURRENT_TIMESTAMP WHERE id = ?
+    """, (template_id,))
+
+def invalidate_templates(conn, topic: str = None, template_id: int = None) -> int:
+    """Deletes one template, every template for a topic, or all of them. Returns how many."""
+    c = conn.cursor()
+    if template_id is not None:
+        c.execute("DELETE FROM roadmap_templates WHERE id = ?", (template_id,))
+    elif topic:
+        c.execute("DELETE FROM roadmap_templates WHERE topic_key = ?", (topic_key(topic),))
+    else:
+        c.execute("DELETE FROM roadmap_templates")
+    conn.commit()
+    return c.rowcount
+
+def count_templates(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM roadmap_templates").fetchone()[0]
+
+class TemplateStats:
+    def __init__(self):
+        self.hits = 0
+        self.fuzzy_hits = 0  # part of hits
+        self.misses = 0
+        self.forced = 0  # fresh=true requests, which skip the lookup
+        self.invalidated = 0
+
+    def stats(self, templates: int) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "templates": templates,
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "forced_fresh": self.forced,
+            "invalidated": self.invalidated,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+template_stats = TemplateStats()
@@ -0,0 +1,49 @@
+"""
+Async Serper client for lesson media.
+
+Searches go through one pooled httpx.AsyncClient with strict timeouts, so
+they never block the event loop and a slow or unreachable Serper costs at
+most SERPER_TIMEOUT_SECONDS. Failures return {}, and the lesson is served
+without that media.
+"""
+import httpx
+from app.core.config import settings
+
+SEARCH_PATHS = {"images": "/images", "videos": "/videos", "search": "/search"}
+
+_client = None
+
+def _shared_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.SERPER_TIMEOUT_SECONDS,
+                                  connect=min(settings.SERPER_TIMEOUT_SECONDS, 2.0)),
+            limits=httpx.Limits(
+                max_connections=settings.SERPER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SERPER_MAX_CONNECTIONS,
+                keepalive_expiry=60.0
+            )
+        )
+    return _client
+
+async def search_serper(query: str, type: str = "search", num: int = 3) -> dict:
+    """One Serper search ("search", "images" or "videos"); {} if it fails or times out."""
+    url = f"{settings.SERPER_BASE_URL}{SEARCH_PATHS.get(type, '/search')}"
+    try:
+        response = await _shared_client().post(
+            url,
+            headers={"X-API-KEY": settings.SERPER_API_KEY},
+            json={"q": query, "num": num}
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        print(f"Serper API Error ({type}): {e!r}")
+        return {}
+
+async def close_serper_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
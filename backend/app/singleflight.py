@@ -0,0 +1,52 @@
+import asyncio
+
+class _Flight:
+    def __init__(self, task, cancel_orphaned: bool):
+        self.task = task
+        self.waiters = 0
+        self.cancel_orphaned = cancel_orphaned
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key starts the work; callers that arrive while it
+    is running await the same task and receive the same result (or exception).
+    The key is forgotten as soon as the call finishes, so this never serves
+    stale results - it only deduplicates simultaneous work.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, fn, cancel_orphaned: bool = False):
+        """
+        By default the work keeps running when every waiter is cancelled, so
+        its side effects (e.g. saving a lesson) still happen. With
+        cancel_orphaned=True the work is cancelled once its last waiter
+        goes away, unless some waiter joined without that flag.
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()), cancel_orphaned)
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _, flight=flight: self._forget(key, flight))
+        else:
+            flight.cancel_orphaned = flight.cancel_orphaned and cancel_orphaned
+
+        flight.waiters += 1
+        try:
+            # Shielded so one disconnecting client does not cancel the work the
+            # other waiters are sharing.
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and flight.cancel_orphaned and not flight.task.done():
+                flight.task.cancel()
+
+    def _forget(self, key, flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def inflight(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+
+class StorageBackend:
+    """
+    A database the app can run on. Routes keep writing plain SQL with `?`
+    placeholders against the connection from app.db.get_db(); a backend
+    supplies that connection and smooths over the dialect differences:
+
+    - rows support both row["column"] and row[0], and dict(row)
+    - cursor.lastrowid is the id generated by the last INSERT
+    - IntegrityError is the exception raised for constraint violations
+
+    SQL shared by both backends should stick to the common subset (no
+    INSERT OR IGNORE / REPLACE; use ON CONFLICT ... DO NOTHING / DO UPDATE).
+    """
+
+    dialect = ""
+    IntegrityError = Exception
+
+    @contextmanager
+    def connection(self):
+        """
+        Yields a connection reused by nested blocks on the same thread. Any
+        transaction still open when the outermost block exits is rolled back.
+        """
+        raise NotImplementedError
+
+    def lock_for_migration(self, conn):
+        """Starts a transaction that serializes concurrent schema migrations."""
+        raise NotImplementedError
+
+    def close_all(self):
+        raise NotImplementedError
@@ -0,0 +1,143 @@
+import threading
+from contextlib import contextmanager
+from app.storage.base import StorageBackend
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.extras
+    import psycopg2.pool
+except ImportError:  # Optional dependency, only needed when DATABASE_URL points at Postgres
+    psycopg2 = None
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers migrate one at a time
+MIGRATION_LOCK_KEY = 7_301_001
+
+# SQLite DDL fragments and their Postgres equivalents
+DDL_REWRITES = (
+    ("INTEGER PRIMARY KEY AUTOINCREMENT", "SERIAL PRIMARY KEY"),
+)
+
+def translate(sql: str) -> str:
+    """Rewrites the shared `?`-placeholder SQL into psycopg2's format style."""
+    for sqlite_form, pg_form in DDL_REWRITES:
+        sql = sql.replace(sqlite_form, pg_form)
+    return sql.replace("%", "%%").replace("?", "%s")
+
+def _timestamp_as_text(value, cursor):
+    # SQLite hands timestamps back as 'YYYY-MM-DD HH:MM:SS' strings and the
+    # response models expect that, so skip the datetime conversion.
+    return value[:19] if value is not None else None
+
+class PgCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql: str, params=()):
+        self._cursor.execute(translate(sql), tuple(params))
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        self._cursor.executemany(translate(sql), [tuple(p) for p in seq_of_params])
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        # psycopg2's own lastrowid is an OID, so ask for the sequence value
+        # the last INSERT drew in this session instead.
+        with self._cursor.connection.cursor() as c:
+            c.execute("SELECT lastval()")
+            return c.fetchone()[0]
+
+class PgConnection:
+    """Gives a psycopg2 connection the sqlite3.Connection surface the routes use."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self):
+        return PgCursor(self.raw.cursor(cursor_factory=psycopg2.extras.DictCursor))
+
+    def execute(self, sql: str, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.raw.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+class PostgresBackend(StorageBackend):
+    """
+    PostgreSQL (e.g. Supabase) backend on a psycopg2 ThreadedConnectionPool.
+    A thread borrows one pooled connection for its outermost get_db() block
+    and returns it when the block exits.
+    """
+
+    dialect = "postgres"
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        if psycopg2 is None:
+            raise RuntimeError("DATABASE_URL points at PostgreSQL but psycopg2 is not installed")
+        self.IntegrityError = psycopg2.IntegrityError
+        self._pool = psycopg2.pool.ThreadedConnectionPool(min_size, max_size, dsn)
+        self._local = threading.local()
+        self._timestamp_type = psycopg2.extensions.new_type(
+            (1114, 1184), "TIMESTAMP_AS_TEXT", _timestamp_as_text  # timestamp, timestamptz
+        )
+
+    def _checkout(self) -> PgConnection:
+        raw = self._pool.getconn()
+        psycopg2.extensions.register_type(self._timestamp_type, raw)
+        return PgConnection(raw)
+
+    @contextmanager
+    def connection(self):
+        local = self._local
+        if getattr(local, "conn", None) is None:
+            local.conn = self._checkout()
+            local.depth = 0
+
+        conn = local.conn
+        local.depth += 1
+        try:
+            yield conn
+        finally:
+            local.depth -= 1
+            if local.depth == 0:
+                local.conn = None
+                try:
+                    if not conn.raw.closed and conn.in_transaction:
+                        conn.rollback()
+                finally:
+                    self._pool.putconn(conn.raw, close=bool(conn.raw.closed))
+
+    def lock_for_migration(self, conn):
+        conn.execute("SELECT pg_advisory_xact_lock(?)", (MIGRATION_LOCK_KEY,))
+
+    def close_all(self):
+        self._pool.closeall()
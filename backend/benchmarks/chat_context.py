@@ -0,0 +1,133 @@
+"""
+Chat context benchmark: prompt size and time to first token for the coding and
+tutor agents at turn 5, 50 and 200 of a session, before and after the token
+budget with rolling summaries (app/chat_context.py).
+
+"before" sends what the agents used to: the whole transcript for coding and
+the last 5 messages for the tutor. "after" sends the stored summary plus the
+window load_context() picks, with the summary refreshed the way the
+background job would have. Runs against a fake Ollama whose TTFT grows with
+the prompt (--prefill-per-token), so no model is needed.
+
+Run from the backend directory:
+    python -m benchmarks.chat_context
+    python -m benchmarks.chat_context --turns 5 50 200 --prefill-per-token 0.0005
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-bench-"), "bench.db")
+
+from app import db  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.chat_context import load_context, refresh_summary  # noqa: E402
+from app.agents import coding, tutor  # noqa: E402
+from app.llm import close_clients  # noqa: E402
+from benchmarks.fake_ollama import FakeOllama, default_reply  # noqa: E402
+
+USER_TURN = ("Can you explain why my loop over the list skips every second element when I remove items "
+             "while iterating, and what the idiomatic way to filter it would be instead? ")
+ASSISTANT_TURN = ("When you remove an element the list shifts left, so the iterator's index now points one "
+                  "past the element that moved into the freed slot. That is why every second item survives. "
+                  "Build a new list instead, for example with a comprehension that keeps the items you want, "
+                  "or iterate over a copy if you really need to mutate in place. ") * 2
+
+def reply(body):
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if "running summary" in prompt:
+        # A summary of realistic length, so "after" pays for carrying it
+        return " ".join(["The learner is filtering lists while iterating and"] * 15)
+    return default_reply(body, 20)
+
+def seed(table: str, session_id: int, turns: int):
+    def insert(conn):
+        for _ in range(turns):
+            for role, content in (("user", USER_TURN), ("assistant", ASSISTANT_TURN)):
+                conn.execute(f"INSERT INTO {table} (session_id, role, content) VALUES (?, ?, ?)",
+                             (session_id, role, content))
+        conn.commit()
+    return db.run_db(insert)
+
+def new_session(agent: str):
+    def insert(conn):
+        c = conn.cursor()
+        if agent == "coding":
+            c.execute("INSERT INTO coding_sessions (user_id, language, title) VALUES (1, 'Python', 'bench')")
+        else:
+            c.execute("INSERT INTO tutor_sessions (user_id, topic) VALUES (1, ?)", (f"bench-{time.monotonic()}",))
+        conn.commit()
+        return c.lastrowid
+    return db.run_db(insert)
+
+def all_messages(table: str, session_id: int):
+    def query(conn):
+        rows = conn.execute(f"SELECT role, content FROM {table} WHERE session_id = ? ORDER BY created_at ASC, id ASC",
+                            (session_id,)).fetchall()
+        return [{"role": r["role"], "content": r["content"]} for r in rows]
+    return db.run_db(query)
+
+async def first_token(agent: str, history: list, summary: str) -> float:
+    started = time.perf_counter()
+    if agent == "coding":
+        stream = await coding.get_tutor_response(history, USER_TURN, "Python", summary)
+    else:
+        stream = tutor.stream_tutor_response("Python", USER_TURN, history, summary)
+    ttft = None
+    async for _ in stream:
+        if ttft is None:
+            ttft = time.perf_counter() - started
+    return ttft
+
+async def measure(fake: FakeOllama, agent: str, history: list, summary: str = ""):
+    ttft = await first_token(agent, history, summary)
+    return fake.prompt_tokens[-1], ttft
+
+async def run(turns_list: list, prefill_per_token: float):
+    fake = FakeOllama(ttft=0.02, tokens_per_sec=200, prefill_per_token=prefill_per_token, reply_fn=reply)
+    settings.OLLAMA_BASE_URL = await fake.start()
+    for agent in ("coding", "tutor"):  # open the pooled connection and build the models outside the measurements
+        await first_token(agent, [], "")
+
+    rows = []
+    for agent, table in (("coding", "coding_messages"), ("tutor", "tutor_messages")):
+        for turns in turns_list:
+            session_id = await new_session(agent)
+            await seed(table, session_id, turns)
+
+            history = await all_messages(table, session_id)
+            before = await measure(fake, agent, history if agent == "coding" else history[-5:])
+
+            # Steady state: whatever the summary jobs would have folded by now
+            while (await refresh_summary(table, session_id))[1]:
+                pass
+            context = await db.run_db(load_context, table, session_id)
+            after = await measure(fake, agent, context.messages, context.summary)
+            rows.append((agent, turns, before, after, len(context.messages)))
+
+    await close_clients()
+    await fake.stop()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--prefill-per-token", type=float, default=0.0002,
+                        help="fake prefill cost in seconds per prompt token")
+    args = parser.parse_args()
+
+    db.init_db()
+    rows = asyncio.run(run(args.turns, args.prefill_per_token))
+
+    print(f"context budget {settings.CHAT_CONTEXT_TOKENS} tokens, summary batch {settings.CHAT_SUMMARY_BATCH_TOKENS}, "
+          f"prefill {args.prefill_per_token * 1000:.2f} ms/token")
+    print(f"{'agent':<8}{'turn':>6}{'prompt before':>15}{'prompt after':>14}{'ttft before':>13}{'ttft after':>12}"
+          f"{'kept msgs':>11}")
+    for agent, turns, (tokens_before, ttft_before), (tokens_after, ttft_after), kept in rows:
+        print(f"{agent:<8}{turns:>6}{tokens_before:>15}{tokens_after:>14}{ttft_before * 1000:>11.0f}ms"
+              f"{ttft_after * 1000:>10.0f}ms{kept:>11}")
+
+if __name__ == "__main__":
+    main()
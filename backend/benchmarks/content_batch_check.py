@@ -0,0 +1,111 @@
+"""
+Batch content check: asks /api/content/generate/batch for a branch of a
+roadmap against a stub content agent and fails unless stored lessons are not
+regenerated, no more than CONTENT_BATCH_CONCURRENCY lessons generate at
+once, each node's status and the roadmap's objective reach the agent, every
+(node, mode) gets its own event as it finishes, a failing node does not sink
+the rest, and the new lessons are all in node_content when "done" arrives.
+
+Run from the backend directory:
+    python -m benchmarks.content_batch_check
+    DATABASE_URL=postgresql://postgres:pw@localhost:5433/postgres python -m benchmarks.content_batch_check
+"""
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+os.environ.setdefault("CONTENT_BATCH_CONCURRENCY", "2")
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main as app_main  # noqa: E402
+from app import db  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.api.routes import content  # noqa: E402
+from app.models.content import ContentResponse  # noqa: E402
+from app.roadmap_store import insert_roadmap  # noqa: E402
+
+NODES = ["Basics", "Lists", "Dicts", "Classes", "Broken"]
+OBJECTIVE = "Ace the interview"
+calls = []
+objectives = set()
+running = {"now": 0, "max": 0}
+
+async def fake_generate_content(topic, subtopic, mode, difficulty, language, *args, user_status="novice", **kwargs):
+    calls.append((subtopic, mode, user_status))
+    objectives.add(kwargs.get("objective"))
+    running["now"] += 1
+    running["max"] = max(running["max"], running["now"])
+    try:
+        await asyncio.sleep(0.05)
+        if subtopic == "Broken":
+            raise RuntimeError("model went away")
+        return ContentResponse(content=f"# {subtopic} ({mode}, {user_status})")
+    finally:
+        running["now"] -= 1
+
+def setup(topic):
+    def create(conn):
+        c = conn.cursor()
+        c.execute("INSERT INTO users (username, password_hash) VALUES (?, 'x')", (f"batch-{topic}",))
+        user_id = c.lastrowid
+        roadmap_id = insert_roadmap(conn, user_id, topic, "English", "Normal", None, OBJECTIVE, {
+            "topic": topic, "roadmap": [{"id": str(i), "label": label, "description": "d", "children": []}
+                                        for i, label in enumerate(NODES)]})
+        c.execute("INSERT INTO user_knowledge (user_id, topic, subtopic, mastery_score, status) VALUES (?, ?, 'Lists', 90, 'expert')",
+                  (user_id, topic))
+        c.execute("INSERT INTO node_content (roadmap_id, node_label, mode, content_json) VALUES (?, 'Basics', 'story', ?)",
+                  (roadmap_id, json.dumps({"content": "stored", "images": [], "videos": [], "quiz_questions": []})))
+        conn.commit()
+        return roadmap_id
+    return db.run_db(create)
+
+def stored_labels(roadmap_id):
+    def query(conn):
+        rows = conn.execute("SELECT node_label, mode FROM node_content WHERE roadmap_id = ?", (roadmap_id,)).fetchall()
+        return {(row["node_label"], row["mode"]) for row in rows}
+    return db.run_db(query)
+
+def check():
+    content.generate_content = fake_generate_content
+    roadmap_id = asyncio.run(setup(f"Python {uuid.uuid4().hex[:8]}"))
+
+    with TestClient(app_main.app) as client:
+        response = client.post("/api/content/generate/batch", json={
+            "roadmap_id": roadmap_id, "nodes": NODES, "modes": ["story", "exam"]})
+        assert response.status_code == 200, response.text
+        events = [(lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: ")))
+                  for lines in (block.split("\n") for block in response.text.strip().split("\n\n"))]
+
+        nodes = [data for event, data in events if event == "node"]
+        assert len(nodes) == 10 and events[-1][0] == "done", events
+        assert nodes[0] == {"node": "Basics", "mode": "story", "status": "stored", "content": nodes[0]["content"]}
+        failed = {(n["node"], n["mode"]) for n in nodes if n["status"] == "failed"}
+        assert failed == {("Broken", "story"), ("Broken", "exam")}, nodes
+        assert events[-1][1] == {"stored": 1, "generated": 7, "failed": 2}, events[-1]
+
+        assert len(calls) == 9 and ("Basics", "story", "novice") not in calls, calls
+        assert ("Lists", "exam", "expert") in calls, calls
+        assert objectives == {OBJECTIVE}, objectives
+        assert running["max"] == settings.CONTENT_BATCH_CONCURRENCY, running
+
+        saved = asyncio.run(stored_labels(roadmap_id))
+        assert saved == {(label, mode) for label in NODES[:4] for mode in ("story", "exam")}, saved
+
+        # Everything is stored now: nothing generates
+        again = client.post("/api/content/generate/batch", json={
+            "roadmap_id": roadmap_id, "nodes": NODES[:4], "modes": ["story", "exam"]})
+        assert again.text.count('"status": "stored"') == 8 and len(calls) == 9, again.text
+        assert client.post("/api/content/generate/batch", json={"roadmap_id": 10 ** 9, "nodes": ["x"]}).status_code == 404
+    return running["max"]
+
+def main():
+    db.init_db()
+    peak = check()
+    print(f"content batch check passed on {db.backend.dialect}: 9 lessons generated, at most {peak} at a time")
+
+if __name__ == "__main__":
+    main()
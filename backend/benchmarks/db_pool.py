@@ -0,0 +1,105 @@
+"""
+Compares request throughput of the DB-bound roadmap and tutor routes with the
+old connect-per-call get_db() against the pooled WAL connection manager.
+
+Run from the backend directory:
+    python -m benchmarks.db_pool [iterations]
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+WORKDIR = tempfile.mkdtemp(prefix="edtech-bench-")
+os.environ["DB_PATH"] = os.path.join(WORKDIR, "pooled.db")
+
+from app import db  # noqa: E402
+from app.api.routes import roadmap, tutor  # noqa: E402
+from app.roadmap_store import insert_roadmap  # noqa: E402
+
+LEGACY_DB = os.path.join(WORKDIR, "legacy.db")
+
+SAMPLE_ROADMAP = {
+    "topic": "Machine Learning",
+    "roadmap": [
+        {
+            "id": str(i),
+            "label": f"Concept {i}",
+            "description": "Brief description",
+            "children": [
+                {"id": f"{i}.{j}", "label": f"Concept {i}.{j}", "description": "Brief description", "children": []}
+                for j in range(1, 5)
+            ],
+        }
+        for i in range(1, 8)
+    ],
+}
+
+@contextmanager
+def legacy_get_db():
+    # The pre-pool implementation: a fresh connection for every block.
+    conn = sqlite3.connect(LEGACY_DB)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def seed(conn):
+    c = conn.cursor()
+    c.execute("INSERT INTO users (username, password_hash) VALUES ('bench', 'x')")
+    user_id = c.lastrowid
+    for _ in range(20):
+        roadmap_id = insert_roadmap(conn, user_id, "Machine Learning", "English", "Normal", None, None, SAMPLE_ROADMAP)
+    c.execute("INSERT INTO tutor_sessions (user_id, topic) VALUES (?, 'Machine Learning')", (user_id,))
+    session_id = c.lastrowid
+    for i in range(50):
+        c.execute("INSERT INTO tutor_messages (session_id, role, content) VALUES (?, ?, ?)",
+                  (session_id, "user" if i % 2 == 0 else "assistant", "message " * 40))
+    conn.commit()
+    return user_id, roadmap_id
+
+async def run_routes(user_id, roadmap_id, iterations):
+    results = {}
+    for name, call in (
+        ("roadmap.get_roadmap", lambda: roadmap.get_roadmap(roadmap_id)),
+        ("roadmap.get_user_roadmaps", lambda: roadmap.get_user_roadmaps(user_id)),
+        ("tutor.get_history", lambda: tutor.get_history(user_id, "Machine Learning")),
+    ):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await call()
+        results[name] = iterations / (time.perf_counter() - start)
+    return results
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    # Legacy database keeps the default rollback journal, as before the pool.
+    db.init_db()
+    with db.get_db() as conn:
+        schema = [row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name != 'sqlite_sequence'"
+        )]
+        seed(conn)
+    legacy_conn = sqlite3.connect(LEGACY_DB)
+    legacy_conn.executescript("".join(sql + ";" for sql in schema))
+    legacy_conn.row_factory = sqlite3.Row
+    user_id, roadmap_id = seed(legacy_conn)
+    legacy_conn.close()
+
+    pooled_get_db = db.get_db
+    db.get_db = legacy_get_db
+    before = asyncio.run(run_routes(user_id, roadmap_id, iterations))
+    db.get_db = pooled_get_db
+    after = asyncio.run(run_routes(user_id, roadmap_id, iterations))
+
+    print(f"{'route':<28}{'before req/s':>14}{'after req/s':>14}{'speedup':>10}")
+    for name in before:
+        print(f"{name:<28}{before[name]:>14.0f}{after[name]:>14.0f}{after[name] / before[name]:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
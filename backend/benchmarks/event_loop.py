@@ -0,0 +1,88 @@
+"""
+Shows how much a simulated token stream stalls while heavy queries run
+concurrently, comparing queries executed inline on the event loop with queries
+sent through app.db.run_db. Fails if the run_db stream's p99 gap strays more
+than MAX_EXTRA_P99_MS from the idle one, as it does once queries run inline.
+
+Run from the backend directory:
+    python -m benchmarks.event_loop
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-bench-"), "bench.db")
+
+from app import db  # noqa: E402
+
+TOKEN_INTERVAL = 0.01
+TOKENS = 150
+HEAVY_QUERIES = 8
+# Scheduling noise allowed on top of the idle p99; inline queries add seconds
+MAX_EXTRA_P99_MS = 20
+
+# A CPU-bound query standing in for an unindexed scan over a large table.
+HEAVY_SQL = """
+    WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1500000)
+    SELECT sum(x) FROM n
+"""
+
+def heavy_query(conn):
+    return conn.execute(HEAVY_SQL).fetchone()[0]
+
+async def inline_query():
+    # What the routes did before: sqlite3 called directly from the handler.
+    with db.get_db() as conn:
+        return heavy_query(conn)
+
+async def offloaded_query():
+    return await db.run_db(heavy_query)
+
+async def token_stream():
+    """Emits a token every TOKEN_INTERVAL and returns the observed gaps in ms."""
+    gaps = []
+    last = time.perf_counter()
+    for _ in range(TOKENS):
+        await asyncio.sleep(TOKEN_INTERVAL)
+        now = time.perf_counter()
+        gaps.append((now - last) * 1000)
+        last = now
+    return gaps
+
+async def measure(query):
+    async def queries():
+        for _ in range(HEAVY_QUERIES):
+            await query()
+            await asyncio.sleep(0)
+
+    gaps, _ = await asyncio.gather(token_stream(), queries())
+    return gaps
+
+def summarize(gaps):
+    ordered = sorted(gaps)
+    return {
+        "p50": statistics.median(ordered),
+        "p99": ordered[int(len(ordered) * 0.99) - 1],
+        "max": ordered[-1],
+    }
+
+def main():
+    db.init_db()
+    idle = asyncio.run(token_stream())
+    inline = asyncio.run(measure(inline_query))
+    offloaded = asyncio.run(measure(offloaded_query))
+
+    print(f"inter-token gap in ms (target {TOKEN_INTERVAL * 1000:.0f} ms)")
+    print(f"{'scenario':<24}{'p50':>10}{'p99':>10}{'max':>10}")
+    for name, gaps in (("no queries", idle), ("inline sqlite3", inline), ("run_db executor", offloaded)):
+        stats = summarize(gaps)
+        print(f"{name:<24}{stats['p50']:>10.1f}{stats['p99']:>10.1f}{stats['max']:>10.1f}")
+
+    idle_p99, offloaded_p99 = summarize(idle)["p99"], summarize(offloaded)["p99"]
+    assert offloaded_p99 <= idle_p99 + MAX_EXTRA_P99_MS, (
+        f"run_db p99 gap {offloaded_p99:.1f} ms is more than {MAX_EXTRA_P99_MS} ms over idle ({idle_p99:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Fake Ollama server for offline benchmarks.
+
+Speaks enough of the Ollama HTTP API (/api/chat, streaming or not) for the
+agents to run unchanged. Time to first token is modelled as a fixed latency
+plus a prefill cost per prompt token, then reply tokens are streamed at a
+fixed rate, so prompt size shows up in TTFT the way it does on a real model.
+
+Two more costs can be switched on. With --load-time a model that isn't loaded
+pays that much before its first token, and stays loaded for the request's
+keep_alive (Ollama's default is 5 minutes). A request with no messages only
+loads the model, as with Ollama. With --prefix-cache each model remembers its
+last prompt and only charges prefill for the tokens after the part shared
+with it, like llama.cpp reusing its KV cache.
+
+`models` gives individual models their own speed, e.g.
+{"llama3.2:3b": {"ttft": 0.05, "tokens_per_sec": 150}}; other models use
+the defaults. `model_requests` counts chat requests per model.
+
+Standalone:
+    python -m benchmarks.fake_ollama --port 11500 --ttft 0.2 --tokens-per-sec 40
+then point OLLAMA_BASE_URL at http://127.0.0.1:11500.
+"""
+import argparse
+import asyncio
+import json
+import math
+import re
+import time
+from datetime import datetime, timezone
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+ROADMAP_REPLY = {
+    "topic": "Topic",
+    "roadmap": [
+        {"id": "1", "label": "Foundations", "description": "Core ideas", "children": [
+            {"id": "1.1", "label": "Terminology", "description": "Key terms", "children": []}
+        ]},
+        {"id": "2", "label": "Practice", "description": "Applying it", "children": []},
+    ],
+}
+
+QUIZ_REPLY = [
+    {"id": i, "question": f"Question {i}?", "options": ["A", "B", "C", "D"],
+     "correct_answer": "A", "explanation": "Because A."}
+    for i in range(1, 6)
+]
+
+def default_reply(body: dict, reply_tokens: int) -> str:
+    """Canned answers shaped like what each agent parses."""
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if body.get("format") == "json":
+        return json.dumps(ROADMAP_REPLY)
+    if "quiz generator" in prompt:
+        return json.dumps(QUIZ_REPLY)
+    return " ".join(f"word{i}" for i in range(reply_tokens))
+
+def keep_alive_seconds(value) -> float:
+    """Ollama's keep_alive: seconds or a duration like "30m"; negative keeps the model forever."""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)) or re.fullmatch(r"-?\d+(\.\d+)?", str(value)):
+        seconds = float(value)
+    else:
+        units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        parts = re.findall(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)", str(value))
+        seconds = sum(float(amount) * units[unit] for amount, unit in parts)
+    return math.inf if seconds < 0 else seconds
+
+class FakeOllama:
+    def __init__(self, ttft: float = 0.05, tokens_per_sec: float = 50.0, prefill_per_token: float = 0.0,
+                 reply_tokens: int = 20, reply_fn=None, load_time: float = 0.0, prefix_cache: bool = False,
+                 models: dict = None):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.prefill_per_token = prefill_per_token
+        self.reply_tokens = reply_tokens
+        self.reply_fn = reply_fn or (lambda body: default_reply(body, self.reply_tokens))
+        self.load_time = load_time
+        self.prefix_cache = prefix_cache
+        self.models = models or {}
+        self.requests = 0
+        self.model_requests = {}
+        self.loads = 0
+        self.prompt_tokens = []  # per request, as the fake counted them
+        self.cached_tokens = []  # per request, prompt tokens reused from the previous prompt
+        self._loaded = {}  # model -> monotonic time it unloads
+        self._load_locks = {}
+        self._last_prompt = {}  # model -> prompt text, for the prefix cache
+        self._server = None
+        self._connections = set()  # handler tasks of open connections
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self.url
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            handlers = list(self._connections)
+            for task in handlers:
+                task.cancel()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader, writer):
+        # Keep-alive: the agents' pooled client reuses connections
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    head = (await reader.readuntil(b"\r\n\r\n")).decode()
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                method, path = head.split(" ")[:2]
+                length = 0
+                for line in head.split("\r\n")[1:]:
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                if method == "POST" and path == "/api/chat":
+                    await self._chat(body, writer)
+                else:
+                    payload = b'{"error": "not found"}'
+                    writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Type: application/json\r\n"
+                                 + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                    await writer.drain()
+        except asyncio.CancelledError:
+            pass  # stop(); returning normally keeps asyncio.streams from logging the cancellation
+        finally:
+            self._connections.discard(asyncio.current_task())
+            writer.close()
+
+    def unload(self):
+        """Drops every loaded model and cached prompt, as if Ollama restarted or sat idle."""
+        self._loaded.clear()
+        self._last_prompt.clear()
+
+    async def _ensure_loaded(self, model: str, keep_alive):
+        """Loads model unless it is loaded, then extends how long it stays loaded."""
+        async with self._load_locks.setdefault(model, asyncio.Lock()):
+            if self._loaded.get(model, 0) <= time.monotonic():
+                self._last_prompt.pop(model, None)
+                await asyncio.sleep(self.load_time)
+                self.loads += 1
+            self._loaded[model] = time.monotonic() + keep_alive_seconds(keep_alive)
+
+    def _cached_tokens(self, model: str, prompt: str) -> int:
+        if not self.prefix_cache:
+            return 0
+        previous = self._last_prompt.get(model, "")
+        self._last_prompt[model] = prompt
+        shared = 0
+        for a, b in zip(previous, prompt):
+            if a != b:
+                break
+            shared += 1
+        # Only whole tokens of the shared prefix are reusable
+        return shared // 4
+
+    async def _chat(self, body: dict, writer):
+        self.requests += 1
+        model = body.get("model")
+        messages = body.get("messages", [])
+        await self._ensure_loaded(model, body.get("keep_alive"))
+        if not messages:
+            # Load request: nothing to generate
+            payload = json.dumps({"model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                                  "message": {"role": "assistant", "content": ""},
+                                  "done_reason": "load", "done": True}).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+            await writer.drain()
+            return
+
+        self.model_requests[model] = self.model_requests.get(model, 0) + 1
+        speed = self.models.get(model, {})
+        ttft = speed.get("ttft", self.ttft)
+        tokens_per_sec = speed.get("tokens_per_sec", self.tokens_per_sec)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        self.prompt_tokens.append(prompt_tokens)
+        prompt = "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in messages)
+        cached = min(self._cached_tokens(model, prompt), prompt_tokens)
+        self.cached_tokens.append(cached)
+        reply = self.reply_fn(body)
+        # Split into roughly word-sized pieces, keeping separators
+        pieces = [piece + " " for piece in reply.split(" ")]
+        pieces[-1] = pieces[-1][:-1]
+
+        def message(content, done):
+            chunk = {"model": body.get("model"), "created_at": datetime.now(timezone.utc).isoformat(),
+                     "message": {"role": "assistant", "content": content}, "done": done}
+            if done:
+                chunk.update({"done_reason": "stop", "prompt_eval_count": prompt_tokens, "eval_count": len(pieces)})
+            return chunk
+
+        await asyncio.sleep(ttft + (prompt_tokens - cached) * self.prefill_per_token)
+        if body.get("stream", True) is False:
+            final = message(reply, True)
+            payload = json.dumps(final).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+            await writer.drain()
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+        def send(obj):
+            data = (json.dumps(obj) + "\n").encode()
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(1 / tokens_per_sec)
+            send(message(piece, False))
+            await writer.drain()
+        send(message("", True))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+async def _serve_forever(args):
+    fake = FakeOllama(ttft=args.ttft, tokens_per_sec=args.tokens_per_sec,
+                      prefill_per_token=args.prefill_per_token, reply_tokens=args.reply_tokens,
+                      load_time=args.load_time, prefix_cache=args.prefix_cache)
+    url = await fake.start(args.host, args.port)
+    print(f"fake ollama listening on {url}")
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--prefill-per-token", type=float, default=0.0, help="extra TTFT seconds per prompt token")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--load-time", type=float, default=0.0, help="seconds to load a model that isn't loaded")
+    parser.add_argument("--prefix-cache", action="store_true", help="reuse the prefix shared with the last prompt")
+    asyncio.run(_serve_forever(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Fake Serper server for offline benchmarks.
+
+Answers POST /images, /videos and /search the way google.serper.dev does,
+with canned results derived from the query, after a fixed latency. Point
+SERPER_BASE_URL at it; any SERPER_API_KEY is accepted.
+
+Standalone:
+    python -m benchmarks.fake_serper --port 11600 --latency 0.3
+"""
+import argparse
+import asyncio
+import json
+
+def canned_results(path: str, query: str, num: int) -> dict:
+    slug = "-".join(query.lower().split()[:4])
+    if path == "/images":
+        return {"images": [{"title": f"{query} {i}", "imageUrl": f"https://images.example/{slug}-{i}.png"}
+                           for i in range(num)]}
+    if path == "/videos":
+        return {"videos": [{"title": f"{query} explained, part {i}", "link": f"https://videos.example/{slug}-{i}"}
+                           for i in range(num)]}
+    return {"organic": [{"title": f"{query} {i}", "link": f"https://pages.example/{slug}-{i}"} for i in range(num)]}
+
+class FakeSerper:
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+        self.requests = {}  # path -> count
+        self._server = None
+        self._connections = set()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self.url
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            handlers = list(self._connections)
+            for task in handlers:
+                task.cancel()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader, writer):
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    head = (await reader.readuntil(b"\r\n\r\n")).decode()
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                method, path = head.split(" ")[:2]
+                length = 0
+                for line in head.split("\r\n")[1:]:
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                if method == "POST" and path in ("/images", "/videos", "/search"):
+                    self.requests[path] = self.requests.get(path, 0) + 1
+                    await asyncio.sleep(self.latency)
+                    status, result = "200 OK", canned_results(path, body.get("q", ""), body.get("num", 10))
+                else:
+                    status, result = "404 Not Found", {"message": "not found"}
+                payload = json.dumps(result).encode()
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+        except asyncio.CancelledError:
+            pass  # stop()
+        finally:
+            self._connections.discard(asyncio.current_task())
+            writer.close()
+
+async def _serve_forever(args):
+    fake = FakeSerper(latency=args.latency)
+    url = await fake.start(args.host, args.port)
+    print(f"fake serper listening on {url}")
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11600)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before each answer")
+    asyncio.run(_serve_forever(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
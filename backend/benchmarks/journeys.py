@@ -0,0 +1,219 @@
+"""
+End-to-end load benchmark: boots the app from main.py under uvicorn against a
+fake Ollama (benchmarks/fake_ollama.py) and a fake Serper
+(benchmarks/fake_serper.py), then drives scripted user journeys
+
+    signup -> roadmap -> lesson -> quiz -> quiz submit -> tutor chat
+
+with --concurrency users in flight until --users journeys have run. Prints
+one JSON document with p50/p95/p99 latency, error count and throughput per
+endpoint, plus the settings and git commit of the run, so results from two
+commits can be diffed:
+
+    python -m benchmarks.journeys --users 40 --concurrency 8 > before.json
+    python -m benchmarks.journeys --users 40 --concurrency 8 --ttft 0.5 --tokens-per-sec 30
+
+Server logs go to stderr. Set DATABASE_URL to run against Postgres; otherwise
+a throwaway SQLite file is used. Shared caches (roadmap templates, lessons,
+the quiz bank) warm up over a run the way they would in production; use
+--topics to control how often users overlap and --fresh-roadmaps to always
+generate roadmaps.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-bench-"), "bench.db")
+
+import httpx  # noqa: E402
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+from benchmarks.fake_serper import FakeSerper  # noqa: E402
+
+TOPICS = ["Python", "Machine Learning", "Linear Algebra", "Organic Chemistry", "World History",
+          "Rust", "Statistics", "Music Theory"]
+
+class JourneyFailed(Exception):
+    pass
+
+class Recorder:
+    """Latency and errors per endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, method: str, path: str, name: str = None, **kwargs):
+        name = name or f"{method} {path}"
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[name] += 1
+            raise JourneyFailed(f"{name}: {e!r}")
+        self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            raise JourneyFailed(f"{name}: {response.status_code} {response.text[:200]}")
+        return response.json()
+
+async def journey(client: httpx.AsyncClient, recorder: Recorder, n: int, run_id: str, args):
+    topic = TOPICS[n % args.topics]
+    user = await recorder.call(client, "POST", "/api/auth/signup",
+                               json={"username": f"bench-{run_id}-{n}", "password": "bench"})
+    created = await recorder.call(client, "POST", "/api/roadmap/generate",
+                                  json={"topic": topic, "user_id": user["id"], "fresh": args.fresh_roadmaps})
+    roadmap_id = created["id"]
+    node = created["roadmap"]["roadmap"][0]["label"]
+
+    await recorder.call(client, "GET", f"/api/roadmap/{roadmap_id}", name="GET /api/roadmap/{roadmap_id}")
+    await recorder.call(client, "POST", "/api/content/generate",
+                        json={"topic": topic, "subtopic": node, "roadmap_id": roadmap_id})
+    quiz = await recorder.call(client, "POST", "/api/quiz/generate", json={
+        "topic": topic, "subtopic": node, "difficulty": "Normal", "language": "English", "roadmap_id": roadmap_id})
+    questions = quiz["questions"]
+    await recorder.call(client, "POST", "/api/quiz/submit", json={
+        "user_id": user["id"], "roadmap_id": roadmap_id, "node_label": node, "topic": topic,
+        "questions": questions,
+        "answers": {str(q["id"]): q["correct_answer"] for q in questions},
+        "time_taken": {str(q["id"]): 10 for q in questions},
+        "total_time": 10 * len(questions)})
+    for turn in range(args.chat_turns):
+        await recorder.call(client, "POST", "/api/tutor/chat", json={
+            "user_id": user["id"], "topic": topic, "message": f"Can you give me another example of {node}? ({turn})"})
+
+async def drive(base_url: str, args) -> tuple:
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    failures = []
+
+    async def one(n, client):
+        async with semaphore:
+            try:
+                await journey(client, recorder, n, run_id, args)
+            except JourneyFailed as e:
+                failures.append(str(e))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n, client) for n in range(args.users)))
+        wall = time.perf_counter() - started
+    return recorder, failures, wall
+
+def percentile(ordered: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def summarize(recorder: Recorder, wall: float) -> dict:
+    endpoints = {}
+    for name in sorted(set(recorder.latencies) | set(recorder.errors)):
+        ordered = sorted(recorder.latencies[name])
+        summary = {"count": len(ordered), "errors": recorder.errors[name],
+                   "throughput_rps": round(len(ordered) / wall, 3)}
+        if ordered:
+            summary.update({
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+            })
+        endpoints[name] = summary
+    return endpoints
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def start_fakes(args):
+    """Starts both fakes on their own event loop thread, so a blocked app loop can't stall them."""
+    loop = asyncio.new_event_loop()
+    ollama = FakeOllama(ttft=args.ttft, tokens_per_sec=args.tokens_per_sec, reply_tokens=args.reply_tokens)
+    serper = FakeSerper(latency=args.serper_latency)
+    urls = [loop.run_until_complete(fake.start()) for fake in (ollama, serper)]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop, ollama, serper, urls
+
+def start_app():
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config("main:app", log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("app failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def run(args) -> dict:
+    loop, ollama, serper, (ollama_url, serper_url) = start_fakes(args)
+    # Read by app.core.config when main.py is imported
+    os.environ["OLLAMA_BASE_URL"] = ollama_url
+    os.environ["SERPER_BASE_URL"] = serper_url
+    os.environ.setdefault("SERPER_API_KEY", "bench")
+
+    server, thread, base_url = start_app()
+    try:
+        recorder, failures, wall = asyncio.run(drive(base_url, args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+        for fake in (ollama, serper):
+            asyncio.run_coroutine_threadsafe(fake.stop(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+
+    return {
+        "commit": git_commit(),
+        "database": "postgres" if os.environ.get("DATABASE_URL") else "sqlite",
+        "config": vars(args),
+        "wall_seconds": round(wall, 3),
+        "journeys": {
+            "completed": args.users - len(failures),
+            "failed": len(failures),
+            "per_second": round((args.users - len(failures)) / wall, 3),
+            "first_failures": failures[:5],
+        },
+        "endpoints": summarize(recorder, wall),
+        "upstream_requests": {"ollama": ollama.requests, "serper": serper.requests},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="journeys to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="journeys in flight at once")
+    parser.add_argument("--topics", type=int, default=4, choices=range(1, len(TOPICS) + 1), metavar=f"1..{len(TOPICS)}",
+                        help="distinct roadmap topics users pick from")
+    parser.add_argument("--chat-turns", type=int, default=2)
+    parser.add_argument("--fresh-roadmaps", action="store_true", help="bypass roadmap templates")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake Ollama seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=100.0, help="fake Ollama generation speed")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="fake Ollama tokens per plain-text reply")
+    parser.add_argument("--serper-latency", type=float, default=0.2, help="fake Serper seconds per search")
+    parser.add_argument("--timeout", type=float, default=300.0, help="client timeout per request")
+    args = parser.parse_args()
+
+    # Keep stdout for the JSON result; the app and the fakes print progress
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run(args)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+LLM scheduler check: with one slot held, queues generations from every class
+and fails unless slots are handed out strictly by class (interactive, then
+content, then background), full queues reject immediately, and a route turns
+the rejection into a 429 with Retry-After.
+
+Run from the backend directory:
+    python -m benchmarks.llm_scheduler_check
+"""
+import asyncio
+import os
+import tempfile
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.llm_scheduler import LLMOverloaded, LLMScheduler, llm_priority, current_priority  # noqa: E402
+
+async def check_ordering():
+    scheduler = LLMScheduler(slots=1, queue_limits={"interactive": 2, "content": 2, "background": 2})
+    order = []
+    hold = asyncio.Event()
+
+    async def generation(name, priority_class, wait=None):
+        async with scheduler.slot(priority_class):
+            order.append(name)
+            if wait:
+                await wait.wait()
+
+    first = asyncio.create_task(generation("first", "background", hold))
+    await asyncio.sleep(0)
+
+    # A cancelled waiter gives up its place in the queue
+    cancelled = asyncio.create_task(generation("never", "background"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+
+    arrivals = [("bg-1", "background"), ("content-1", "content"), ("bg-2", "background"),
+                ("chat-1", "interactive"), ("content-2", "content"), ("chat-2", "interactive")]
+    tasks = []
+    for name, priority_class in arrivals:
+        tasks.append(asyncio.create_task(generation(name, priority_class)))
+        await asyncio.sleep(0)
+
+    # Every queue is now at its limit of 2
+    for priority_class in ("interactive", "content", "background"):
+        try:
+            async with scheduler.slot(priority_class):
+                raise AssertionError(f"{priority_class} should have been rejected")
+        except LLMOverloaded as e:
+            assert e.retry_after >= 1
+
+    hold.set()
+    await asyncio.gather(first, *tasks)
+    assert order == ["first", "chat-1", "chat-2", "content-1", "content-2", "bg-1", "bg-2"], order
+
+    stats = scheduler.stats()
+    assert stats["running"] == 0 and scheduler.active() == 0, stats
+    assert all(stats["classes"][c]["rejected"] == 1 for c in stats["classes"]), stats
+    assert stats["classes"]["background"]["wait_max_seconds"] >= stats["classes"]["interactive"]["wait_max_seconds"]
+
+    # Overrides apply to the block and to tasks spawned in it
+    with llm_priority("background"):
+        assert current_priority("interactive") == "background"
+        assert await asyncio.create_task(asyncio.sleep(0, current_priority("content"))) == "background"
+    assert current_priority("interactive") == "interactive"
+    return stats
+
+def check_http_429():
+    import main
+    from app.llm import llm_scheduler
+
+    # Pretend every slot is busy and the content queue is at its limit
+    llm_scheduler._running = llm_scheduler.slots
+    limits = dict(llm_scheduler.queue_limits)
+    llm_scheduler.queue_limits["content"] = 0
+    try:
+        with TestClient(main.app) as client:
+            response = client.post("/api/quiz/generate", json={
+                "topic": "Python", "subtopic": "Lists", "difficulty": "Normal", "language": "English"})
+            assert response.status_code == 429, response.text
+            assert int(response.headers["Retry-After"]) >= 1
+            response = client.post("/api/content/generate/stream", json={
+                "roadmap_id": 1, "topic": "Python", "subtopic": "Lists"})
+            assert response.status_code == 429, response.text
+            response = client.post("/api/quiz/generate/stream", json={
+                "topic": "Python", "subtopic": "Lists", "difficulty": "Normal", "language": "English"})
+            assert response.status_code == 429, response.text
+            stats = client.get("/llm/stats").json()
+            assert stats["models"][settings.OLLAMA_MODEL]["classes"]["content"]["rejected"] == 3, stats
+    finally:
+        llm_scheduler._running = 0
+        llm_scheduler.queue_limits.update(limits)
+
+def main():
+    stats = asyncio.run(check_ordering())
+    check_http_429()
+    waits = {c: s["wait_max_seconds"] for c, s in stats["classes"].items()}
+    print(f"llm scheduler check passed: max queue time per class {waits}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Synthetic chat load: many sessions each persisting user/assistant message pairs,
+first with one INSERT + commit per message (the old route behaviour) and then
+through the write-behind MessageWriter.
+
+Run from the backend directory:
+    python -m benchmarks.message_writer [sessions] [turns]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-bench-"), "bench.db")
+
+from app import db  # noqa: E402
+from app.message_writer import MessageWriter  # noqa: E402
+
+REPLY = "A reasonably long assistant reply. " * 20
+
+def insert_and_commit(conn, session_id, role, content):
+    conn.execute("INSERT INTO tutor_messages (session_id, role, content) VALUES (?, ?, ?)",
+                 (session_id, role, content))
+    conn.commit()
+
+async def chatter_direct(session_id, turns):
+    for turn in range(turns):
+        await db.run_db(insert_and_commit, session_id, "user", f"question {turn}")
+        await asyncio.sleep(0)
+        await db.run_db(insert_and_commit, session_id, "assistant", REPLY)
+
+async def chatter_queued(writer, session_id, turns):
+    for turn in range(turns):
+        writer.enqueue("tutor_messages", session_id, "user", f"question {turn}")
+        await asyncio.sleep(0)
+        writer.enqueue("tutor_messages", session_id, "assistant", REPLY)
+
+def count_rows():
+    with db.get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM tutor_messages").fetchone()[0]
+
+async def run(sessions, turns):
+    messages = sessions * turns * 2
+
+    start = time.perf_counter()
+    await asyncio.gather(*(chatter_direct(s, turns) for s in range(sessions)))
+    direct_elapsed = time.perf_counter() - start
+    direct_rows = count_rows()
+
+    writer = MessageWriter(flush_interval=0.05, max_batch=256)
+    writer.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(chatter_queued(writer, s, turns) for s in range(sessions)))
+    writer.stop()
+    queued_elapsed = time.perf_counter() - start
+    queued_rows = count_rows() - direct_rows
+
+    print(f"{sessions} sessions x {turns} turns = {messages} messages per mode")
+    print(f"{'mode':<14}{'msgs/s':>12}{'commits':>10}{'rows':>10}")
+    print(f"{'per-message':<14}{messages / direct_elapsed:>12.0f}{messages:>10}{direct_rows:>10}")
+    print(f"{'write-behind':<14}{messages / queued_elapsed:>12.0f}{writer.flushes:>10}{queued_rows:>10}")
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    db.init_db()
+    asyncio.run(run(sessions, turns))
+
+if __name__ == "__main__":
+    main()
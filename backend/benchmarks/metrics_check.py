@@ -0,0 +1,91 @@
+"""
+Metrics check: runs a lesson, a quiz (with one malformed question) and a
+tutor chat against a fake Ollama, then fails unless GET /metrics is valid
+Prometheus text with queue wait, time to first token, generation time and
+token histograms per agent, model and mode, plus the parse failure.
+
+Run from the backend directory:
+    python -m benchmarks.metrics_check
+"""
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+
+from app.core.config import settings  # noqa: E402
+from benchmarks.fake_ollama import QUIZ_REPLY, FakeOllama, default_reply  # noqa: E402
+from benchmarks.fake_serper import FakeSerper  # noqa: E402
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_]\w*="(\\.|[^"\\])*",?)*\})? (-?[0-9.]+(e[+-]?[0-9]+)?|[+-]Inf)$')
+
+def reply(body):
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if "quiz generator" in prompt and "Do NOT repeat" not in prompt:
+        broken = json.dumps(QUIZ_REPLY[:4])[:-1] + ', {"id": 5, "question": "Broken?", "options": ["A"' + "\n]"
+        return broken
+    return default_reply(body, 20)
+
+def parse(text: str) -> dict:
+    samples = {}
+    for line in text.strip().split("\n"):
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) \w+ ", line), line
+            continue
+        assert SAMPLE.match(line), line
+        name, value = line.rsplit(" ", 1)
+        samples[name] = float(value)
+    return samples
+
+def check():
+    from fastapi.testclient import TestClient
+    import main
+
+    model = settings.OLLAMA_MODEL
+    with TestClient(main.app) as client:
+        lesson = client.post("/api/content/generate", json={
+            "topic": "Python", "subtopic": "Lists", "mode": "exam", "roadmap_id": 0})
+        assert lesson.status_code == 200, lesson.text
+        quiz = client.post("/api/quiz/generate", json={
+            "topic": "Python", "subtopic": "Lists", "difficulty": "Normal", "language": "English"})
+        assert len(quiz.json()["questions"]) == 5, quiz.text
+        chat = client.post("/api/tutor/chat", json={"user_id": 1, "topic": "Python", "message": "Hi"})
+        assert chat.status_code == 200, chat.text
+
+        response = client.get("/metrics")
+        assert response.headers["content-type"].startswith("text/plain"), response.headers
+        samples = parse(response.text)
+
+    content = f'agent="content",model="{model}",mode="exam"'
+    quiz_labels = f'agent="quiz",model="{model}",mode="default"'
+    tutor = f'agent="tutor",model="{model}",mode="default"'
+    for metric in ("llm_queue_wait_seconds", "llm_time_to_first_token_seconds", "llm_generation_seconds",
+                   "llm_prompt_tokens", "llm_completion_tokens", "llm_completion_tokens_per_second"):
+        assert samples[f"{metric}_count{{{content}}}"] == 1, metric
+        assert samples[f"{metric}_count{{{tutor}}}"] == 1, metric
+        assert samples[f'{metric}_bucket{{{content},le="+Inf"}}'] == 1, metric
+    # The broken question is asked for again; that round stops reading once it has one new question
+    assert samples[f"llm_time_to_first_token_seconds_count{{{quiz_labels}}}"] == 2
+    assert samples[f'llm_generations_total{{{quiz_labels},outcome="ok"}}'] == 1
+    assert samples[f'llm_generations_total{{{quiz_labels},outcome="cancelled"}}'] == 1
+    assert samples[f"llm_parse_failures_total{{{quiz_labels}}}"] == 1
+    assert samples[f"llm_prompt_tokens_sum{{{content}}}"] > 100
+    assert samples[f'llm_scheduler_slots{{model="{model}"}}'] == settings.LLM_MAX_INFLIGHT
+    assert samples[f'llm_scheduler_queued{{model="{model}",priority="content"}}'] == 0
+    return len(samples)
+
+def main():
+    fake = FakeOllama(ttft=0.02, tokens_per_sec=500, reply_fn=reply)
+    loop = asyncio.new_event_loop()
+    settings.OLLAMA_BASE_URL = loop.run_until_complete(fake.start())
+    settings.SERPER_BASE_URL = loop.run_until_complete(FakeSerper(latency=0.01).start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    count = check()
+    print(f"metrics check passed: {count} samples on /metrics")
+
+if __name__ == "__main__":
+    main()
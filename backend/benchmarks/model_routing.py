@@ -0,0 +1,154 @@
+"""
+Model routing benchmark: latency and throughput per agent task with every
+task on one model, with short structured tasks routed to a small fast model,
+and with the chat tasks also falling back to the small model while the large
+one is busy.
+
+Every task gets --requests generations against a fake Ollama where the small
+model answers faster than the large one. The lessons and the short tasks
+start at once; the chat burst (coding, tutor) arrives once the short tasks
+have drained, while the lessons still hold the large model, so a fallback has
+spare capacity to take. Each model has its own slots (LLM_MODEL_SLOTS), so
+the large model saturates and its generations queue. Per task it prints p50
+and p95 latency, throughput and how many generations went to the fallback,
+and it fails unless the fallback scenario moved some chat generations to the
+small model.
+
+Run from the backend directory:
+    python -m benchmarks.model_routing
+    python -m benchmarks.model_routing --requests 16 --large-slots 1
+"""
+import argparse
+import asyncio
+import math
+import os
+import tempfile
+import time
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-bench-"), "bench.db")
+LARGE, SMALL = "llama3:8b", "llama3.2:3b"
+
+SHORT_TASKS = ("planner", "quiz", "quiz_review", "code_analysis")
+CHAT_TASKS = ("coding", "tutor")
+
+def scenarios() -> dict:
+    routed = ",".join(f"{task}={SMALL}" for task in SHORT_TASKS)
+    return {
+        "one model": "",
+        "routed": routed,
+        "routed + fallback": f"{routed},tutor={LARGE}|{SMALL},coding={LARGE}|{SMALL}",
+    }
+
+def tasks() -> dict:
+    """Task name (as in LLM_ROUTES) -> coroutine factory taking a request number."""
+    from app.agents import coding, content, planner, quiz, tutor
+
+    async def drain(stream):
+        return "".join([chunk async for chunk in await stream])
+
+    def lesson(mode):
+        return lambda n: content._content_chain("Python", f"Topic {n}", mode, "Normal", "English", "novice",
+                                                None, None).ainvoke({})
+
+    attempt = [{"question": "Question 1?", "user_answer": "A", "correct_answer": "A", "time_taken": 10}]
+    return {
+        "planner": lambda n: planner.generate_roadmap(f"Topic {n}", "Beginner"),
+        "content.story": lesson("story"),
+        "content.deep": lesson("deep"),
+        "quiz": lambda n: quiz.generate_quiz_questions("Python", f"Topic {n}", "Normal"),
+        "quiz_review": lambda n: quiz.generate_quiz_review("Python", f"Topic {n}", 100, 1, 10, attempt),
+        "coding": lambda n: drain(coding.get_tutor_response([], f"Why does loop {n} never end?", "python")),
+        "code_analysis": lambda n: coding.analyze_code(f"print({n})", "Print a number", "python"),
+        "tutor": lambda n: tutor.get_tutor_response("Python", f"Explain example {n}"),
+    }
+
+def percentile(ordered: list, p: float) -> float:
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+async def run_scenario(routes: str, args) -> dict:
+    from app.core.config import settings
+    from app.llm import close_clients
+    from app.llm_metrics import route_fallbacks
+    from benchmarks.fake_ollama import FakeOllama
+
+    fake = FakeOllama(ttft=args.large_ttft, tokens_per_sec=args.large_tokens_per_sec, reply_tokens=args.reply_tokens,
+                      models={SMALL: {"ttft": args.small_ttft, "tokens_per_sec": args.small_tokens_per_sec}})
+    settings.OLLAMA_BASE_URL = await fake.start()
+    settings.LLM_ROUTES = routes
+    fallbacks_before = dict(route_fallbacks._values)
+    started = time.perf_counter()
+    results = {}
+
+    async def timed(name, factory, n):
+        begun = time.perf_counter()
+        await factory(n)
+        results.setdefault(name, []).append((time.perf_counter() - begun, time.perf_counter() - started))
+
+    def burst(names):
+        return asyncio.gather(*(timed(name, factory, n) for n in range(args.requests)
+                                for name, factory in tasks().items() if name in names))
+
+    async def chat_after_short_tasks():
+        await burst(SHORT_TASKS)
+        await burst(CHAT_TASKS)
+
+    await asyncio.gather(burst([name for name in tasks() if name not in SHORT_TASKS + CHAT_TASKS]),
+                         chat_after_short_tasks())
+    await close_clients()
+    await fake.stop()
+
+    report = {}
+    for name in sorted(results, key=list(tasks()).index):
+        timings = results[name]
+        latencies = sorted(latency for latency, _ in timings)
+        agent, _, mode = name.partition(".")
+        fallbacks = sum(count - fallbacks_before.get(labels, 0) for labels, count in route_fallbacks._values.items()
+                        if labels[0] == agent and labels[2] == (mode or "default"))
+        report[name] = {
+            "p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+            "throughput": len(timings) / max(finished for _, finished in timings), "fallbacks": fallbacks,
+        }
+    return {"tasks": report, "models": dict(fake.model_requests), "wall": time.perf_counter() - started}
+
+async def run(args) -> dict:
+    return {name: await run_scenario(routes, args) for name, routes in scenarios().items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8, help="generations per task")
+    parser.add_argument("--large-slots", type=int, default=2)
+    parser.add_argument("--small-slots", type=int, default=4)
+    parser.add_argument("--large-ttft", type=float, default=0.3)
+    parser.add_argument("--large-tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--small-ttft", type=float, default=0.08)
+    parser.add_argument("--small-tokens-per-sec", type=float, default=120.0)
+    parser.add_argument("--reply-tokens", type=int, default=40, help="fake tokens per plain-text reply")
+    args = parser.parse_args()
+    # Read when app.llm creates each model's scheduler
+    os.environ["OLLAMA_MODEL"] = LARGE
+    os.environ["LLM_MODEL_SLOTS"] = f"{LARGE}={args.large_slots},{SMALL}={args.small_slots}"
+    os.environ["LLM_WARMUP"] = "false"
+    # Queue the whole burst instead of rejecting part of it
+    for queue in ("LLM_QUEUE_INTERACTIVE", "LLM_QUEUE_CONTENT", "LLM_QUEUE_BACKGROUND"):
+        os.environ[queue] = "10000"
+
+    results = asyncio.run(run(args))
+    print(f"{args.requests} generations per task, chat after the short tasks; {LARGE}: {args.large_slots} slots, "
+          f"{args.large_ttft * 1000:.0f}ms ttft, {args.large_tokens_per_sec:.0f} tok/s; {SMALL}: "
+          f"{args.small_slots} slots, {args.small_ttft * 1000:.0f}ms ttft, {args.small_tokens_per_sec:.0f} tok/s")
+    for name, result in results.items():
+        print(f"\n{name}: {result['wall']:.1f}s wall, requests per model {result['models']}")
+        print(f"{'task':<16}{'p50':>9}{'p95':>9}{'req/s':>8}{'fallback':>10}")
+        for task, stats in result["tasks"].items():
+            print(f"{task:<16}{stats['p50'] * 1000:>7.0f}ms{stats['p95'] * 1000:>7.0f}ms"
+                  f"{stats['throughput']:>8.2f}{stats['fallbacks']:>10}")
+
+    fallback, routed = results["routed + fallback"], results["routed"]
+    moved = sum(fallback["tasks"][task]["fallbacks"] for task in CHAT_TASKS)
+    assert moved > 0, fallback["tasks"]
+    assert fallback["models"].get(SMALL, 0) == routed["models"].get(SMALL, 0) + moved, (fallback["models"], moved)
+    print(f"\nfallback moved {moved} of {len(CHAT_TASKS) * args.requests} chat generations to {SMALL}: "
+          f"{routed['models']} -> {fallback['models']}")
+
+if __name__ == "__main__":
+    main()
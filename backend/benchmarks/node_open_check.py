@@ -0,0 +1,145 @@
+"""
+Node open check: opens roadmap nodes through /api/nodes/open against stub
+lesson and quiz agents and fails unless the lesson and quiz generate at the
+same time (a fresh node takes about as long as the slower of the two, where
+/api/content/generate then /api/quiz/generate takes their sum), the
+learner's status reaches both agents without the per-endpoint status
+lookups, a failing quiz still delivers the lesson, the lesson is stored
+so reopening the node generates nothing, and a quiz the overloaded model
+would have to generate is turned away with a 429 before the stream starts.
+
+Run from the backend directory:
+    python -m benchmarks.node_open_check
+    DATABASE_URL=postgresql://postgres:pw@localhost:5433/postgres python -m benchmarks.node_open_check
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main as app_main  # noqa: E402
+from app import db  # noqa: E402
+from app.api.routes import content, nodes, quiz  # noqa: E402
+from app.llm_scheduler import LLMOverloaded  # noqa: E402
+from app.models.content import ContentResponse  # noqa: E402
+from app.question_bank import store_questions  # noqa: E402
+from app.roadmap_store import insert_roadmap  # noqa: E402
+
+LESSON_SECONDS, QUIZ_SECONDS = 0.4, 0.3
+calls = []
+lookups = {"status": 0}
+
+async def fake_generate_content(topic, subtopic, mode, difficulty, language, *args, user_status="novice", **kwargs):
+    calls.append(("lesson", subtopic, user_status))
+    await asyncio.sleep(LESSON_SECONDS)
+    return ContentResponse(content=f"# {subtopic} ({mode}, {user_status})")
+
+async def fake_generate_quiz_questions(topic, subtopic, difficulty, language, num_questions=5, user_status="novice", avoid=()):
+    calls.append(("quiz", subtopic, user_status))
+    await asyncio.sleep(QUIZ_SECONDS)
+    if subtopic == "Broken":
+        raise RuntimeError("model went away")
+    return [{"id": 1, "question": f"{subtopic} {user_status} question {i}?", "options": ["a", "b"],
+             "correct_answer": "a", "explanation": ""} for i in range(num_questions)]
+
+def counted(lookup):
+    async def wrapper(*args, **kwargs):
+        lookups["status"] += 1
+        return await lookup(*args, **kwargs)
+    return wrapper
+
+def setup(topic):
+    def create(conn):
+        c = conn.cursor()
+        c.execute("INSERT INTO users (username, password_hash) VALUES (?, 'x')", (f"open-{topic}",))
+        user_id = c.lastrowid
+        roadmap_id = insert_roadmap(conn, user_id, topic, "English", "Normal", None, None, {
+            "topic": topic, "roadmap": [{"id": str(i), "label": label, "description": "d", "children": []}
+                                        for i, label in enumerate(("Basics", "Lists", "Broken"))]})
+        c.execute("INSERT INTO user_knowledge (user_id, topic, subtopic, mastery_score, status) VALUES (?, ?, 'Lists', 90, 'expert')",
+                  (user_id, topic))
+        conn.commit()
+        return roadmap_id
+    return db.run_db(create)
+
+def events_of(response) -> list:
+    assert response.status_code == 200, response.text
+    return [(lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: ")))
+            for lines in (block.split("\n") for block in response.text.strip().split("\n\n"))]
+
+def check():
+    content.generate_content = fake_generate_content
+    quiz.generate_quiz_questions = fake_generate_quiz_questions
+    content._find_user_status = counted(content._find_user_status)
+    quiz._find_learner = counted(quiz._find_learner)
+    topic = f"Python {uuid.uuid4().hex[:8]}"
+    roadmap_id = asyncio.run(setup(topic))
+
+    with TestClient(app_main.app) as client:
+        # Before: two requests, one after the other, each looking up the status
+        started = time.perf_counter()
+        assert client.post("/api/content/generate", json={
+            "roadmap_id": roadmap_id, "topic": topic, "subtopic": "Basics"}).status_code == 200
+        assert client.post("/api/quiz/generate", json={
+            "roadmap_id": roadmap_id, "topic": topic, "subtopic": "Basics", "difficulty": "Normal",
+            "language": "English"}).status_code == 200
+        sequential = time.perf_counter() - started
+        assert lookups["status"] == 2, lookups
+
+        started = time.perf_counter()
+        events = events_of(client.post("/api/nodes/open", json={"roadmap_id": roadmap_id, "node": "Lists"}))
+        opened = time.perf_counter() - started
+        assert [event for event, _ in events] == ["quiz", "lesson", "done"], events
+        assert events[1][1]["content"] == "# Lists (story, expert)", events
+        assert len(events[0][1]["questions"]) == 5 and events[2][1] == {"failed": []}, events
+        assert ("lesson", "Lists", "expert") in calls and ("quiz", "Lists", "expert") in calls, calls
+        assert lookups["status"] == 2, lookups
+        assert opened < max(LESSON_SECONDS, QUIZ_SECONDS) + 0.5 * min(LESSON_SECONDS, QUIZ_SECONDS), (opened, sequential)
+
+        # Reopening: the lesson is stored and the quiz comes from the bank's unseen questions, if any
+        before = len([call for call in calls if call[0] == "lesson"])
+        again = events_of(client.post("/api/nodes/open", json={"roadmap_id": roadmap_id, "node": "Lists"}))
+        assert dict(again)["lesson"]["content"] == "# Lists (story, expert)", again
+        assert len([call for call in calls if call[0] == "lesson"]) == before, calls
+
+        # The learner has seen every banked Lists question: with the quiz model overloaded, the open is a 429
+        def quiz_overloaded(profile, mode=None, needs_model=True):
+            if profile == "quiz" and needs_model:
+                raise LLMOverloaded("interactive", 1)
+        check_capacity, nodes.check_stream_capacity = nodes.check_stream_capacity, quiz_overloaded
+        try:
+            before = len(calls)
+            rejected = client.post("/api/nodes/open", json={"roadmap_id": roadmap_id, "node": "Lists"})
+            assert rejected.status_code == 429 and len(calls) == before, (rejected.text, calls)
+            # Enough unseen questions in the bank: no model needed, so it opens
+            request = quiz.QuizGenerateRequest(topic=topic, subtopic="Lists", difficulty="Normal", language="English")
+            asyncio.run(db.run_db(store_questions, quiz._bucket(request, "expert"), [
+                {"id": 1, "question": f"Banked Lists question {i}?", "options": ["a", "b"], "correct_answer": "a",
+                 "explanation": ""} for i in range(5)]))
+            banked = dict(events_of(client.post("/api/nodes/open", json={"roadmap_id": roadmap_id, "node": "Lists"})))
+            assert len(banked["quiz"]["questions"]) == 5 and len(calls) == before, (banked, calls)
+        finally:
+            nodes.check_stream_capacity = check_capacity
+
+        broken = events_of(client.post("/api/nodes/open", json={"roadmap_id": roadmap_id, "node": "Broken"}))
+        assert dict(broken)["failed"] == {"part": "quiz", "detail": "model went away"}, broken
+        assert dict(broken)["lesson"]["content"] == "# Broken (story, novice)", broken
+        assert broken[-1] == ("done", {"failed": ["quiz"]}), broken
+
+        assert client.post("/api/nodes/open", json={"roadmap_id": 10 ** 9, "node": "x"}).status_code == 404
+    return sequential, opened
+
+def main():
+    db.init_db()
+    sequential, opened = check()
+    print(f"node open check passed on {db.backend.dialect}: lesson then quiz {sequential * 1000:.0f}ms, "
+          f"opened together {opened * 1000:.0f}ms")
+
+if __name__ == "__main__":
+    main()
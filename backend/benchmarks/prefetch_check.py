@@ -0,0 +1,132 @@
+"""
+Prefetch check: creates roadmaps with prefetch enabled against stub agents and
+fails unless the first PREFETCH_NODES nodes get their lesson and quiz in the
+background, opening them counts as prefetch hits, a prefetched quiz is
+streamed even while the model is overloaded, and deleting or editing a
+roadmap cancels what has not run yet.
+
+Run from the backend directory:
+    python -m benchmarks.prefetch_check
+"""
+import asyncio
+import os
+import tempfile
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+os.environ.setdefault("PREFETCH_NODES", "3")
+os.environ.setdefault("JOB_POLL_INTERVAL_MS", "50")
+
+from app import db  # noqa: E402
+from app.api.routes import content, quiz, roadmap  # noqa: E402
+from app.jobs import job_queue  # noqa: E402
+from app.llm_scheduler import LLMOverloaded  # noqa: E402
+from app.models.content import ContentResponse  # noqa: E402
+from app.models.roadmap import RoadmapResponse  # noqa: E402
+from app.prefetch import prefetch_stats  # noqa: E402
+
+calls = {"content": 0, "quiz": 0}
+delay = {"seconds": 0.05}
+
+async def fake_generate_content(topic, subtopic, mode, *args, **kwargs):
+    calls["content"] += 1
+    await asyncio.sleep(delay["seconds"])
+    return ContentResponse(content=f"# {subtopic} ({mode})")
+
+async def fake_generate_quiz_questions(topic, subtopic, difficulty, language, num_questions=5, user_status="novice", **kwargs):
+    calls["quiz"] += 1
+    await asyncio.sleep(delay["seconds"])
+    return [{"id": 1, "question": f"{subtopic} {i}?", "options": ["a", "b"], "correct_answer": "a", "explanation": ""}
+            for i in range(num_questions)]
+
+async def fake_generate_roadmap(topic, difficulty, language, interest=None, objective=None):
+    labels = ["Basics", "Lists", "Dicts", "Classes", "Generators"]
+    return RoadmapResponse(topic=topic, roadmap=[
+        {"id": str(i), "label": label, "description": "d", "children": []} for i, label in enumerate(labels)
+    ])
+
+async def wait_for_jobs():
+    def pending(conn):
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+    for _ in range(200):
+        if await db.run_db(pending) == 0:
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError("prefetch jobs did not finish")
+
+def count(table, roadmap_id):
+    def query(conn):
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE roadmap_id = ?", (roadmap_id,)).fetchone()[0]
+    return db.run_db(query)
+
+async def check():
+    content.generate_content = fake_generate_content
+    quiz.generate_quiz_questions = fake_generate_quiz_questions
+    roadmap.generate_roadmap = fake_generate_roadmap
+    await job_queue.start()
+
+    # Without the flag nothing is queued
+    plain = await roadmap.create_roadmap(roadmap.CreateRoadmapRequest(topic="Python", user_id=1))
+    await wait_for_jobs()
+    assert calls == {"content": 0, "quiz": 0}, calls
+
+    created = await roadmap.create_roadmap(roadmap.CreateRoadmapRequest(topic="Python", user_id=1, prefetch=True))
+    roadmap_id = created["id"]
+    await wait_for_jobs()
+    assert calls == {"content": 3, "quiz": 3}, calls
+    assert await count("node_content", roadmap_id) == 3
+    assert await count("prefetched_quizzes", roadmap_id) == 3
+
+    # Opening prefetched nodes is served without generating
+    lesson = await content.create_content(content.DBContentRequest(roadmap_id=roadmap_id, topic="Python", subtopic="Lists"))
+    assert lesson["content"] == "# Lists (story)"
+    questions = await quiz.generate_quiz(quiz.QuizGenerateRequest(
+        roadmap_id=roadmap_id, topic="Python", subtopic="Lists", difficulty="Normal", language="English"))
+    assert questions["questions"][0]["question"] == "Lists 0?"
+    assert calls == {"content": 3, "quiz": 3}, calls
+    # A second open is a plain node_content hit, not another prefetch hit
+    await content.create_content(content.DBContentRequest(roadmap_id=roadmap_id, topic="Python", subtopic="Lists"))
+    # Nodes past the limit are generated on demand
+    await content.create_content(content.DBContentRequest(roadmap_id=roadmap_id, topic="Python", subtopic="Classes"))
+    assert calls["content"] == 4, calls
+    stats = prefetch_stats.stats()
+    assert (stats["lesson_hits"], stats["quiz_hits"], stats["hit_rate"]) == (1, 1, round(2 / 6, 4)), stats
+
+    # A prefetched quiz needs no model, so an overloaded one doesn't cost it to a 429
+    def overloaded(*args, **kwargs):
+        raise LLMOverloaded("content", 1)
+    check_capacity, quiz.check_stream_capacity = quiz.check_stream_capacity, overloaded
+    try:
+        response = await quiz.generate_quiz_stream(quiz.QuizGenerateRequest(
+            roadmap_id=roadmap_id, topic="Python", subtopic="Dicts", difficulty="Normal", language="English"))
+        body = "".join([block async for block in response.body_iterator])
+    finally:
+        quiz.check_stream_capacity = check_capacity
+    assert "Dicts 4?" in body and "event: done" in body, body
+    assert await count("prefetched_quizzes", roadmap_id) == 1 and calls["quiz"] == 3, calls
+
+    # Deleting a roadmap cancels its queued and running prefetch work
+    delay["seconds"] = 0.5
+    doomed = await roadmap.create_roadmap(roadmap.CreateRoadmapRequest(topic="Rust", user_id=1, prefetch=True))
+    await asyncio.sleep(0.2)  # let the first job start
+    await roadmap.delete_roadmap(doomed["id"])
+    await wait_for_jobs()
+    assert await count("node_content", doomed["id"]) == 0
+    assert await count("prefetched_quizzes", doomed["id"]) == 0
+    assert prefetch_stats.cancelled == 6, prefetch_stats.stats()
+
+    # So does editing it
+    edited = await roadmap.create_roadmap(roadmap.CreateRoadmapRequest(topic="Go", user_id=1, prefetch=True))
+    await roadmap.update_roadmap_structure(edited["id"], roadmap.RoadmapUpdateRequest(nodes=[], edges=[]))
+    await wait_for_jobs()
+    assert prefetch_stats.cancelled == 12, prefetch_stats.stats()
+
+    await job_queue.stop()
+    assert plain["id"] != roadmap_id
+    print(f"prefetch check passed: {prefetch_stats.stats()}")
+
+def main():
+    db.init_db()
+    asyncio.run(check())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Regression check for the route queries: runs EXPLAIN QUERY PLAN on each hot
+query against a freshly migrated database and exits non-zero if any of them
+falls back to a full table scan or a temporary sort.
+
+Run from the backend directory:
+    python -m benchmarks.query_plans
+"""
+import os
+import re
+import sys
+import tempfile
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-plans-"), "plans.db")
+
+from app import db, queries  # noqa: E402
+
+# (route, query, params) - the SQL is the routes' own, from app/queries.py.
+HOT_QUERIES = [
+    ("auth.login", queries.LOGIN, ("u", "h")),
+    ("roadmap.get_user_roadmaps", queries.USER_ROADMAPS, (1,)),
+    ("roadmap.get_roadmap", queries.ROADMAP, (1,)),
+    ("roadmap.get_roadmap tree", queries.ROADMAP_TREE, (1,)),
+    ("roadmap.get_roadmap layout nodes", queries.LAYOUT_NODES, (1,)),
+    ("roadmap.get_roadmap layout edges", queries.LAYOUT_EDGES, (1,)),
+    ("roadmap.update_roadmap_structure diff", queries.LAYOUT_ELEMENTS.format(table="roadmap_edges"), (1,)),
+    ("roadmap.get_roadmap progress", queries.ROADMAP_PROGRESS, (1, "t")),
+    ("content.create_content cache", queries.NODE_CONTENT, (1, "n", "story")),
+    ("content/quiz user status", queries.USER_STATUS, (1, "t", "s")),
+    ("content batch roadmap and statuses", queries.BATCH_ROADMAP, (1,)),
+    ("content batch stored lessons", queries.BATCH_STORED.format(placeholders="?, ?"), (1, "a", "b")),
+    ("nodes.open node", queries.OPEN_NODE, ("s", "s", "story", 1)),
+    ("digital_twin.update_knowledge_state", queries.MASTERY, (1, "t", "s")),
+    ("coding.get_session history", queries.CODING_HISTORY, (1,)),
+    ("coding.get_user_sessions", queries.CODING_SESSIONS, (1,)),
+    ("tutor session lookup", queries.TUTOR_SESSION, (1, "t")),
+    ("tutor.chat history", queries.TUTOR_HISTORY, (1,)),
+    ("chat context window", queries.CHAT_WINDOW.format(table="tutor_messages"), (1, 0)),
+    ("chat summary lookup", queries.CHAT_SUMMARY, ("tutor_messages", 1)),
+    ("chat summary job pending", queries.JOB_TAG_ACTIVE, ("t",)),
+    ("quiz bank pick unseen", queries.BANK_UNSEEN, ("t", "s", "d", "l", "p", 1, 5)),
+    ("quiz bank recent", queries.BANK_RECENT, ("t", "s", "d", "l", "p", 20)),
+    ("roadmap template exact", queries.TEMPLATE_EXACT, ("t", "d", "l", "", "")),
+    ("roadmap template fuzzy candidates", queries.TEMPLATE_CANDIDATES, ("d", "l", "", "", "t")),
+    ("jobs claim", queries.JOB_NEXT, (-1,)),
+    ("jobs cancel by tag", queries.JOB_CANCEL_PENDING, ("t",)),
+    ("quiz prefetched lookup", queries.PREFETCHED_QUIZ, (1, "n", "d", "l", "s")),
+    ("resources.get_recommendations context", queries.RECENT_INTERESTS, (1,)),
+    ("resources.get_recommendations fallback", queries.RECENT_RESOURCES, ()),
+    ("resources.get_resources", queries.RESOURCES, ()),
+]
+
+# "SCAN roadmaps" is a full table scan; "SCAN resources USING INDEX ..." is an
+# ordered index walk and is fine for listing endpoints.
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+$")
+TEMP_SORT = "USE TEMP B-TREE"
+
+def check(conn):
+    failures = []
+    for route, sql, params in HOT_QUERIES:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        bad = [step for step in plan if FULL_SCAN.match(step) or TEMP_SORT in step]
+        status = "FAIL" if bad else "ok"
+        print(f"[{status:>4}] {route}: {' | '.join(plan)}")
+        if bad:
+            failures.append(route)
+    return failures
+
+def main():
+    db.init_db()
+    with db.get_db() as conn:
+        failures = check(conn)
+    if failures:
+        print(f"\n{len(failures)} route queries fall back to a table scan or temp sort: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
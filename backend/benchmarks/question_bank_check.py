@@ -0,0 +1,157 @@
+"""
+Question bank check: serves quizzes for one subtopic to several users against
+a stub quiz agent and fails unless the model is only called for buckets that
+are thin for the requesting user, no user gets a question twice, duplicates
+(by normalised text) are stored once and the shortfall they leave is
+topped up again, on /generate and when streaming, proficiency levels use
+separate buckets, and a user who joins another user's smaller top-up still
+gets a full quiz.
+
+Run from the backend directory:
+    python -m benchmarks.question_bank_check
+    DATABASE_URL=postgresql://postgres:pw@localhost:5433/postgres python -m benchmarks.question_bank_check
+"""
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main as app_main  # noqa: E402
+from app import db  # noqa: E402
+from app.api.routes import quiz  # noqa: E402
+from app.question_bank import mark_seen, store_questions  # noqa: E402
+from app.roadmap_store import insert_roadmap  # noqa: E402
+
+calls = []
+counter = {"n": 0}
+# repeats: how many upcoming generations slip in a reworded copy of a banked question
+fake = {"delay": 0, "repeats": 1}
+
+def make_questions(num_questions, user_status):
+    questions = []
+    for _ in range(num_questions):
+        counter["n"] += 1
+        questions.append({"id": 1, "question": f"{user_status} question {counter['n']}?", "options": ["a", "b"],
+                          "correct_answer": "a", "explanation": ""})
+    return questions
+
+def repeat_banked(questions, avoid):
+    if avoid and fake["repeats"]:
+        # Models repeat themselves; a reworded copy of a banked question must not be stored again
+        fake["repeats"] -= 1
+        questions[-1] = {**questions[-1], "question": "  " + avoid[0].upper().rstrip("?") + " !"}
+    return questions
+
+async def fake_generate_quiz_questions(topic, subtopic, difficulty, language, num_questions=5, user_status="novice", avoid=()):
+    calls.append(num_questions)
+    await asyncio.sleep(fake["delay"])
+    return repeat_banked(make_questions(num_questions, user_status), avoid)
+
+async def fake_stream_quiz_questions(topic, subtopic, difficulty, language, num_questions=5, user_status="novice", avoid=()):
+    calls.append(num_questions)
+    for question in repeat_banked(make_questions(num_questions, user_status), avoid):
+        yield question
+
+def setup(topic):
+    def create(conn):
+        c = conn.cursor()
+        users = []
+        for name in ("ada", "bob"):
+            c.execute("INSERT INTO users (username, password_hash) VALUES (?, 'x')", (f"{name}-{topic}",))
+            users.append(c.lastrowid)
+        roadmaps = [insert_roadmap(conn, user_id, topic, "English", "Normal", None, None, {"topic": topic, "roadmap": []})
+                    for user_id in users]
+        # Ada is already an expert on another subtopic
+        c.execute("INSERT INTO user_knowledge (user_id, topic, subtopic, mastery_score, status) VALUES (?, ?, 'Generics', 90, 'expert')",
+                  (users[0], topic))
+        conn.commit()
+        return users, roadmaps
+    return db.run_db(create)
+
+def bank_size(topic):
+    def query(conn):
+        return conn.execute("SELECT COUNT(*) FROM quiz_questions WHERE topic = ?", (topic.lower(),)).fetchone()[0]
+    return db.run_db(query)
+
+def check():
+    quiz.generate_quiz_questions = fake_generate_quiz_questions
+    quiz.stream_quiz_questions = fake_stream_quiz_questions
+    topic = f"Rust {uuid.uuid4().hex[:8]}"
+    (ada, bob), (ada_roadmap, bob_roadmap) = asyncio.run(setup(topic))
+
+    with TestClient(app_main.app) as client:
+        def take(roadmap_id, subtopic="Ownership", stream=False):
+            body = {"topic": topic, "subtopic": subtopic, "difficulty": "Normal", "language": "English",
+                    "roadmap_id": roadmap_id}
+            if not stream:
+                return client.post("/api/quiz/generate", json=body).json()["questions"]
+            response = client.post("/api/quiz/generate/stream", json=body)
+            done = response.text.strip().split("\n\n")[-1]
+            assert done.startswith("event: done"), response.text
+            return json.loads(done.split("data: ", 1)[1])["questions"]
+
+        # Empty bucket: the first quiz is generated and banked
+        first = take(ada_roadmap)
+        assert calls == [5] and len(first) == 5, (calls, first)
+        assert [q["id"] for q in first] == [1, 2, 3, 4, 5]
+
+        # Another user gets the same questions from the bank, without the model
+        assert [q["question"] for q in take(bob_roadmap)] == [q["question"] for q in first]
+        assert calls == [5], calls
+
+        # Ada has seen all of them: the bucket is topped up with new ones only
+        second = take(ada_roadmap)
+        seen = {q["question"] for q in first}
+        assert not seen & {q["question"] for q in second}, second
+        # The reworded duplicate was dropped, and the question it left missing generated again
+        assert calls == [5, 5, 1] and len(second) == 5 and asyncio.run(bank_size(topic)) == 10, (calls, second)
+
+        # Bob has 5 unseen, which stream from the bank
+        streamed = take(bob_roadmap, stream=True)
+        assert calls == [5, 5, 1] and [q["id"] for q in streamed] == [1, 2, 3, 4, 5], (calls, streamed)
+
+        # Bob has seen the whole bank: streaming tops it up, and tops up again after a duplicate
+        fake["repeats"] = 1
+        streamed_again = take(bob_roadmap, stream=True)
+        assert calls == [5, 5, 1, 5, 1] and len(streamed_again) == 5, (calls, streamed_again)
+        assert not {q["question"] for q in streamed} & {q["question"] for q in streamed_again}
+
+        # Proficiency has its own bucket
+        expert = take(ada_roadmap, subtopic="Generics")
+        assert calls == [5, 5, 1, 5, 1, 5] and expert[0]["question"].startswith("expert"), expert
+
+        stats = client.get("/api/quiz/bank/stats").json()
+        assert stats["quizzes"] == 6 and stats["questions_from_bank"] == 5 + 5, stats
+
+    asyncio.run(check_joined_top_up(topic, ada, ada_roadmap, bob_roadmap))
+    return stats
+
+async def check_joined_top_up(topic, ada, ada_roadmap, bob_roadmap):
+    # Three banked questions only Ada has seen: Bob is 2 short, Ada 5
+    request = quiz.QuizGenerateRequest(topic=topic, subtopic="Traits", difficulty="Normal", language="English")
+    bucket = quiz._bucket(request, "novice")
+    banked = await db.run_db(store_questions, bucket, make_questions(3, "novice"))
+    await db.run_db(mark_seen, ada, banked)
+
+    async def take(roadmap_id, after):
+        await asyncio.sleep(after)
+        return (await quiz.generate_quiz(request.copy(update={"roadmap_id": roadmap_id})))["questions"]
+
+    # Ada must not join the top-up Bob started for 2
+    del calls[:]
+    fake.update(delay=0.2, repeats=0)
+    bob, ada = await asyncio.gather(take(bob_roadmap, 0), take(ada_roadmap, 0.05))
+    assert len(bob) == 5 and len(ada) == 5 and calls == [2, 5], (calls, bob, ada)
+
+def main():
+    db.init_db()
+    stats = check()
+    print(f"question bank check passed on {db.backend.dialect}: {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Quiz streaming check: runs quiz generation against a fake Ollama whose first
+answer has a malformed, an invalid and a duplicate question among five, and
+fails unless the valid ones stream out as each object closes, only the three
+bad ones are asked for again, and /api/quiz/generate/stream delivers five
+numbered questions as server-sent events.
+
+Run from the backend directory:
+    python -m benchmarks.quiz_stream_check
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+
+from app.core.config import settings  # noqa: E402
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+
+def question(n, **overrides):
+    return {"id": n, "question": f"Question {n}?", "options": ["A", "B", "C", "D"],
+            "correct_answer": "A", "explanation": "Because.", **overrides}
+
+FIRST_ROUND = "[\n" + ",\n".join([
+    json.dumps(question(1)),
+    # Stray quote and trailing comma, pretty-printed the way the prompt shows
+    '{\n"id": 2",\n"question": "Question 2?",\n"options": ["A", "B"],\n"correct_answer": "B",\n}',
+    '{"id": 3, "question": "Question 3?", "options": ["A", "B"], "correct_answer": "E"}',  # answer not an option
+    json.dumps(question(4, question="question 1")),  # duplicate of question 1
+    '{"id": 5, "question": "Question 5?", "options": ["A", "B"',  # cut off
+]) + "\n"
+
+def reply(body):
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if "Do NOT repeat" not in prompt:
+        return FIRST_ROUND
+    missing = int(prompt.split("Create ")[1].split(" ")[0])
+    return json.dumps([question(10 + i) for i in range(missing)])
+
+async def check_agent(fake):
+    from app.agents.quiz import stream_quiz_questions
+    from app.llm import close_clients
+
+    started = time.perf_counter()
+    arrivals = []
+    questions = []
+    async for q in stream_quiz_questions("Python", "Lists", "Normal"):
+        arrivals.append(time.perf_counter() - started)
+        questions.append(q)
+
+    assert [q["id"] for q in questions] == [1, 2, 3, 4, 5], questions
+    assert [q["question"] for q in questions] == ["Question 1?", "Question 2?", "Question 10?",
+                                                  "Question 11?", "Question 12?"], questions
+    assert fake.requests == 2, fake.requests
+    # The first question arrives while the rest of the first answer is still streaming
+    assert arrivals[0] < arrivals[1], arrivals
+    await close_clients()  # the pooled client belongs to this event loop
+    return arrivals
+
+def check_http(fake):
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        response = client.post("/api/quiz/generate/stream", json={
+            "topic": "Python", "subtopic": "Lists", "difficulty": "Normal", "language": "English"})
+        assert response.status_code == 200, response.text
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        names = [lines[0].removeprefix("event: ") for lines in events]
+        assert names == ["question"] * 5 + ["done"], names
+        done = json.loads(events[-1][1].removeprefix("data: "))
+        assert [q["id"] for q in done["questions"]] == [1, 2, 3, 4, 5], done
+
+        plain = client.post("/api/quiz/generate", json={
+            "topic": "Python", "subtopic": "Dicts", "difficulty": "Normal", "language": "English"})
+        assert len(plain.json()["questions"]) == 5, plain.text
+
+def main():
+    fake = FakeOllama(ttft=0.05, tokens_per_sec=400, reply_fn=reply)
+    loop = asyncio.new_event_loop()
+    settings.OLLAMA_BASE_URL = loop.run_until_complete(fake.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    arrivals = asyncio.run(check_agent(fake))
+    check_http(fake)
+    print(f"quiz stream check passed: questions arrived at {[round(t, 2) for t in arrivals]}s, "
+          f"regenerating only the 3 bad questions")
+
+if __name__ == "__main__":
+    main()
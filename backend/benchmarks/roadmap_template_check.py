@@ -0,0 +1,101 @@
+"""
+Roadmap template check: creates roadmaps against a stub planner and fails
+unless repeated and reworded requests (case, plurals, "Introduction to", a
+typo) are cloned from the stored template without calling the model, close
+but different topics ("Python 2" / "Python 3") and other settings still
+generate, fresh=true regenerates and replaces the template, and the admin
+invalidate endpoint needs the token and drops templates.
+
+Run from the backend directory:
+    python -m benchmarks.roadmap_template_check
+    DATABASE_URL=postgresql://postgres:pw@localhost:5433/postgres python -m benchmarks.roadmap_template_check
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main as app_main  # noqa: E402
+from app import db  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.api.routes import roadmap  # noqa: E402
+from app.models.roadmap import RoadmapResponse  # noqa: E402
+
+calls = []
+
+async def fake_generate_roadmap(topic, difficulty, language, interest=None, objective=None):
+    calls.append(topic)
+    return RoadmapResponse(topic=topic, difficulty=difficulty, language=language, interest=interest,
+                           objective=objective, roadmap=[{"id": "1", "label": f"Basics {len(calls)}", "description": "Start here", "children": []}])
+
+def create_user(name):
+    def create(conn):
+        c = conn.cursor()
+        c.execute("INSERT INTO users (username, password_hash) VALUES (?, 'x')", (name,))
+        conn.commit()
+        return c.lastrowid
+    return db.run_db(create)
+
+def check():
+    roadmap.generate_roadmap = fake_generate_roadmap
+    settings.ADMIN_TOKEN = "secret"
+    suffix = uuid.uuid4().hex[:8]
+    user_id = asyncio.run(create_user(f"planner-{suffix}"))
+    topic = f"Machine Learning Systems {suffix}"
+
+    with TestClient(app_main.app) as client:
+        def create(topic, **extra):
+            response = client.post("/api/roadmap/generate", json={"topic": topic, "user_id": user_id, **extra})
+            assert response.status_code == 200, response.text
+            body = response.json()
+            return body["id"], body["roadmap"]
+
+        first_id, first = create(topic)
+        assert len(calls) == 1, calls
+
+        # Same request, reworded: all served from the template
+        for variant in (topic.upper(), f"Introduction to {topic}", f"machine-learning system {suffix}",
+                        f"Machine Lerning Systems {suffix}"):
+            roadmap_id, served = create(variant)
+            assert len(calls) == 1, (variant, calls)
+            assert roadmap_id != first_id and served["topic"] == variant, served
+            assert served["roadmap"] == first["roadmap"], served
+            # The clone is an ordinary roadmap of its own
+            assert client.get(f"/api/roadmap/{roadmap_id}").json()["topic"] == variant
+
+        # Different settings and look-alike versions are different roadmaps
+        create(topic, difficulty="Hard")
+        create(f"Python 2 {suffix}")
+        create(f"Python 3 {suffix}")
+        assert len(calls) == 4, calls
+
+        # fresh=true skips the template and replaces it
+        _, regenerated = create(topic, fresh=True)
+        assert len(calls) == 5 and regenerated["roadmap"] != first["roadmap"], calls
+        _, served = create(topic)
+        assert len(calls) == 5 and served["roadmap"] == regenerated["roadmap"], calls
+
+        stats = client.get("/api/roadmap/templates/stats").json()
+        assert stats["hits"] == 5 and stats["fuzzy_hits"] == 1, stats
+        assert stats["misses"] == 4 and stats["forced_fresh"] == 1, stats
+
+        # Admin only
+        assert client.post("/api/roadmap/templates/invalidate", json={"topic": topic}).status_code == 403
+        removed = client.post("/api/roadmap/templates/invalidate", json={"topic": f"the {topic.lower()}"},
+                              headers={"X-Admin-Token": "secret"}).json()["removed"]
+        assert removed == 2, removed  # Normal and Hard
+        create(topic)
+        assert len(calls) == 6, calls
+        return client.get("/api/roadmap/templates/stats").json()
+
+def main():
+    db.init_db()
+    stats = check()
+    print(f"roadmap template check passed on {db.backend.dialect}: {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Serper check: generates lessons against a fake Serper (benchmarks/fake_serper.py)
+and a fake Ollama, both on their own thread, and fails unless
+
+  - the event loop keeps ticking every few milliseconds while lessons fetch
+    their media (a blocking HTTP client freezes it for every search),
+  - the image and video searches run alongside the generation, so a lesson
+    takes about as long as its generation alone,
+  - a Serper slower than SERPER_TIMEOUT_SECONDS costs no more than the
+    timeout and the lesson is served without media,
+  - a streamed lesson sends its tokens without waiting for the searches,
+    and its media once they finish.
+
+Run from the backend directory:
+    python -m benchmarks.serper_check
+"""
+import asyncio
+import gc
+import os
+import tempfile
+import threading
+import time
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+# Every lesson gets a model slot at once, so only the searches can add latency
+os.environ["LLM_MAX_INFLIGHT"] = "8"
+
+from app.core.config import settings  # noqa: E402
+from app.agents import content  # noqa: E402
+from app.llm import close_clients  # noqa: E402
+from app.serper import close_serper_client  # noqa: E402
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+from benchmarks.fake_serper import FakeSerper  # noqa: E402
+
+SERPER_LATENCY = 0.3
+TICK = 0.005
+LESSONS = int(os.environ["LLM_MAX_INFLIGHT"])
+
+def start_fakes():
+    """Runs the fakes on their own loop, so they answer even if the app's loop is blocked."""
+    loop = asyncio.new_event_loop()
+    ollama = FakeOllama(ttft=0.4, tokens_per_sec=200, reply_tokens=40)
+    serper = FakeSerper(latency=SERPER_LATENCY)
+    urls = [loop.run_until_complete(fake.start()) for fake in (ollama, serper)]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return serper, urls
+
+async def ticker(stop: asyncio.Event) -> float:
+    """Largest gap between TICK-second sleeps while the lessons run."""
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(TICK)
+        now = time.perf_counter()
+        worst = max(worst, now - last - TICK)
+        last = now
+    return worst
+
+async def timed(coro) -> tuple:
+    started = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - started, result
+
+async def generation_only(n: int) -> float:
+    chain = content._content_chain("Python", f"Baseline {n}", "story", "Normal", "English", "novice", None, None)
+    return (await timed(chain.ainvoke({})))[0]
+
+async def while_ticking(coro) -> tuple:
+    # A full garbage collection pauses the loop too (~50-80ms here); start each run with one done
+    gc.collect()
+    stop = asyncio.Event()
+    tick = asyncio.ensure_future(ticker(stop))
+    result = await coro
+    stop.set()
+    return result, await tick
+
+async def check_responsive(serper) -> dict:
+    # One lesson first: client setup and other first-use costs are not what this measures
+    await content.generate_content("Python", "Warm up", "story", "Normal")
+    # Starting LESSONS chains at once is some CPU work on the loop whatever Serper does
+    timings, generation_gap = await while_ticking(asyncio.gather(*(generation_only(n) for n in range(LESSONS))))
+    baseline = max(timings)
+    before = dict(serper.requests)
+    lessons, worst_gap = await while_ticking(asyncio.gather(
+        *(timed(content.generate_content("Python", f"Topic {n}", "story", "Normal")) for n in range(LESSONS))))
+
+    for _, lesson in lessons:
+        assert len(lesson.images) == 3 and len(lesson.videos) == 3, lesson
+    searches = {path: count - before.get(path, 0) for path, count in serper.requests.items()
+                if count > before.get(path, 0)}
+    assert searches == {"/images": LESSONS, "/videos": LESSONS}, searches
+    slowest = max(seconds for seconds, _ in lessons)
+    # Searched one after the other before the generation, a lesson took baseline + 2 * SERPER_LATENCY
+    assert slowest < baseline + 0.5 * SERPER_LATENCY, (slowest, baseline)
+    # A blocking search would stall the loop for SERPER_LATENCY per search
+    assert worst_gap < generation_gap + 0.05, (worst_gap, generation_gap)
+    return {"baseline": baseline, "slowest": slowest, "worst_gap": worst_gap, "generation_gap": generation_gap}
+
+async def check_timeout(serper) -> float:
+    await close_serper_client()
+    settings.SERPER_TIMEOUT_SECONDS = 0.5
+    serper.latency = 5.0
+    try:
+        seconds, lesson = await timed(content.generate_content("Python", "Slow Serper", "story", "Normal"))
+    finally:
+        serper.latency = SERPER_LATENCY
+        await close_serper_client()
+    assert lesson.images == [] and lesson.videos == [] and lesson.content, lesson
+    assert seconds < 1.5, seconds
+    return seconds
+
+async def check_stream() -> list:
+    started = time.perf_counter()
+    events = []
+    async for event, data in content.stream_content("Python", "Streaming", "story", "Normal"):
+        events.append((event, time.perf_counter() - started))
+    names = [event for event, _ in events]
+    assert names.count("media") == 1 and names[-1] == "done" and "token" in names, names
+    media_at = dict(events)["media"]
+    # Media arrives once the searches are done, whether or not tokens came first
+    assert SERPER_LATENCY <= media_at < SERPER_LATENCY + 0.2, events
+    return names
+
+async def run(serper):
+    try:
+        return await check_responsive(serper), await check_timeout(serper), await check_stream()
+    finally:
+        await close_clients()
+        await close_serper_client()
+
+def main():
+    serper, (ollama_url, serper_url) = start_fakes()
+    settings.OLLAMA_BASE_URL, settings.SERPER_BASE_URL = ollama_url, serper_url
+    responsive, timeout, _ = asyncio.run(run(serper))
+    print(f"serper check passed: {LESSONS} lessons at once, slowest {responsive['slowest'] * 1000:.0f}ms "
+          f"vs generation alone {responsive['baseline'] * 1000:.0f}ms (searches take "
+          f"{SERPER_LATENCY * 1000:.0f}ms each), longest event loop stall {responsive['worst_gap'] * 1000:.0f}ms "
+          f"({responsive['generation_gap'] * 1000:.0f}ms without media), "
+          f"lesson with a hung Serper {timeout * 1000:.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Single-flight check: fires concurrent identical requests at the content, quiz
+and roadmap routes with the agents replaced by slow counting stubs, and fails
+unless each burst reached the model exactly once and every caller got the
+same answer. A burst of streamed lesson requests streams tokens to the one
+that started the generation and replays the finished lesson to the rest,
+and a burst of streamed quizzes on an empty bank shares one top-up.
+
+Run from the backend directory:
+    python -m benchmarks.singleflight_check [requests]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+
+from app import db  # noqa: E402
+from app.api.routes import content, quiz, roadmap  # noqa: E402
+from app.models.content import ContentResponse  # noqa: E402
+from app.models.roadmap import RoadmapResponse  # noqa: E402
+from app.roadmap_store import insert_roadmap  # noqa: E402
+
+calls = {"content": 0, "stream": 0, "quiz": 0, "quiz_stream": 0, "roadmap": 0}
+
+async def fake_generate_content(topic, subtopic, mode, *args, **kwargs):
+    calls["content"] += 1
+    await asyncio.sleep(0.2)
+    return ContentResponse(content=f"# {subtopic} ({mode})")
+
+async def fake_stream_content(topic, subtopic, mode, *args, **kwargs):
+    calls["stream"] += 1
+    yield "media", {"images": ["img"], "videos": []}
+    for word in ("# ", subtopic, " (", mode, ")"):
+        await asyncio.sleep(0.05)
+        yield "token", word
+    yield "done", ContentResponse(content=f"# {subtopic} ({mode})", images=["img"])
+
+async def fake_stream_quiz_questions(topic, subtopic, difficulty, language, num_questions=5, **kwargs):
+    calls["quiz_stream"] += 1
+    for i in range(num_questions):
+        await asyncio.sleep(0.05)
+        yield {"question": f"{subtopic} {i}?", "options": ["a", "b"], "correct_answer": "a", "explanation": ""}
+
+async def stream_events(request, route=None) -> list:
+    response = await (route or content.stream_content_route)(request)
+    events = []
+    async for block in response.body_iterator:
+        lines = block.strip().split("\n")
+        events.append((lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))))
+    return events
+
+async def fake_generate_quiz_questions(topic, subtopic, difficulty, language, num_questions=5, user_status="novice", **kwargs):
+    calls["quiz"] += 1
+    await asyncio.sleep(0.2)
+    return [{"question": f"{subtopic} {i}?", "options": ["a", "b"], "correct_answer": "a", "explanation": ""}
+            for i in range(num_questions)]
+
+async def fake_generate_roadmap(topic, difficulty, language, interest=None, objective=None):
+    calls["roadmap"] += 1
+    await asyncio.sleep(0.2)
+    return RoadmapResponse(topic=topic, roadmap=[{"id": "1", "label": "Basics", "description": "d", "children": []}])
+
+async def burst(n, make_call):
+    return await asyncio.gather(*(make_call() for _ in range(n)))
+
+async def check(n):
+    def create(conn):
+        roadmap_id = insert_roadmap(conn, 1, "Python", "English", "Normal", None, None, {"topic": "Python", "roadmap": []})
+        conn.commit()
+        return roadmap_id
+    roadmap_id = await db.run_db(create)
+
+    content.generate_content = fake_generate_content
+    request = content.DBContentRequest(roadmap_id=roadmap_id, topic="Python", subtopic="Decorators")
+    results = await burst(n, lambda: content.create_content(request))
+    assert calls["content"] == 1, calls
+    assert all(r == results[0] for r in results)
+    # Later requests are served from node_content, not a new generation
+    await content.create_content(request)
+    assert calls["content"] == 1, calls
+
+    # Streamed requests, and a /generate joining them, share one generation
+    content.stream_content = fake_stream_content
+    request = content.DBContentRequest(roadmap_id=roadmap_id, topic="Python", subtopic="Generators")
+    async def join_late():
+        await asyncio.sleep(0.05)
+        return await content.create_content(request)
+    *streams, plain = await asyncio.gather(*(stream_events(request) for _ in range(n)), join_late())
+    assert calls["stream"] == 1 and calls["content"] == 1, calls
+    lesson = {"content": "# Generators (story)", "images": ["img"], "videos": [], "quiz_questions": []}
+    assert plain == ContentResponse(**lesson), plain
+    leaders = [events for events in streams if len(events) > 3]
+    assert len(leaders) == 1 and [e for e, _ in leaders[0]] == ["media"] + ["token"] * 5 + ["done"], leaders
+    for events in streams:
+        assert events[-1] == ("done", lesson), events
+        assert "".join(data["text"] for event, data in events if event == "token") == lesson["content"], events
+    # Saved by the flight
+    assert (await content.create_content(request))["content"] == lesson["content"] and calls["stream"] == 1
+
+    quiz.generate_quiz_questions = fake_generate_quiz_questions
+    request = quiz.QuizGenerateRequest(topic="Python", subtopic="Decorators", difficulty="Normal", language="English")
+    results = await burst(n, lambda: quiz.generate_quiz(request))
+    assert calls["quiz"] == 1, calls
+    assert all(r == results[0] for r in results)
+
+    # Streamed quizzes share the top-up; the ones that joined it pick its questions from the bank
+    quiz.stream_quiz_questions = fake_stream_quiz_questions
+    request = quiz.QuizGenerateRequest(topic="Python", subtopic="Closures", difficulty="Normal", language="English")
+    streams = await burst(n, lambda: stream_events(request, quiz.generate_quiz_stream))
+    assert calls["quiz_stream"] == 1 and calls["quiz"] == 1, calls
+    for events in streams:
+        assert [e for e, _ in events] == ["question"] * 5 + ["done"], events
+        assert [q["question"] for q in events[-1][1]["questions"]] == [f"Closures {i}?" for i in range(5)], events
+
+    roadmap.generate_roadmap = fake_generate_roadmap
+    request = roadmap.CreateRoadmapRequest(topic="Python", user_id=1)
+    results = await burst(n, lambda: roadmap.create_roadmap(request))
+    assert calls["roadmap"] == 1, calls
+    # Each caller still gets its own roadmap row
+    assert len({r["id"] for r in results}) == n
+
+    assert content.content_flights.inflight() == quiz.quiz_flights.inflight() == roadmap.roadmap_flights.inflight() == 0
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    db.init_db()
+    asyncio.run(check(n))
+    print(f"single-flight check passed: {n} identical requests per route, model calls {calls}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Storage conformance check: drives the DB-backed routes and agents through the
+active backend and fails loudly on any difference from the expected behaviour.
+The same checks run against SQLite and PostgreSQL.
+
+Run from the backend directory:
+    python -m benchmarks.storage_check
+    DATABASE_URL=postgresql://postgres:pw@localhost:5433/postgres python -m benchmarks.storage_check
+
+A throwaway Postgres for the second form:
+    docker run --rm -e POSTGRES_PASSWORD=pw -p 5433:5432 postgres:16
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-check-"), "check.db")
+
+from fastapi import HTTPException  # noqa: E402
+from app import db  # noqa: E402
+from app.agents.digital_twin import update_knowledge_state  # noqa: E402
+from app.api.routes import auth, coding, resources, roadmap, tutor  # noqa: E402
+from app.message_writer import message_writer  # noqa: E402
+from app.roadmap_store import insert_roadmap, write_layout  # noqa: E402
+
+async def fake_tutor_response(topic, message, history, summary=""):
+    return f"reply to {message} after {len(history)} messages"
+
+async def expect_http_error(status, coro):
+    try:
+        await coro
+    except HTTPException as e:
+        assert e.status_code == status, f"expected {status}, got {e.status_code}"
+        return
+    raise AssertionError(f"expected HTTP {status}")
+
+async def check():
+    suffix = uuid.uuid4().hex[:8]
+
+    # Users, lastrowid and IntegrityError
+    user = await auth.signup(auth.UserAuth(username=f"user-{suffix}", password="pw"))
+    assert user["id"] > 0
+    await expect_http_error(400, auth.signup(auth.UserAuth(username=f"user-{suffix}", password="pw")))
+    assert (await auth.login(auth.UserAuth(username=f"user-{suffix}", password="pw")))["id"] == user["id"]
+    await expect_http_error(401, auth.login(auth.UserAuth(username=f"user-{suffix}", password="nope")))
+    user_id = user["id"]
+
+    # Roadmaps, timestamps as strings, progress injection
+    tree = {"topic": "Networks", "roadmap": [
+        {"id": "1", "label": "Sampling", "description": "d", "children": [
+            {"id": "1.1", "label": "Aliasing", "description": "d", "children": []}
+        ]},
+        {"id": "2", "label": "Quantization", "description": "d", "children": []},
+    ]}
+    def create(conn):
+        roadmap_id = insert_roadmap(conn, user_id, "Networks", "English", "Normal", None, None, tree)
+        conn.commit()
+        return roadmap_id
+    roadmap_id = await db.run_db(create)
+    listed = await roadmap.get_user_roadmaps(user_id)
+    assert [r["id"] for r in listed] == [roadmap_id]
+    assert isinstance(listed[0]["created_at"], str)
+
+    update = await update_knowledge_state(user_id, "Networks", "Sampling", 90, 120)
+    assert update == {"mastery": 90, "status": "expert"}, update
+    update = await update_knowledge_state(user_id, "Networks", "Sampling", 0, 120)
+    assert update["mastery"] == 62, update
+    loaded = await roadmap.get_roadmap(roadmap_id)
+    assert loaded["roadmap"][0]["mastery_score"] == 62
+    await expect_http_error(404, roadmap.get_roadmap(10 ** 9))
+
+    assert (await roadmap.get_roadmap(roadmap_id)).get("nodes") is None
+    await roadmap.update_roadmap_structure(roadmap_id, roadmap.RoadmapUpdateRequest(nodes=[], edges=[]))
+    assert (await roadmap.get_roadmap(roadmap_id))["nodes"] == []
+    nodes = [{"id": str(i), "position": {"x": i, "y": 0}} for i in range(3)]
+    edges = [{"id": "e0-1", "source": "0", "target": "1"}]
+    await roadmap.update_roadmap_structure(roadmap_id, roadmap.RoadmapUpdateRequest(nodes=nodes, edges=edges))
+    loaded = await roadmap.get_roadmap(roadmap_id)
+    assert (loaded["nodes"], loaded["edges"]) == (nodes, edges)
+    assert loaded["roadmap"][0]["label"] == "Sampling"
+    nodes[1]["position"] = {"x": 50, "y": 50}
+    touched = await db.run_db(write_layout, roadmap_id, nodes[:2], edges)
+    assert touched == 2, touched  # one moved node, one removed node
+
+    # Tutor chat through the write-behind queue, read-your-writes
+    assert await tutor.get_history(user_id, "Networks") == []
+    tutor.get_tutor_response = fake_tutor_response
+    await tutor.chat(tutor.ChatRequest(user_id=user_id, topic="Networks", message="one"))
+    reply = await tutor.chat(tutor.ChatRequest(user_id=user_id, topic="Networks", message="two"))
+    assert reply["response"] == "reply to two after 2 messages", reply
+    history = await tutor.get_history(user_id, "Networks")
+    assert [m["content"] for m in history] == ["one", "reply to one after 0 messages", "two", reply["response"]]
+
+    # Coding sessions
+    session = await coding.start_session(coding.CreateSessionRequest(user_id=user_id, language="Python", topic="Lists"))
+    message_writer.enqueue("coding_messages", session["session_id"], "user", "hi")
+    details = await coding.get_session_details(session["session_id"])
+    assert details["session"]["title"] == "Python - Lists"
+    assert [m["content"] for m in details["messages"]] == ["hi"]
+    assert len(await coding.get_user_sessions(user_id)) == 1
+
+    # Resources
+    assert isinstance(await resources.get_resources(), list)
+
+    # Rollback of abandoned transactions
+    def abandon(conn):
+        conn.execute("INSERT INTO users (username, password_hash) VALUES (?, 'x')", (f"ghost-{suffix}",))
+    await db.run_db(abandon)
+    def count_ghosts(conn):
+        return conn.execute("SELECT COUNT(*) FROM users WHERE username = ?", (f"ghost-{suffix}",)).fetchone()[0]
+    assert await db.run_db(count_ghosts) == 0
+
+def main():
+    db.init_db()
+    db.init_db()  # migrations must be idempotent
+    asyncio.run(check())
+    message_writer.stop()
+    print(f"storage check passed on {db.backend.dialect}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Warm-up benchmark: time to first token of the first lesson after startup with
+and without model warm-up, and how much of each lesson prompt Ollama can reuse
+from its KV cache with the old prompt layout (request fields first) and the
+current one (static instructions first).
+
+Runs against a fake Ollama that charges --load-time for a model that isn't
+loaded and only prefills the part of a prompt not shared with the previous
+one (--prefill-per-token), so no model is needed.
+
+Run from the backend directory:
+    python -m benchmarks.warmup
+    python -m benchmarks.warmup --load-time 4 --prefill-per-token 0.002
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="edtech-bench-"), "bench.db")
+
+from langchain_core.output_parsers import StrOutputParser  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.agents import content  # noqa: E402
+from app.llm import close_clients, get_llm, warm_up_models  # noqa: E402
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+
+TOPICS = [("Python", "Decorators"), ("Machine Learning", "Gradient Descent"), ("Chemistry", "Covalent Bonds")]
+STATUSES = ["novice", "competent", "expert"]
+INTERESTS = [None, "Football", "Star Wars"]
+OBJECTIVES = [None, "Exam based", "Skill based"]
+
+def lessons(count: int) -> list:
+    # Consecutive lessons come from different users, as they would on a shared server
+    combos = itertools.product(TOPICS, STATUSES, INTERESTS, OBJECTIVES)
+    return [(topic, subtopic, status, interest, objective)
+            for (topic, subtopic), status, interest, objective in itertools.islice(combos, 0, None, 7)][:count]
+
+def legacy_chain(topic, subtopic, mode, difficulty, language, user_status, interest, objective):
+    """The content prompt as it was laid out before: interest and objective ahead of the instructions."""
+    if mode == "story" and interest:
+        system_prompt = f"You are a creative writer who explains complex topics by relating them to '{interest}'. Use analogies, characters, metaphors, and terminology strictly from the world of {interest} to explain the concept. Make it fun, engaging, and highly personalized to a fan of {interest}."
+    else:
+        system_prompt = content.MODE_INSTRUCTIONS.get(mode, content.DEFAULT_INSTRUCTIONS)
+    adaptive_instruction = content.ADAPTIVE_INSTRUCTIONS[user_status]
+    objective_instruction = ""
+    if objective:
+        objective_instruction = content.OBJECTIVE_INSTRUCTIONS.get(objective, f"The user has a specific goal: '{objective}'.")
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", f"{system_prompt}\n\nTarget Audience Difficulty: {difficulty}.\nUser Proficiency Level: {user_status.upper()}\n{adaptive_instruction}\n\nUser Objective: {objective_instruction}\n\nIMPORTANT INSTRUCTION: You must generate the entire response in the {language} language. Do not use English unless the term has no translation."),
+        ("user", f"Explain the subtopic '{subtopic}' which is part of '{topic}'. Write the explanation in {language}.")
+    ])
+    return prompt | get_llm("content") | StrOutputParser()
+
+async def first_token(chain) -> float:
+    started = time.perf_counter()
+    ttft = None
+    async for _ in chain.astream({}):
+        if ttft is None:
+            ttft = time.perf_counter() - started
+    return ttft
+
+def lesson_chain(build, lesson):
+    topic, subtopic, status, interest, objective = lesson
+    return build(topic, subtopic, "story", "Normal", "English", status, interest, objective)
+
+async def cold_vs_warm(args) -> dict:
+    results = {}
+    for warm in (False, True):
+        fake = FakeOllama(ttft=args.ttft, load_time=args.load_time, prefill_per_token=args.prefill_per_token)
+        settings.OLLAMA_BASE_URL = await fake.start()
+        if warm:
+            await warm_up_models()  # what the lifespan does at startup
+        results["warm" if warm else "cold"] = await first_token(lesson_chain(content._content_chain, lessons(1)[0]))
+        await close_clients()
+        await fake.stop()
+    return results
+
+async def prefix_reuse(args) -> dict:
+    results = {}
+    for name, build in (("before", legacy_chain), ("after", content._content_chain)):
+        fake = FakeOllama(ttft=args.ttft, prefill_per_token=args.prefill_per_token, prefix_cache=True)
+        settings.OLLAMA_BASE_URL = await fake.start()
+        await warm_up_models()
+        ttfts = [await first_token(lesson_chain(build, lesson)) for lesson in lessons(args.lessons)]
+        # The first prompt has nothing to reuse in either layout
+        prompt, cached = sum(fake.prompt_tokens[1:]), sum(fake.cached_tokens[1:])
+        results[name] = (prompt / (len(ttfts) - 1), cached / prompt, sum(ttfts[1:]) / (len(ttfts) - 1))
+        await close_clients()
+        await fake.stop()
+    return results
+
+async def run(args):
+    return await cold_vs_warm(args), await prefix_reuse(args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load-time", type=float, default=2.0, help="fake model load time in seconds")
+    parser.add_argument("--ttft", type=float, default=0.05, help="fake fixed latency before the first token")
+    parser.add_argument("--prefill-per-token", type=float, default=0.001,
+                        help="fake prefill cost in seconds per prompt token not reused")
+    parser.add_argument("--lessons", type=int, default=12)
+    args = parser.parse_args()
+
+    ttft, reuse = asyncio.run(run(args))
+    print(f"first lesson after startup (load {args.load_time:.1f}s): "
+          f"cold {ttft['cold'] * 1000:.0f}ms, warmed up {ttft['warm'] * 1000:.0f}ms")
+    print(f"{args.lessons} consecutive story lessons from different users, prefill {args.prefill_per_token * 1000:.1f} ms/token:")
+    print(f"{'layout':<8}{'prompt tokens':>15}{'reused':>9}{'mean ttft':>12}")
+    for name, (tokens, reused, mean_ttft) in reuse.items():
+        print(f"{name:<8}{tokens:>15.0f}{reused:>9.0%}{mean_ttft * 1000:>10.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.core.config import settings
-from app.api.routes import roadmap, content, auth, quiz, coding, resources, tutor
+from app.api.routes import roadmap, content, auth, quiz, coding, resources, tutor, nodes
 from app.db import init_db
+from app.message_writer import message_writer
+from app.llm import close_clients, model_warmer, route_table, scheduler_stats
+from app.llm_scheduler import LLMOverloaded
+from app.serper import close_serper_client
+from app import llm_metrics
+from app.jobs import job_queue
 
-app = FastAPI(title="AI EdTech Backend", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    message_writer.start()
+    await job_queue.start()
+    # Loads the models in the background; requests arriving first just wait in Ollama
+    if settings.LLM_WARMUP:
+        model_warmer.start()
+    yield
+    await model_warmer.stop()
+    # Unfinished jobs stay in the jobs table and resume on the next start
+    await job_queue.stop()
+    # Drain queued chat messages before the process exits
+    message_writer.stop()
+    await close_clients()
+    await close_serper_client()
+
+app = FastAPI(title="AI EdTech Backend", version="1.0.0", lifespan=lifespan)
 
 # Initialize Database
 init_db()
@@ -30,6 +54,15 @@ app.include_router(quiz.router, prefix="/api/quiz", tags=["quiz"])
 app.include_router(coding.router, prefix="/api/coding", tags=["coding"])
 app.include_router(resources.router, prefix="/api/resources", tags=["resources"])
 app.include_router(tutor.router, prefix="/api/tutor", tags=["tutor"])
+app.include_router(nodes.router, prefix="/api/nodes", tags=["nodes"])
+
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded(request, exc: LLMOverloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 @app.get("/")
 async def root():
@@ -37,7 +70,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "ollama_url": settings.OLLAMA_BASE_URL}
+    return {"status": "healthy", "ollama_url": settings.OLLAMA_BASE_URL, "models": model_warmer.stats()}
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Each task's model and fallback, and per model the scheduler slots, queue depths and queue-time percentiles."""
+    return {"routes": route_table(), "models": scheduler_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-agent generation metrics and scheduler state in the Prometheus text format."""
+    return PlainTextResponse(llm_metrics.render(scheduler_stats()), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
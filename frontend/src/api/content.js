@@ -21,3 +21,83 @@ export const generateContent = async (topic, subtopic, mode = "story", difficult
     throw error;
   }
 };
+
+// Streams a lesson from /content/generate/stream. Stored and freshly generated
+// lessons use the same server-sent event protocol:
+//   media -> { images, videos }, token -> { text }, done -> full content, error -> { detail }
+// A fresh lesson sends media once its searches finish, which can be after the first tokens.
+export const streamContent = async ({ topic, subtopic, mode = "story", difficulty = "Normal", language = "English", images = null, videos = null, roadmapId = null, interest = null }, { onMedia, onToken } = {}) => {
+  const response = await fetch(`${API_URL}/content/generate/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      topic,
+      subtopic,
+      mode,
+      difficulty,
+      language,
+      images,
+      videos,
+      interest,
+      roadmap_id: roadmapId
+    })
+  });
+  if (!response.ok) throw new Error("Content stream failed");
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line; keep any partial event in the buffer
+    const events = buffer.split("\n\n");
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "null");
+      if (event === "media") onMedia?.(data);
+      else if (event === "token") onToken?.(data.text);
+      else if (event === "done") return data;
+      else if (event === "error") throw new Error(data.detail);
+    }
+  }
+  throw new Error("Content stream ended early");
+};
+
+// Streams lessons for many nodes of a roadmap (e.g. a whole branch for offline
+// study) from /content/generate/batch. onNode gets every
+// { node, mode, status: "stored" | "generated" | "failed", content?, detail? }
+// as it finishes; resolves with { stored, generated, failed }.
+export const streamContentBatch = async (roadmapId, nodes, modes = ["story"], onNode) => {
+  const response = await fetch(`${API_URL}/content/generate/batch`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ roadmap_id: roadmapId, nodes, modes })
+  });
+  if (!response.ok) throw new Error("Batch content failed");
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const events = buffer.split("\n\n");
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "null");
+      if (event === "node") onNode?.(data);
+      else if (event === "done") return data;
+      else if (event === "error") throw new Error(data.detail);
+    }
+  }
+  throw new Error("Batch content stream ended early");
+};
@@ -0,0 +1,37 @@
+const API_URL = 'http://localhost:8000/api';
+
+// Opens a roadmap node through /nodes/open: the lesson and the quiz are
+// generated at the same time. onLesson gets the ContentResponse and onQuiz
+// gets { questions }, in whichever order they finish; onFailed gets
+// { part, detail } for a part that couldn't be produced. Resolves with
+// { failed: [...parts] }.
+export const streamNodeOpen = async (roadmapId, node, mode = "story", { onLesson, onQuiz, onFailed } = {}) => {
+  const response = await fetch(`${API_URL}/nodes/open`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ roadmap_id: roadmapId, node, mode })
+  });
+  if (!response.ok) throw new Error("Opening the node failed");
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const events = buffer.split("\n\n");
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "null");
+      if (event === "lesson") onLesson?.(data);
+      else if (event === "quiz") onQuiz?.(data);
+      else if (event === "failed") onFailed?.(data);
+      else if (event === "done") return data;
+    }
+  }
+  throw new Error("Node stream ended early");
+};
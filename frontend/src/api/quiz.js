@@ -18,6 +18,45 @@ export const generateQuiz = async (topic, subtopic, difficulty, language, roadma
   }
 };
 
+// Streams a quiz: onQuestion receives each question as soon as the server has
+// validated it. Resolves with the full list.
+export const streamQuiz = async (topic, subtopic, difficulty, language, roadmapId, onQuestion) => {
+  const response = await fetch(`${API_URL}/quiz/generate/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      topic,
+      subtopic,
+      difficulty,
+      language,
+      roadmap_id: roadmapId
+    })
+  });
+  if (!response.ok) throw new Error("Quiz stream failed");
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line; keep any partial event in the buffer
+    const events = buffer.split("\n\n");
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "null");
+      if (event === "question") onQuestion?.(data);
+      else if (event === "done") return data.questions;
+      else if (event === "error") throw new Error(data.detail);
+    }
+  }
+  throw new Error("Quiz stream ended early");
+};
+
 export const submitQuiz = async (userId, roadmapId, nodeLabel, topic, questions, answers, timeTaken, totalTime) => {
   try {
     const response = await axios.post(`${API_URL}/quiz/submit`, {
@@ -36,3 +75,26 @@ export const submitQuiz = async (userId, roadmapId, nodeLabel, topic, questions,
     throw error;
   }
 };
+
+// Follows a background review job. onText receives the review generated so far.
+export const streamReview = (jobId, onText) => new Promise((resolve, reject) => {
+  const source = new EventSource(`${API_URL}/quiz/review/${jobId}/stream`);
+  let review = "";
+  source.addEventListener('token', (e) => {
+    review += JSON.parse(e.data).text;
+    onText(review);
+  });
+  // The job was retried and writes its review again from the start
+  source.addEventListener('restart', () => {
+    review = "";
+    onText(review);
+  });
+  source.addEventListener('done', (e) => {
+    source.close();
+    resolve(JSON.parse(e.data).review);
+  });
+  source.addEventListener('error', (e) => {
+    source.close();
+    reject(new Error(e.data ? JSON.parse(e.data).detail : "Review stream failed"));
+  });
+});
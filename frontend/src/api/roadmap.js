@@ -2,7 +2,8 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:8000/api';
 
-export const generateRoadmap = async (topic, difficulty, language = "English", interest = "", objective = "", userId) => {
+// fresh skips the server's template store and always generates a new roadmap
+export const generateRoadmap = async (topic, difficulty, language = "English", interest = "", objective = "", userId, prefetch = false, fresh = false) => {
   try {
     const response = await axios.post(`${API_URL}/roadmap/generate`, {
       topic,
@@ -10,7 +11,9 @@ export const generateRoadmap = async (topic, difficulty, language = "English", i
       language,
       interest: interest || null,
       objective: objective || null,
-      user_id: userId
+      user_id: userId,
+      prefetch,
+      fresh
     });
     return response.data;
   } catch (error) {
@@ -50,3 +53,13 @@ export const updateRoadmap = async (id, nodes, edges) => {
     throw error;
   }
 };
+
+export const deleteRoadmap = async (roadmapId) => {
+  try {
+    const response = await axios.delete(`${API_URL}/roadmap/${roadmapId}`);
+    return response.data;
+  } catch (error) {
+    console.error("Error deleting roadmap:", error);
+    throw error;
+  }
+};
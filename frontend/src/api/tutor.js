@@ -25,5 +25,29 @@ export const tutorApi = {
         });
         if (!response.ok) throw new Error('Failed to send message to tutor');
         return response.json();
+    },
+
+    // Streams only the new reply; onChunk receives the text generated so far
+    chatStream: async (userId, topic, message, onChunk) => {
+        const response = await fetch(`${API_URL}/chat/stream`, {
+            method: 'POST',
+            headers: { 
+                'Content-Type': 'application/json',
+                ...getAuthHeaders() 
+            },
+            body: JSON.stringify({ user_id: userId, topic, message })
+        });
+        if (!response.ok) throw new Error('Failed to send message to tutor');
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let reply = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            reply += decoder.decode(value, { stream: true });
+            onChunk(reply);
+        }
+        return reply;
     }
 };
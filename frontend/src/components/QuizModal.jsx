@@ -1,13 +1,15 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { X, Clock, CheckCircle, XCircle, ArrowRight, Loader2, Trophy, Award, TrendingUp, Bot, ArrowLeft } from 'lucide-react';
 import ReactMarkdown from 'react-markdown';
-import { generateQuiz, submitQuiz } from '../api/quiz';
+import { streamQuiz, submitQuiz, streamReview } from '../api/quiz';
 import { useAuth } from '../context/AuthContext';
 import './QuizModal.css';
 
 const QuizModal = ({ isOpen, onClose, topic, subtopic, difficulty, language, roadmapId }) => {
   const { user } = useAuth();
   const [loading, setLoading] = useState(true);
+  // More questions are still streaming in after the first one is shown
+  const [generating, setGenerating] = useState(false);
   const [questions, setQuestions] = useState([]);
   const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
   const [answers, setAnswers] = useState({});
@@ -18,11 +20,14 @@ const QuizModal = ({ isOpen, onClose, topic, subtopic, difficulty, language, roa
   const [showReview, setShowReview] = useState(false);
 
   const timerRef = useRef(null);
+  // Ignores questions from a stream started before the modal was reopened
+  const loadIdRef = useRef(0);
 
   useEffect(() => {
     if (isOpen) {
       loadQuiz();
     } else {
+      loadIdRef.current++;
       setQuestions([]);
       setCurrentQuestionIndex(0);
       setAnswers({});
@@ -40,13 +45,24 @@ const QuizModal = ({ isOpen, onClose, topic, subtopic, difficulty, language, roa
 
   const loadQuiz = async () => {
     setLoading(true);
+    setGenerating(true);
+    setQuestions([]);
+    const loadId = ++loadIdRef.current;
     try {
-      const data = await generateQuiz(topic, subtopic, difficulty, language, roadmapId);
-      setQuestions(data.questions);
+      // The first question renders while the rest are still being generated
+      const all = await streamQuiz(topic, subtopic, difficulty, language, roadmapId, (question) => {
+        if (loadId !== loadIdRef.current) return;
+        setQuestions(prev => [...prev, question]);
+        setLoading(false);
+      });
+      if (loadId === loadIdRef.current) setQuestions(all);
     } catch (error) {
       console.error("Failed to load quiz", error);
     } finally {
-      setLoading(false);
+      if (loadId === loadIdRef.current) {
+        setLoading(false);
+        setGenerating(false);
+      }
     }
   };
 
@@ -86,7 +102,15 @@ const QuizModal = ({ isOpen, onClose, topic, subtopic, difficulty, language, roa
         finalTimeTaken,
         totalTime
       );
-      setResult(data);
+      setResult({ ...data, review: "" });
+      setSubmitting(false);
+
+      // The review is generated in the background after the score comes back
+      streamReview(data.review_job_id, (review) => setResult(prev => prev && { ...prev, review }))
+        .catch((error) => {
+          console.error("Failed to load quiz review", error);
+          setResult(prev => prev && { ...prev, review: "Unable to generate review at this time." });
+        });
     } catch (error) {
       console.error("Failed to submit quiz", error);
     } finally {
@@ -143,7 +167,11 @@ const QuizModal = ({ isOpen, onClose, topic, subtopic, difficulty, language, roa
                   <h3 className="review-title">AI Performance Review</h3>
                 </div>
                 <div className="review-content">
-                  <ReactMarkdown>{result.review}</ReactMarkdown>
+                  {result.review ? (
+                    <ReactMarkdown>{result.review}</ReactMarkdown>
+                  ) : (
+                    <Loader2 className="animate-spin" />
+                  )}
                 </div>
                 <button 
                   onClick={() => setShowReview(false)}
@@ -251,7 +279,7 @@ const QuizModal = ({ isOpen, onClose, topic, subtopic, difficulty, language, roa
           <div className="quiz-modal-footer">
             <button
               onClick={handleNext}
-              disabled={!answers[questions[currentQuestionIndex].id] || submitting}
+              disabled={!answers[questions[currentQuestionIndex].id] || submitting || (generating && currentQuestionIndex === questions.length - 1)}
               className="next-button"
             >
               {submitting ? (
@@ -261,7 +289,7 @@ const QuizModal = ({ isOpen, onClose, topic, subtopic, difficulty, language, roa
                 </>
               ) : (
                 <>
-                  <span>{currentQuestionIndex === questions.length - 1 ? 'Submit Quiz' : 'Next Question'}</span>
+                  <span>{currentQuestionIndex === questions.length - 1 && !generating ? 'Submit Quiz' : 'Next Question'}</span>
                   <ArrowRight size={20} />
                 </>
               )}
@@ -65,11 +65,19 @@ const TutorChat = ({ topic }) => {
         setLoading(true);
 
         try {
-            const data = await tutorApi.chat(user.id, topic, userMsg);
-            setMessages(prev => [...prev, { role: 'assistant', content: data.response }]);
+            setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+            await tutorApi.chatStream(user.id, topic, userMsg, (reply) => {
+                // Replace the placeholder assistant message with the text so far
+                setMessages(prev => [...prev.slice(0, -1), { role: 'assistant', content: reply }]);
+            });
         } catch (error) {
             console.error("Chat error", error);
-            setMessages(prev => [...prev, { role: 'assistant', content: "Sorry, I encountered an error. Please try again." }]);
+            setMessages(prev => {
+                // Drop the streaming placeholder if nothing arrived
+                const last = prev[prev.length - 1];
+                const kept = last?.role === 'assistant' && !last.content ? prev.slice(0, -1) : prev;
+                return [...kept, { role: 'assistant', content: "Sorry, I encountered an error. Please try again." }];
+            });
         } finally {
             setLoading(false);
         }